@@ -0,0 +1,121 @@
+# Copyright (c) 2025, osama.ahmed@deliverydevs.com
+# For license information, please see license.txt
+
+import json
+import sys
+import time
+
+import click
+import frappe
+from frappe.commands import get_site, pass_context
+
+
+@click.command("zkteco-sync-worker")
+@pass_context
+def zkteco_sync_worker(context):
+    """Run ZKTeco sync continuously at the configured Sync Frequency (down to 10 seconds)"""
+    from zkteco_checkins_sync.zkteco_checkin_sync.sync_worker import IDLE_POLL_SECONDS, run_sync_loop
+
+    site = get_site(context)
+    frappe.init(site=site)
+    frappe.connect()
+    try:
+        # run_sync_loop returns while sync is disabled or another loop holds the lock
+        while True:
+            run_sync_loop()
+            time.sleep(IDLE_POLL_SECONDS)
+    finally:
+        frappe.destroy()
+
+
+@click.command("zkteco-backfill")
+@click.argument("start")
+@click.argument("end", required=False)
+@click.option("--chunk", default="1d", help="Size of each date range, e.g. 30m, 6h, 1d, 1w")
+@click.option("--workers", default=4, type=int, help="Chunks fetched and inserted concurrently")
+@click.option("--server", help="Only backfill this ZKTeco Server")
+@pass_context
+def zkteco_backfill(context, start, end=None, chunk="1d", workers=4, server=None):
+    """Backfill ZKTeco transactions from START to END (default now). Rerun to resume."""
+    from zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_backfill_chunk.zkteco_backfill_chunk import run_backfill
+
+    site = get_site(context)
+    frappe.init(site=site)
+    frappe.connect()
+    try:
+        frappe.set_user("Administrator")
+        result = run_backfill(start, end, chunk=chunk, workers=workers, server=server, echo=click.echo)
+        if result["failed"]:
+            click.secho(f"{result['failed']} chunks failed; run the same command again to retry them", fg="yellow")
+    finally:
+        frappe.destroy()
+
+
+@click.command("zkteco-benchmark")
+@click.option("--punches", default="1000", help="Comma separated dataset sizes, e.g. 1000,100000,1000000")
+@click.option("--scenarios", default="sync,backfill,test_connection", help="Comma separated: sync, backfill, test_connection")
+@click.option("--employees", default=1000, type=int, help="Distinct emp_codes in the fake data")
+@click.option("--latency-ms", default=0, type=int, help="Delay the fake server adds to every request")
+@click.option("--error-rate", default=0.0, type=float, help="Share of fake server requests answered with 503")
+@click.option("--page-size", default=500, type=int)
+@click.option("--chunk", default="1h", help="Backfill chunk size")
+@click.option("--workers", default=4, type=int, help="Backfill workers")
+@click.option("--order", default="ascending", type=click.Choice(["ascending", "descending", "shuffled"]), help="Order the fake server lists rows in")
+@click.option("--only-mapped-employees", is_flag=True, help="Sync with the emp_code filter of mapped employees")
+@click.option("--output", type=click.Path(dir_okay=False), help="Write the results as JSON")
+@click.option("--baseline", type=click.Path(exists=True, dir_okay=False), help="Fail on regressions against an earlier --output file")
+@click.option("--tolerance", default=20.0, type=float, help="Percent change allowed against the baseline")
+@pass_context
+def zkteco_benchmark(
+    context,
+    punches,
+    scenarios,
+    employees,
+    latency_ms,
+    error_rate,
+    page_size,
+    chunk,
+    workers,
+    order="ascending",
+    only_mapped_employees=False,
+    output=None,
+    baseline=None,
+    tolerance=20.0,
+):
+    """Benchmark sync, backfill and test_connection against a local fake ZKBio Time server (test sites only)"""
+    from zkteco_checkins_sync.zkteco_checkin_sync.benchmark import compare_with_baseline, run_benchmark
+
+    site = get_site(context)
+    frappe.init(site=site)
+    frappe.connect()
+    try:
+        results = run_benchmark(
+            sizes=[int(size) for size in punches.split(",") if size.strip()],
+            scenarios=[name.strip() for name in scenarios.split(",") if name.strip()],
+            employees=employees,
+            latency_ms=latency_ms,
+            error_rate=error_rate,
+            page_size=page_size,
+            chunk=chunk,
+            workers=workers,
+            order=order,
+            only_mapped_employees=only_mapped_employees,
+            echo=click.echo,
+        )
+    finally:
+        frappe.destroy()
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=1)
+
+    if baseline:
+        with open(baseline) as f:
+            regressions = compare_with_baseline(results, json.load(f), tolerance)
+        for regression in regressions:
+            click.secho(f"Regression: {regression}", fg="red")
+        if regressions:
+            sys.exit(1)
+
+
+commands = [zkteco_sync_worker, zkteco_backfill, zkteco_benchmark]
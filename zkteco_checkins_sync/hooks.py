@@ -83,7 +83,7 @@ app_license = "mit"
 # ------------
 
 # before_install = "zkteco_checkins_sync.install.before_install"
-# after_install = "zkteco_checkins_sync.install.after_install"
+after_install = "zkteco_checkins_sync.install.after_install"
 
 # Uninstallation
 # ------------
@@ -145,93 +145,42 @@ app_license = "mit"
 # 	}
 # }
 
-# Scheduled Tasks - Dynamic ZKTeco Sync
-# ---------------
+doc_events = {
+    "Employee": {
+        "on_update": "zkteco_checkins_sync.zkteco_checkin_sync.employee_resolver.clear_employee_code_map",
+        "on_trash": "zkteco_checkins_sync.zkteco_checkin_sync.employee_resolver.clear_employee_code_map",
+        "after_rename": "zkteco_checkins_sync.zkteco_checkin_sync.employee_resolver.clear_employee_code_map",
+    }
+}
 
-def get_scheduler_events():
-    """
-    Dynamic scheduler that adjusts based on ZKTeco Config settings
-    """
-    import frappe
-    
-    # Get sync settings
-    try:
-        cfg = frappe.get_single("ZKTeco Config")
-        if not cfg.enable_sync:
-            return {}
-        
-        sync_seconds = int(cfg.seconds or 300)  # Default 5 minutes
-        
-        # Map seconds to cron expressions
-        sync_schedule = {}
-        
-        if sync_seconds <= 60:
-            # For frequent syncs (every minute or less), use cron for every minute
-            sync_schedule = {
-                "cron": {
-                    "* * * * *": [
-                        "zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_config.zkteco_config.scheduled_sync"
-                    ]
-                }
-            }
-        elif sync_seconds <= 300:  # 5 minutes
-            sync_schedule = {
-                "cron": {
-                    "*/5 * * * *": [
-                        "zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_config.zkteco_config.sync_zkteco_transactions"
-                    ]
-                }
-            }
-        elif sync_seconds <= 600:  # 10 minutes
-            sync_schedule = {
-                "cron": {
-                    "*/10 * * * *": [
-                        "zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_config.zkteco_config.sync_zkteco_transactions"
-                    ]
-                }
-            }
-        elif sync_seconds <= 900:  # 15 minutes
-            sync_schedule = {
-                "cron": {
-                    "*/15 * * * *": [
-                        "zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_config.zkteco_config.sync_zkteco_transactions"
-                    ]
-                }
-            }
-        elif sync_seconds <= 1800:  # 30 minutes
-            sync_schedule = {
-                "cron": {
-                    "*/30 * * * *": [
-                        "zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_config.zkteco_config.sync_zkteco_transactions"
-                    ]
-                }
-            }
-        else:  # 1 hour or more
-            sync_schedule = {
-                "hourly": [
-                    "zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_config.zkteco_config.sync_zkteco_transactions"
-                ]
-            }
-        
-        return sync_schedule
-        
-    except Exception as e:
-        frappe.log_error(f"Error in ZKTeco dynamic scheduler: {str(e)}", "ZKTeco Scheduler Error")
-        return {}
-
-# Apply dynamic scheduler
-scheduler_events = get_scheduler_events()
-
-# Fallback static scheduler for basic functionality
-if not scheduler_events:
-    scheduler_events = {
-        "all": [
-            "zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_config.zkteco_config.cleanup_scheduler_check"
-        ],
-        "hourly": [
-            "zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_config.zkteco_config.sync_zkteco_transactions"
+# Scheduled Tasks
+# ---------------
+# scheduled_sync runs every minute and reads ZKTeco Config when it fires, so
+# frequency changes apply without a restart. Sub-minute frequencies are served
+# by a sync loop (see sync_worker.py) that it starts on the long queue.
+
+scheduler_events = {
+    "all": [
+        "zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_config.zkteco_config.cleanup_scheduler_check",
+        "zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_error_summary.zkteco_error_summary.flush_error_summaries",
+        "zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_device_health.zkteco_device_health.refresh_device_health",
+        "zkteco_checkins_sync.zkteco_checkin_sync.token_manager.refresh_api_tokens"
+    ],
+    "daily": [
+        "zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_error_summary.zkteco_error_summary.clear_old_error_summaries",
+        "zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_sync_counter.zkteco_sync_counter.clear_old_sync_counters",
+        "zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_transaction_log.zkteco_transaction_log.clear_old_staging_rows"
+    ],
+    "hourly": [
+        "zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_transaction_log.zkteco_transaction_log.requeue_staging_rows",
+        "zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_sync_run.zkteco_sync_run.clear_old_sync_runs"
+    ],
+    "cron": {
+        "* * * * *": [
+            "zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_config.zkteco_config.scheduled_sync"
         ]
     }
+}
 
 # Testing
 # -------
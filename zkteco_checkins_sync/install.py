@@ -0,0 +1,33 @@
+# Copyright (c) 2025, osama.ahmed@deliverydevs.com
+# For license information, please see license.txt
+
+from frappe.custom.doctype.custom_field.custom_field import create_custom_fields
+
+
+def get_custom_fields():
+    """
+    Custom fields this app adds to other doctypes
+    """
+    return {
+        "Employee Checkin": [
+            {
+                "fieldname": "zkteco_transaction_id",
+                "label": "ZKTeco Transaction ID",
+                "fieldtype": "Data",
+                "insert_after": "device_id",
+                "unique": 1,
+                "read_only": 1,
+                "no_copy": 1,
+                "translatable": 0,
+            }
+        ]
+    }
+
+
+def make_custom_fields():
+    create_custom_fields(get_custom_fields(), update=True)
+
+
+def after_install():
+    # Patches are marked as done on fresh installs, so set up fields here as well
+    make_custom_fields()
@@ -0,0 +1,57 @@
+import frappe
+
+from zkteco_checkins_sync.install import make_custom_fields
+
+
+def execute():
+    """
+    Add the indexed zkteco_transaction_id field to Employee Checkin and backfill it
+    from the "<device> (ZKTeco-<id>)" device_id strings written by earlier versions.
+
+    Only the oldest checkin per transaction id is backfilled so duplicates created
+    before dedup was reliable don't violate the unique index.
+    """
+    make_custom_fields()
+
+    frappe.db.multisql(
+        {
+            "mariadb": """
+                UPDATE `tabEmployee Checkin` checkin
+                JOIN (
+                    SELECT
+                        MIN(name) AS name,
+                        SUBSTRING_INDEX(SUBSTRING_INDEX(device_id, '(ZKTeco-', -1), ')', 1) AS transaction_id
+                    FROM `tabEmployee Checkin`
+                    WHERE device_id LIKE %(pattern)s
+                    GROUP BY transaction_id
+                ) first_checkin ON first_checkin.name = checkin.name
+                SET checkin.zkteco_transaction_id = first_checkin.transaction_id
+                WHERE checkin.zkteco_transaction_id IS NULL
+                    AND first_checkin.transaction_id NOT IN (
+                        SELECT zkteco_transaction_id FROM (
+                            SELECT zkteco_transaction_id FROM `tabEmployee Checkin`
+                            WHERE zkteco_transaction_id IS NOT NULL
+                        ) already_set
+                    )
+            """,
+            "postgres": """
+                UPDATE "tabEmployee Checkin" checkin
+                SET zkteco_transaction_id = first_checkin.transaction_id
+                FROM (
+                    SELECT
+                        MIN(name) AS name,
+                        substring(device_id from '\\(ZKTeco-([^)]*)\\)') AS transaction_id
+                    FROM "tabEmployee Checkin"
+                    WHERE device_id LIKE %(pattern)s
+                    GROUP BY 2
+                ) first_checkin
+                WHERE first_checkin.name = checkin.name
+                    AND checkin.zkteco_transaction_id IS NULL
+                    AND first_checkin.transaction_id NOT IN (
+                        SELECT zkteco_transaction_id FROM "tabEmployee Checkin"
+                        WHERE zkteco_transaction_id IS NOT NULL
+                    )
+            """,
+        },
+        {"pattern": "%(ZKTeco-%)"},
+    )
@@ -0,0 +1,26 @@
+import frappe
+from frappe.utils.password import set_encrypted_password
+
+
+def execute():
+    """
+    Move the plain-text API tokens of ZKTeco Config and ZKTeco Server into
+    encrypted storage now that `token` is a Password field, leaving the usual
+    mask in the document.
+    """
+    config_token = frappe.db.get_value(
+        "Singles", {"doctype": "ZKTeco Config", "field": "token"}, "value"
+    )
+    if config_token and not is_masked(config_token):
+        set_encrypted_password("ZKTeco Config", "ZKTeco Config", config_token, "token")
+        frappe.db.set_single_value("ZKTeco Config", "token", "*" * len(config_token))
+
+    for server in frappe.get_all("ZKTeco Server", filters={"token": ["is", "set"]}, fields=["name", "token"]):
+        if is_masked(server.token):
+            continue
+        set_encrypted_password("ZKTeco Server", server.name, server.token, "token")
+        frappe.db.set_value("ZKTeco Server", server.name, "token", "*" * len(server.token), update_modified=False)
+
+
+def is_masked(value):
+    return set(value) == {"*"}
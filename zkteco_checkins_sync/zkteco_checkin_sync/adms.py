@@ -0,0 +1,82 @@
+# Copyright (c) 2025, osama.ahmed@deliverydevs.com
+# For license information, please see license.txt
+
+import frappe
+from frappe.utils import cstr, now_datetime
+
+
+# Namespace for zkteco_transaction_id of punches pushed straight from devices.
+# ADMS uploads carry no ZKBio Time id, so one is derived from device, PIN and time.
+ADMS_NAMESPACE = "adms"
+
+# Default (tabDefaultValue) holding the Stamp of the last ATTLOG upload a device made
+ATTLOG_STAMP_KEY = "zkteco_attlog_stamp:{0}"
+
+
+def parse_attlog(body, serial_number):
+    """
+    Parse an ADMS/iclock `cdata` ATTLOG upload into transaction dicts shaped
+    like /iclock/api/transactions/ rows.
+
+    Each line is tab separated: PIN, punch time, status, verify type, work code, ...
+    Status 0 is check in and 1 is check out, matching the API's punch_state.
+    """
+    transactions = []
+    upload_time = now_datetime().strftime("%Y-%m-%d %H:%M:%S")
+
+    for line in cstr(body).splitlines():
+        fields = [f.strip() for f in line.split("\t")]
+        if len(fields) < 2 or not fields[0] or not fields[1]:
+            continue
+
+        emp_code, punch_time = fields[0], fields[1]
+        transactions.append(
+            {
+                "id": f"{serial_number}:{emp_code}:{punch_time}",
+                "emp_code": emp_code,
+                "punch_time": punch_time,
+                "punch_state": fields[2] if len(fields) > 2 else "0",
+                "verify_type": fields[3] if len(fields) > 3 else None,
+                "terminal_sn": serial_number,
+                "upload_time": upload_time,
+            }
+        )
+
+    return transactions
+
+
+def get_handshake_options(serial_number):
+    """
+    Reply to the device's `GET /iclock/cdata?options=all` handshake: upload
+    attendance logs in real time and nothing else, starting after the last
+    upload we stored. A device told `None` re-sends its whole log.
+    """
+    return "\n".join(
+        [
+            f"GET OPTION FROM: {serial_number}",
+            f"ATTLOGStamp={get_attlog_stamp(serial_number) or 'None'}",
+            "OPERLOGStamp=9999",
+            "ATTPHOTOStamp=None",
+            "ErrorDelay=30",
+            "Delay=10",
+            "TransTimes=00:00;14:05",
+            "TransInterval=1",
+            "TransFlag=TransData AttLog",
+            "Realtime=1",
+            "Encrypt=None",
+        ]
+    )
+
+
+def get_attlog_stamp(serial_number):
+    return frappe.db.get_default(ATTLOG_STAMP_KEY.format(serial_number))
+
+
+def set_attlog_stamp(serial_number, stamp):
+    """
+    Remember the Stamp of an ATTLOG upload once its punches are queued, so the
+    next handshake asks the device only for newer ones
+    """
+    stamp = cstr(stamp).strip()
+    if stamp and stamp != get_attlog_stamp(serial_number):
+        frappe.db.set_default(ATTLOG_STAMP_KEY.format(serial_number), stamp)
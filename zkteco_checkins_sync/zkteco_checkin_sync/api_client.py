@@ -0,0 +1,234 @@
+# Copyright (c) 2025, osama.ahmed@deliverydevs.com
+# For license information, please see license.txt
+
+import asyncio
+import threading
+
+import frappe
+import requests
+from frappe import _
+from frappe.utils import cint
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+from zkteco_checkins_sync.zkteco_checkin_sync.token_manager import TokenManager
+
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_TIMEOUT = 30
+
+# Sleep between retries is backoff_factor * 2 ** (retry - 1) seconds
+BACKOFF_FACTOR = 0.5
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+
+# Requests in flight per server with the async engine
+DEFAULT_CONCURRENCY = 4
+
+ENGINES = ("Threaded", "Async")
+
+TOKEN_AUTH_PATH = "/api-token-auth/"
+TRANSACTIONS_PATH = "/iclock/api/transactions/"
+
+# One pooled session per (server, pool size, retries), shared for the life of the process
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(base_url, pool_size=DEFAULT_POOL_SIZE, max_retries=DEFAULT_MAX_RETRIES):
+    """
+    Return a keep-alive requests.Session for `base_url`, creating it on first use
+    """
+    key = (base_url, pool_size, max_retries)
+    session = _sessions.get(key)
+    if session:
+        return session
+
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if not session:
+            retry = Retry(
+                total=max_retries,
+                backoff_factor=BACKOFF_FACTOR,
+                status_forcelist=RETRY_STATUS_CODES,
+                allowed_methods=frozenset(["GET", "POST"]),
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[key] = session
+
+    return session
+
+
+class ZKBioTimeClient:
+    """
+    Thin client for the ZKBio Time REST API.
+
+    Requests go through a pooled session that retries 5xx responses and
+    connection errors with exponential backoff. With a `token_manager` the
+    token comes from its shared cache on the first request, and a 401 triggers
+    one refresh using the stored credentials.
+    """
+
+    def __init__(
+        self,
+        server_ip,
+        server_port,
+        token=None,
+        username=None,
+        password=None,
+        pool_size=DEFAULT_POOL_SIZE,
+        max_retries=DEFAULT_MAX_RETRIES,
+        token_manager=None,
+    ):
+        self.base_url = f"http://{server_ip}:{server_port}"
+        self.token = (token or "").strip()
+        self.username = username
+        self.password = password
+        self.token_manager = token_manager
+        self.session = get_session(self.base_url, cint(pool_size) or DEFAULT_POOL_SIZE, cint(max_retries))
+
+    def url(self, path):
+        return f"{self.base_url}{path}"
+
+    def obtain_token(self, timeout=15):
+        """
+        Exchange the stored username/password for an API token
+        """
+        if not (self.username and self.password):
+            frappe.throw(_("Please configure server IP, port, username, and password in ZKTeco Config."))
+
+        resp = self.session.post(
+            self.url(TOKEN_AUTH_PATH),
+            json={"username": self.username, "password": self.password},
+            timeout=timeout,
+        )
+        resp.raise_for_status()
+
+        token = resp.json().get("token")
+        if not token:
+            frappe.throw(_("Token not found in API response."))
+
+        return token
+
+    def ensure_token(self):
+        if self.token_manager:
+            self.token = self.token_manager.get(self.obtain_token)
+        return self.token
+
+    def refresh_token(self):
+        if self.token_manager:
+            self.token = self.token_manager.refresh(self.obtain_token, rejected=self.token)
+        else:
+            self.token = self.obtain_token()
+        return self.token
+
+    def headers(self):
+        if not self.token:
+            self.ensure_token()
+        return {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.token}",
+        }
+
+    def get(self, path, params=None, timeout=DEFAULT_TIMEOUT, **kwargs):
+        """
+        GET `path`, refreshing the token once if the server answers 401
+        """
+        resp = self.session.get(self.url(path), headers=self.headers(), params=params, timeout=timeout, **kwargs)
+
+        if resp.status_code == 401 and self.username and self.password:
+            # A streamed 401 still holds its pooled connection until closed
+            resp.close()
+            self.refresh_token()
+            resp = self.session.get(self.url(path), headers=self.headers(), params=params, timeout=timeout, **kwargs)
+
+        return resp
+
+
+class AsyncZKBioTimeClient:
+    """
+    httpx counterpart of ZKBioTimeClient for the async engine, sharing the
+    wrapped client's token and credentials. Open it with `async with` on the
+    event loop it is used from.
+
+    Retries 5xx responses and connection errors with the same backoff as the
+    pooled session, and refreshes the token once on a 401. The refresh blocks
+    the loop, which only happens when the shared token was rejected.
+    """
+
+    def __init__(self, client, concurrency=DEFAULT_CONCURRENCY, max_retries=DEFAULT_MAX_RETRIES):
+        self.client = client
+        self.concurrency = cint(concurrency) or DEFAULT_CONCURRENCY
+        self.max_retries = cint(max_retries)
+        self.http = None
+        self.token_lock = None
+
+    async def __aenter__(self):
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        self.http = httpx.AsyncClient(base_url=self.client.base_url, limits=limits, timeout=DEFAULT_TIMEOUT)
+        self.token_lock = asyncio.Lock()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.http.aclose()
+
+    async def get(self, path, params=None):
+        token = self.client.token
+        resp = await self.request(path, params)
+
+        if resp.status_code == 401 and self.client.username and self.client.password:
+            async with self.token_lock:
+                # Concurrent requests that got the same 401 refresh only once
+                if self.client.token == token:
+                    self.client.refresh_token()
+            resp = await self.request(path, params)
+
+        return resp
+
+    async def request(self, path, params=None):
+        for attempt in range(self.max_retries + 1):
+            try:
+                resp = await self.http.get(path, params=params, headers=self.client.headers())
+                if resp.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                    return resp
+            except httpx.TransportError:
+                if attempt == self.max_retries:
+                    raise
+            await asyncio.sleep(BACKOFF_FACTOR * 2 ** attempt)
+
+
+def get_engine(name=None):
+    """
+    The sync engine to use for `name` (a Sync Engine setting). "Async" needs
+    httpx; without it the threaded engine is used.
+    """
+    return "Async" if name == "Async" and httpx else "Threaded"
+
+
+def get_client(cfg, server=None, **kwargs):
+    """
+    Build a client for the server on a ZKTeco Config document, or for the
+    ZKTeco Server named `server`. Its token comes from the site-wide
+    TokenManager of that server.
+    """
+    source = frappe.get_doc("ZKTeco Server", server) if server else cfg
+
+    kwargs.setdefault("token_manager", TokenManager(server, cfg.token_lifetime_hours))
+    kwargs.setdefault("pool_size", cfg.http_pool_size)
+    kwargs.setdefault("max_retries", cfg.http_max_retries if cfg.http_max_retries is not None else DEFAULT_MAX_RETRIES)
+    return ZKBioTimeClient(
+        source.server_ip,
+        source.server_port,
+        username=source.username,
+        password=source.get_password("password", raise_exception=False),
+        **kwargs,
+    )
@@ -0,0 +1,288 @@
+# Copyright (c) 2025, osama.ahmed@deliverydevs.com
+# For license information, please see license.txt
+
+import asyncio
+import math
+import queue
+import threading
+import time
+
+import frappe
+from frappe.utils import cint
+
+from zkteco_checkins_sync.zkteco_checkin_sync.api_client import (
+    DEFAULT_CONCURRENCY,
+    DEFAULT_MAX_RETRIES,
+    TRANSACTIONS_PATH,
+    AsyncZKBioTimeClient,
+    get_client,
+)
+from zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_config.zkteco_config import (
+    DEFAULT_PAGE_SIZE,
+    complete_server_sync,
+    extract_transactions,
+    fail_server_sync,
+    get_next_page,
+    get_fetch_requests,
+    get_sync_window_start,
+    get_watermark,
+    new_sync_counts,
+    process_page,
+)
+from zkteco_checkins_sync.zkteco_checkin_sync.transaction_decoder import decode_page, get_decoder
+from zkteco_checkins_sync.zkteco_checkin_sync.transaction_filters import TransactionFilter
+from zkteco_checkins_sync.zkteco_checkin_sync.utils import run_in_site_context
+
+
+# How often a fetcher waiting on a full queue, and the writer waiting on an
+# empty one, check whether the other side has stopped
+QUEUE_POLL_SECONDS = 0.05
+WRITER_POLL_SECONDS = 1
+
+
+class ServerJob:
+    """
+    One server's share of an async run: its client and the query params of its
+    requests, read by the fetcher thread, and its watermark, counters and
+    error, owned by the writer
+    """
+
+    __slots__ = ("server", "client", "watermark", "requests", "counts", "error")
+
+    def __init__(self, server, client, watermark, requests):
+        self.server = server
+        self.client = client
+        self.watermark = watermark
+        self.requests = requests
+        self.counts = new_sync_counts()
+        self.error = None
+
+
+class PageFetcher:
+    """
+    Fetches the pages of every job on an asyncio loop in its own thread and
+    hands them to the writer through a bounded queue.
+
+    Each server gets at most `concurrency` requests in flight. Once the first
+    page of a query gives the row count, the remaining pages are requested
+    together; servers that send no count are followed page by page through
+    `next`. The queue holds `concurrency` pages per server, so the fetcher
+    runs ahead of the writer without buffering a whole window.
+    """
+
+    def __init__(self, cfg, jobs, metrics=None):
+        self.jobs = jobs
+        self.metrics = metrics
+        self.decoder = get_decoder(cfg.json_decoder)
+        self.page_size = cint(cfg.page_size) or DEFAULT_PAGE_SIZE
+        self.concurrency = cint(cfg.async_concurrency) or DEFAULT_CONCURRENCY
+        self.max_retries = cfg.http_max_retries if cfg.http_max_retries is not None else DEFAULT_MAX_RETRIES
+        self.pages = queue.Queue(maxsize=self.concurrency * len(jobs))
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(
+            target=run_in_site_context,
+            args=(frappe.local.site, frappe.local.sites_path, self.run),
+            daemon=True,
+        )
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+
+    def get(self):
+        """
+        The next ("page", job, transactions), ("done", job, None) or ("error", job, exception)
+        """
+        while True:
+            try:
+                return self.pages.get(timeout=WRITER_POLL_SECONDS)
+            except queue.Empty:
+                if not self.thread.is_alive() and self.pages.empty():
+                    raise RuntimeError("ZKTeco page fetcher stopped unexpectedly")
+
+    def run(self):
+        asyncio.run(self.fetch_all())
+        # A token renewed during the run is saved on its source document
+        frappe.db.commit()
+
+    async def fetch_all(self):
+        jobs = asyncio.gather(*(self.fetch_job(job) for job in self.jobs))
+        stopped = asyncio.ensure_future(asyncio.to_thread(self.stopped.wait))
+        try:
+            await asyncio.wait([jobs, stopped], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            jobs.cancel()
+            # Releases the thread waiting on the event once every job is done
+            self.stopped.set()
+            await asyncio.gather(jobs, stopped, return_exceptions=True)
+
+    async def fetch_job(self, job):
+        try:
+            semaphore = asyncio.Semaphore(self.concurrency)
+            async with AsyncZKBioTimeClient(job.client, self.concurrency, self.max_retries) as client:
+                for params in job.requests:
+                    await self.fetch_query(job, client, semaphore, params)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await self.put(("error", job, e))
+        else:
+            await self.put(("done", job, None))
+
+    async def fetch_query(self, job, client, semaphore, params):
+        first = await self.fetch_page(job, client, semaphore, {**params, "page": 1})
+        if not first:
+            return
+
+        data, fetched = first
+        page = 1
+        page_count = get_page_count(data, self.page_size)
+        if page_count > 1:
+            pages = await asyncio.gather(
+                *(self.fetch_page(job, client, semaphore, {**params, "page": number}) for number in range(2, page_count + 1))
+            )
+            if not pages[-1]:
+                return
+            data, page = pages[-1][0], page_count
+            fetched += sum(rows for _, rows in filter(None, pages))
+
+        # Servers without `count`, and rows uploaded after the count was taken
+        while True:
+            page = get_next_page(data, page, self.page_size, fetched)
+            if not page:
+                return
+            result = await self.fetch_page(job, client, semaphore, {**params, "page": page})
+            if not result:
+                return
+            data, rows = result
+            fetched += rows
+
+    async def fetch_page(self, job, client, semaphore, params):
+        """
+        Fetch and queue one page. Returns its `next`/`count` and row count, or
+        None once the query is exhausted.
+        """
+        async with semaphore:
+            if self.stopped.is_set() or job.error:
+                return None
+
+            started = time.monotonic()
+            resp = await client.get(TRANSACTIONS_PATH, params=params)
+            if resp.status_code == 404 and params["page"] > 1:
+                # The window shrank after its count was taken
+                return None
+            resp.raise_for_status()
+
+            data = decode_page(resp, self.decoder)
+            if self.metrics:
+                self.metrics.observe("fetch", time.monotonic() - started)
+                self.metrics.incr("pages")
+            transactions = extract_transactions(data)
+            if not transactions:
+                return None
+
+            # Queued while holding the semaphore, so no new request starts
+            # while the writer is behind
+            await self.put(("page", job, transactions))
+
+        # Only what get_next_page needs, so gathered results don't hold on to the rows
+        info = {key: data[key] for key in ("next", "count") if key in data} if isinstance(data, dict) else None
+        return info, len(transactions)
+
+    async def put(self, item):
+        while not self.stopped.is_set():
+            try:
+                self.pages.put_nowait(item)
+                return
+            except queue.Full:
+                await asyncio.sleep(QUEUE_POLL_SECONDS)
+
+
+def get_page_count(data, page_size):
+    count = data.get("count") if isinstance(data, dict) else None
+    return math.ceil(cint(count) / page_size) if count else 0
+
+
+def sync_servers_async(cfg, servers, employee_map, current_time, lock=None, metrics=None):
+    """
+    Sync `servers` with the async engine and return their results in order,
+    like `sync_server` does for one.
+
+    Pages are fetched with asyncio in a separate thread while this thread,
+    which owns the database connection, stages or inserts each page as it
+    arrives and saves the watermark of every server whose window completed.
+    """
+    jobs = []
+    results = {}
+    for server in servers:
+        try:
+            watermark = get_watermark(server)
+            start_time = get_sync_window_start(cfg, watermark, current_time)
+            client = get_client(cfg, server)
+            # Renewed here, where a new token can be committed
+            client.ensure_token()
+            frappe.db.commit()
+        except Exception as e:
+            fail_server_sync(server, e)
+            results[server] = None
+            continue
+
+        jobs.append(ServerJob(server, client, watermark, get_fetch_requests(cfg, start_time, current_time, watermark)))
+
+    if jobs:
+        write_pages(cfg, jobs, employee_map, current_time, lock, metrics, results)
+
+    return [results.get(server) for server in servers]
+
+
+def write_pages(cfg, jobs, employee_map, current_time, lock, metrics, results):
+    row_filter = TransactionFilter(cfg, employee_map)
+    fetcher = PageFetcher(cfg, jobs, metrics)
+    pending = set(jobs)
+
+    fetcher.start()
+    try:
+        while pending:
+            try:
+                kind, job, payload = fetcher.get()
+            except RuntimeError as e:
+                # Nothing more will arrive for the servers still pending
+                for job in pending:
+                    job.error = job.error or e
+                    results[job.server] = finish_job(job, current_time, lock, metrics)
+                break
+
+            if kind == "page":
+                if not job.error:
+                    try:
+                        if lock:
+                            lock.verify()
+                        process_page(cfg, job.server, payload, employee_map, job.counts, job.watermark, row_filter, metrics)
+                    except Exception as e:
+                        # The fetcher stops requesting this server's pages
+                        job.error = e
+                        frappe.db.rollback()
+                continue
+
+            if kind == "error":
+                job.error = job.error or payload
+            pending.discard(job)
+            results[job.server] = finish_job(job, current_time, lock, metrics)
+    finally:
+        fetcher.stop()
+
+
+def finish_job(job, current_time, lock=None, metrics=None):
+    if job.error:
+        fail_server_sync(job.server, job.error)
+        return None
+
+    try:
+        return complete_server_sync(job.server, job.watermark, job.counts, current_time, lock, metrics)
+    except Exception as e:
+        fail_server_sync(job.server, e)
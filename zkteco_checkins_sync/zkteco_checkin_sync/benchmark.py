@@ -0,0 +1,499 @@
+# Copyright (c) 2025, osama.ahmed@deliverydevs.com
+# For license information, please see license.txt
+
+import json
+import math
+import random
+from bisect import bisect_right
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+import frappe
+from frappe.utils import cint, get_datetime, now_datetime
+from frappe.utils.password import get_decrypted_password, remove_encrypted_password, set_encrypted_password
+
+from zkteco_checkins_sync.zkteco_checkin_sync.api_client import TOKEN_AUTH_PATH, TRANSACTIONS_PATH
+from zkteco_checkins_sync.zkteco_checkin_sync.config_snapshot import clear_config_cache
+from zkteco_checkins_sync.zkteco_checkin_sync.token_manager import TokenManager
+
+
+BENCHMARK_TOKEN = "zkteco-benchmark-token"
+BENCHMARK_TERMINAL = "zkteco-benchmark"
+BENCHMARK_CODE_PREFIX = "ZKBENCH"
+BENCHMARK_SERIAL = "BENCH0001"
+
+# Each fake employee punches about once a minute, well clear of the duplicate tolerance
+PUNCH_INTERVAL_SECONDS = 60
+
+SCENARIOS = ("sync", "backfill", "test_connection")
+
+# How the fake server lists the rows of a window across its pages. "shuffled"
+# also varies the latency of each request, so pages fetched concurrently
+# complete out of order.
+PAGE_ORDERS = ("ascending", "descending", "shuffled")
+
+# Scenarios that should turn every generated punch into a checkin
+INSERTING_SCENARIOS = ("sync", "backfill")
+
+# ZKTeco Config fields the benchmark points at the fake server and restores afterwards
+CONFIG_FIELDS = (
+    "enable_sync",
+    "server_ip",
+    "server_port",
+    "page_size",
+    "use_staging_queue",
+    "filter_terminals",
+    "filter_areas",
+    "filter_departments",
+    "only_mapped_employees",
+    "last_sync",
+    "last_transaction_id",
+    "last_upload_time",
+)
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class FakePunches:
+    """
+    `count` punches spread evenly from `base_time`, generated on demand so a
+    million of them cost no memory. Punch i has id i, and ids increase with time.
+    """
+
+    def __init__(self, count, employees, base_time):
+        self.count = count
+        self.employees = employees
+        self.base_time = base_time
+        self.step = max(PUNCH_INTERVAL_SECONDS * employees / count, 0.001)
+        self.end_time = base_time + timedelta(seconds=self.step * count)
+
+    def id_range(self, start_time, end_time):
+        """
+        First and last id punched within [start_time, end_time]
+        """
+        first = max(1, math.ceil((start_time - self.base_time).total_seconds() / self.step) + 1)
+        last = min(self.count, math.floor((end_time - self.base_time).total_seconds() / self.step) + 1)
+        return first, last
+
+    def get(self, transaction_id):
+        punch_time = self.base_time + timedelta(seconds=self.step * (transaction_id - 1))
+        return {
+            "id": transaction_id,
+            "emp_code": get_employee_code(transaction_id % self.employees),
+            "punch_time": punch_time.strftime(TIME_FORMAT),
+            "punch_state": str(transaction_id // self.employees % 2),
+            "verify_type": 1,
+            "terminal_sn": BENCHMARK_SERIAL,
+            "terminal_alias": BENCHMARK_TERMINAL,
+            "upload_time": punch_time.strftime(TIME_FORMAT),
+        }
+
+
+def get_employee_code(index):
+    return f"{BENCHMARK_CODE_PREFIX}{index:06d}"
+
+
+def get_employee_index(code, employees):
+    """
+    Index of a fake emp_code, or None for any other code
+    """
+    suffix = code[len(BENCHMARK_CODE_PREFIX) :] if code.startswith(BENCHMARK_CODE_PREFIX) else ""
+    return int(suffix) if suffix.isdigit() and int(suffix) < employees else None
+
+
+class PunchWindow:
+    """
+    The ids one request matches: those in [first, last] whose employee index
+    is in `indexes`, listed in `order`. Worked out arithmetically, since punch
+    i belongs to employee i % employees, so no id list is built.
+    """
+
+    def __init__(self, punches, first, last, indexes=None, order="ascending"):
+        self.employees = punches.employees
+        self.indexes = sorted(range(self.employees) if indexes is None else indexes)
+        self.order = order
+        self.skip = self.rank(first - 1)
+        self.count = max(0, self.rank(last) - self.skip)
+        self.stride = get_stride(self.count)
+
+    def rank(self, transaction_id):
+        """
+        Number of matching ids from 0 to `transaction_id`
+        """
+        if transaction_id < 0:
+            return 0
+        cycles, rest = divmod(transaction_id, self.employees)
+        return cycles * len(self.indexes) + bisect_right(self.indexes, rest)
+
+    def id_at(self, position):
+        if self.order == "descending":
+            position = self.count - 1 - position
+        elif self.order == "shuffled":
+            position = position * self.stride % self.count
+        cycles, index = divmod(self.skip + position, len(self.indexes))
+        return cycles * self.employees + self.indexes[index]
+
+
+def get_stride(count):
+    """
+    A step coprime with `count`, so stepping through the positions by it visits each once
+    """
+    stride = 7919
+    while count > 1 and math.gcd(stride, count) != 1:
+        stride += 1
+    return stride
+
+
+class FakeZKBioTimeServer:
+    """
+    Local stand-in for ZKBio Time: `/api-token-auth/` and a paginated
+    `/iclock/api/transactions/`, with per-request latency and a 503 error rate.
+    Honors the `emp_code` and `terminal_sn` filters and lists rows in `order`.
+    """
+
+    def __init__(self, punches, latency_ms=0, error_rate=0.0, order="ascending"):
+        self.punches = punches
+        self.latency = latency_ms / 1000
+        self.error_rate = error_rate
+        self.order = order
+        self.requests = 0
+        self.errors = 0
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self.make_handler())
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def reply(self, status, body):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def inject_failure(self):
+                """
+                Apply the configured latency, and answer 503 for the configured share of requests
+                """
+                server.requests += 1
+                if server.latency:
+                    jitter = random.uniform(0.5, 1.5) if server.order == "shuffled" else 1
+                    time.sleep(server.latency * jitter)
+                if server.error_rate and random.random() < server.error_rate:
+                    server.errors += 1
+                    self.reply(503, {"detail": "Injected benchmark error"})
+                    return True
+                return False
+
+            def do_POST(self):
+                self.rfile.read(cint(self.headers.get("Content-Length")))
+                if self.inject_failure():
+                    return
+                if urlparse(self.path).path != TOKEN_AUTH_PATH:
+                    return self.reply(404, {"detail": "Not found"})
+                self.reply(200, {"token": BENCHMARK_TOKEN})
+
+            def do_GET(self):
+                if self.inject_failure():
+                    return
+                url = urlparse(self.path)
+                if url.path != TRANSACTIONS_PATH:
+                    return self.reply(404, {"detail": "Not found"})
+                if self.headers.get("Authorization") != f"Bearer {BENCHMARK_TOKEN}":
+                    return self.reply(401, {"detail": "Invalid token"})
+                self.reply(200, server.get_page(parse_qs(url.query)))
+
+        return Handler
+
+    def get_page(self, query):
+        param = lambda key, default=None: query.get(key, [default])[0]
+        page = max(cint(param("page", 1)), 1)
+        page_size = cint(param("page_size", 10)) or 10
+        first, last = self.punches.id_range(get_datetime(param("start_time")), get_datetime(param("end_time")))
+        window = PunchWindow(self.punches, first, last, self.get_employee_indexes(param), self.order)
+
+        start = (page - 1) * page_size
+        data = [self.punches.get(window.id_at(i)) for i in range(start, min(start + page_size, window.count))]
+        next_link = None
+        if start + page_size < window.count:
+            next_query = {k: v[0] for k, v in query.items()}
+            next_query["page"] = page + 1
+            next_link = f"http://127.0.0.1:{self.port}{TRANSACTIONS_PATH}?{urlencode(next_query)}"
+
+        return {"count": window.count, "next": next_link, "previous": None, "msg": "", "code": 0, "data": data}
+
+    def get_employee_indexes(self, param):
+        """
+        Employee indexes the filters of a request allow, or None for all of them
+        """
+        terminals = param("terminal_sn")
+        if terminals and BENCHMARK_SERIAL not in terminals.split(","):
+            return []
+        codes = param("emp_code")
+        if not codes:
+            return None
+        indexes = (get_employee_index(code, self.punches.employees) for code in codes.split(","))
+        return {index for index in indexes if index is not None}
+
+
+@contextmanager
+def count_queries():
+    """
+    Count SQL statements from every thread's connection while the block runs
+    """
+    from frappe.database.database import Database
+
+    counter = {"queries": 0}
+    lock = threading.Lock()
+    original = Database.sql
+
+    def sql(self, *args, **kwargs):
+        with lock:
+            counter["queries"] += 1
+        return original(self, *args, **kwargs)
+
+    Database.sql = sql
+    try:
+        yield counter
+    finally:
+        Database.sql = original
+
+
+@contextmanager
+def pointed_at(server, only_mapped_employees=False):
+    """
+    Point ZKTeco Config at the fake server with every ZKTeco Server disabled
+    and no server-side filters but `only_mapped_employees`, restoring the
+    real settings and token afterwards
+    """
+    saved = {field: frappe.db.get_single_value("ZKTeco Config", field) for field in CONFIG_FIELDS}
+    saved_token = get_decrypted_password("ZKTeco Config", "ZKTeco Config", "token", raise_exception=False)
+    enabled_servers = frappe.get_all("ZKTeco Server", filters={"enabled": 1}, pluck="name")
+    token_manager = TokenManager()
+
+    try:
+        for name in enabled_servers:
+            frappe.db.set_value("ZKTeco Server", name, "enabled", 0, update_modified=False)
+        for field, value in {
+            "enable_sync": 1,
+            "server_ip": "127.0.0.1",
+            "server_port": str(server.port),
+            "use_staging_queue": 0,
+            "filter_terminals": None,
+            "filter_areas": None,
+            "filter_departments": None,
+            "only_mapped_employees": cint(only_mapped_employees),
+        }.items():
+            frappe.db.set_single_value("ZKTeco Config", field, value)
+        token_manager.store(BENCHMARK_TOKEN)
+        frappe.db.commit()
+        # set_single_value skips on_update, so drop the cached snapshot by hand
+        clear_config_cache()
+        yield
+    finally:
+        frappe.db.rollback()
+        for field, value in saved.items():
+            frappe.db.set_single_value("ZKTeco Config", field, value)
+        # Reloaded from the document on the next sync, and renewed if needed
+        token_manager.clear()
+        if saved_token:
+            set_encrypted_password("ZKTeco Config", "ZKTeco Config", saved_token, "token")
+            frappe.db.set_single_value("ZKTeco Config", "token", "*" * len(saved_token))
+        else:
+            remove_encrypted_password("ZKTeco Config", "ZKTeco Config", "token")
+            frappe.db.set_single_value("ZKTeco Config", "token", None)
+        for name in enabled_servers:
+            frappe.db.set_value("ZKTeco Server", name, "enabled", 1, update_modified=False)
+        frappe.db.commit()
+        clear_config_cache()
+
+
+def ensure_benchmark_employees(count):
+    """
+    Create Employees whose attendance device id is a fake emp_code, once per site
+    """
+    existing = set(
+        frappe.get_all("Employee", filters={"attendance_device_id": ["like", f"{BENCHMARK_CODE_PREFIX}%"]}, pluck="attendance_device_id")
+    )
+    company = frappe.db.get_single_value("Global Defaults", "default_company") or frappe.db.get_value("Company", {}, "name")
+    for index in range(count):
+        code = get_employee_code(index)
+        if code in existing:
+            continue
+        frappe.get_doc(
+            {
+                "doctype": "Employee",
+                "first_name": "ZKTeco Benchmark",
+                "last_name": str(index),
+                "gender": "Male",
+                "date_of_birth": "1990-01-01",
+                "date_of_joining": "2020-01-01",
+                "company": company,
+                "status": "Active",
+                "attendance_device_id": code,
+            }
+        ).insert(ignore_permissions=True)
+    frappe.db.commit()
+
+
+def reset_benchmark_data(punches):
+    """
+    Remove checkins and backfill checkpoints left by a previous scenario and rewind the watermark
+    """
+    frappe.db.delete("Employee Checkin", {"device_id": ["like", f"{BENCHMARK_TERMINAL} (%"]})
+    frappe.db.delete("ZKTeco Backfill Chunk", {"server": ["is", "not set"], "start_time": [">=", punches.base_time]})
+    frappe.db.set_single_value("ZKTeco Config", "last_sync", punches.base_time - timedelta(seconds=1))
+    frappe.db.set_single_value("ZKTeco Config", "last_transaction_id", 0)
+    frappe.db.set_single_value("ZKTeco Config", "last_upload_time", None)
+    frappe.db.commit()
+
+
+def run_scenario(name, punches, chunk, workers):
+    from zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_backfill_chunk.zkteco_backfill_chunk import run_backfill
+    from zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_config.zkteco_config import (
+        sync_zkteco_transactions,
+        test_connection,
+    )
+
+    if name == "sync":
+        # No overlap so the window starts exactly at the first fake punch
+        frappe.db.set_single_value("ZKTeco Config", "sync_overlap_seconds", 0)
+        return lambda: sync_zkteco_transactions(trigger="benchmark")
+    if name == "backfill":
+        return lambda: run_backfill(punches.base_time, punches.end_time, chunk=chunk, workers=workers, echo=lambda message: None)
+    return test_connection
+
+
+def measure(name, punches, chunk, workers):
+    """
+    Run one scenario and return rows/s, DB queries per punch and peak Python memory
+    """
+    reset_benchmark_data(punches)
+    overlap = frappe.db.get_single_value("ZKTeco Config", "sync_overlap_seconds")
+    fn = run_scenario(name, punches, chunk, workers)
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        with count_queries() as counter:
+            fn()
+        elapsed = time.perf_counter() - started
+        _current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        frappe.db.set_single_value("ZKTeco Config", "sync_overlap_seconds", overlap)
+        frappe.db.commit()
+
+    inserted = frappe.db.count("Employee Checkin", {"device_id": ["like", f"{BENCHMARK_TERMINAL} (%"]})
+    if name in INSERTING_SCENARIOS and inserted != punches.count:
+        frappe.throw(f"ZKTeco benchmark {name} inserted {inserted} checkins for {punches.count} generated punches")
+    return {
+        "scenario": name,
+        "punches": punches.count,
+        "inserted": inserted,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(inserted / elapsed, 1) if inserted else 0,
+        "queries": counter["queries"],
+        "queries_per_punch": round(counter["queries"] / max(inserted, 1), 2),
+        "peak_memory_mb": round(peak / 1024 / 1024, 1),
+    }
+
+
+def run_benchmark(
+    sizes=(1000,),
+    scenarios=SCENARIOS,
+    employees=1000,
+    latency_ms=0,
+    error_rate=0.0,
+    page_size=500,
+    chunk="1h",
+    workers=4,
+    order="ascending",
+    only_mapped_employees=False,
+    echo=None,
+):
+    """
+    Run each scenario against a fake ZKBio Time server holding each of `sizes` punches.
+
+    Sync and backfill fail unless every generated punch becomes a checkin,
+    whatever `order` the server lists them in. Only for test sites
+    (`allow_tests` in site config): it creates benchmark Employees and
+    checkins and temporarily repoints ZKTeco Config.
+    """
+    if order not in PAGE_ORDERS:
+        frappe.throw(f"Unknown page order {order}; use one of {', '.join(PAGE_ORDERS)}")
+    if not frappe.conf.allow_tests:
+        frappe.throw("Set allow_tests in site config to run the ZKTeco benchmark; it writes benchmark data to the site")
+
+    echo = echo or frappe.logger().info
+    frappe.set_user("Administrator")
+    ensure_benchmark_employees(employees)
+
+    results = []
+    for size in sizes:
+        # The last punch lands a minute ago so today's window seen by test_connection has data
+        span = timedelta(seconds=PUNCH_INTERVAL_SECONDS * employees)
+        punches = FakePunches(size, employees, now_datetime().replace(microsecond=0) - span - timedelta(minutes=1))
+        with (
+            FakeZKBioTimeServer(punches, latency_ms, error_rate, order) as server,
+            pointed_at(server, only_mapped_employees),
+        ):
+            frappe.db.set_single_value("ZKTeco Config", "page_size", page_size)
+            frappe.db.commit()
+            for name in scenarios:
+                result = measure(name, punches, chunk, workers)
+                result["http_requests"], result["http_errors"] = server.requests, server.errors
+                server.requests = server.errors = 0
+                results.append(result)
+                echo(format_result(result))
+            reset_benchmark_data(punches)
+
+    return results
+
+
+def format_result(result):
+    return (
+        f"{result['scenario']:<16} {result['punches']:>9} punches  {result['inserted']:>9} inserted  "
+        f"{result['seconds']:>9.2f}s  {result['rows_per_second']:>9.1f} rows/s  "
+        f"{result['queries_per_punch']:>6.2f} queries/punch  {result['peak_memory_mb']:>7.1f} MB peak"
+    )
+
+
+def compare_with_baseline(results, baseline, tolerance=20):
+    """
+    Regressions against an earlier run: rows/s down, or queries/punch or peak
+    memory up, by more than `tolerance` percent
+    """
+    previous = {(r["scenario"], r["punches"]): r for r in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get((result["scenario"], result["punches"]))
+        if not before:
+            continue
+        for metric, worse in (("rows_per_second", -1), ("queries_per_punch", 1), ("peak_memory_mb", 1)):
+            old, new = before[metric], result[metric]
+            if old and worse * (new - old) / old * 100 > tolerance:
+                regressions.append(f"{result['scenario']} @ {result['punches']}: {metric} {old} -> {new}")
+    return regressions
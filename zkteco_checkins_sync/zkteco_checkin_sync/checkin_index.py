@@ -0,0 +1,97 @@
+# Copyright (c) 2025, osama.ahmed@deliverydevs.com
+# For license information, please see license.txt
+
+import re
+from collections import defaultdict
+from datetime import timedelta
+
+import frappe
+from frappe.utils import cstr
+
+
+# Punches by the same employee on the same device within this many seconds are duplicates
+DUPLICATE_TOLERANCE_SECONDS = 5
+
+# Suffix appended to device_id by the sync, e.g. "Main_Entrance (ZKTeco-42)"
+ZKTECO_SUFFIX = re.compile(r"\s*\(ZKTeco-[^)]*\)$")
+
+
+def device_key(device_id):
+    """
+    Strip the ZKTeco transaction suffix so stored and incoming device ids compare equal
+    """
+    return ZKTECO_SUFFIX.sub("", cstr(device_id))
+
+
+class CheckinIndex:
+    """
+    In-memory index of existing Employee Checkins keyed by
+    (employee, device, time bucket), where a bucket is `tolerance` seconds wide.
+
+    A punch only has to be compared with its own and the two neighbouring
+    buckets, so each lookup is O(1) regardless of how many checkins are loaded.
+    ZKTeco transaction ids that are already stored are tracked alongside.
+    """
+
+    def __init__(self, tolerance=DUPLICATE_TOLERANCE_SECONDS):
+        self.tolerance = tolerance
+        self.buckets = defaultdict(list)
+        self.transaction_ids = set()
+
+    @classmethod
+    def load(cls, employees, start_time, end_time, transaction_ids=None, tolerance=DUPLICATE_TOLERANCE_SECONDS):
+        """
+        Index every checkin of `employees` between start_time and end_time with one
+        query, plus which of `transaction_ids` already exist with a second indexed one
+        """
+        index = cls(tolerance)
+
+        transaction_ids = list(set(filter(None, transaction_ids or [])))
+        if transaction_ids:
+            index.transaction_ids.update(
+                frappe.get_all(
+                    "Employee Checkin",
+                    filters={"zkteco_transaction_id": ["in", transaction_ids]},
+                    pluck="zkteco_transaction_id",
+                )
+            )
+
+        employees = list(set(filter(None, employees)))
+        if not employees or not start_time or not end_time:
+            return index
+
+        padding = timedelta(seconds=tolerance)
+        existing = frappe.get_all(
+            "Employee Checkin",
+            filters={
+                "employee": ["in", employees],
+                "time": ["between", [start_time - padding, end_time + padding]],
+            },
+            fields=["employee", "device_id", "time"],
+            order_by="time asc",
+        )
+        for checkin in existing:
+            index.add(checkin.employee, checkin.device_id, checkin.time)
+
+        return index
+
+    def _bucket(self, punch_time):
+        return int(punch_time.timestamp() // self.tolerance)
+
+    def add(self, employee, device_id, punch_time, transaction_id=None):
+        key = (employee, device_key(device_id), self._bucket(punch_time))
+        self.buckets[key].append(punch_time)
+        if transaction_id:
+            self.transaction_ids.add(transaction_id)
+
+    def has_transaction(self, transaction_id):
+        return bool(transaction_id) and transaction_id in self.transaction_ids
+
+    def contains(self, employee, device_id, punch_time):
+        device = device_key(device_id)
+        bucket = self._bucket(punch_time)
+        for candidate in (bucket - 1, bucket, bucket + 1):
+            for existing_time in self.buckets.get((employee, device, candidate), ()):
+                if abs((existing_time - punch_time).total_seconds()) <= self.tolerance:
+                    return True
+        return False
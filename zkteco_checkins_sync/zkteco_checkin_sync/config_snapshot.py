@@ -0,0 +1,106 @@
+# Copyright (c) 2025, osama.ahmed@deliverydevs.com
+# For license information, please see license.txt
+
+import json
+from types import MappingProxyType
+
+import frappe
+from frappe.utils.password import get_decrypted_password
+
+
+CONFIG_DOCTYPE = "ZKTeco Config"
+
+SNAPSHOT_KEY = "zkteco_config_snapshot"
+VERSION_KEY = "zkteco_config_snapshot_version"
+
+# Safety net for changes that bypass on_update, such as a direct database edit
+SNAPSHOT_TTL = 600
+
+# Written by the sync itself with set_single_value, which skips on_update;
+# these are read from the database where needed, never from a snapshot
+STATE_FIELDS = ("last_sync", "last_transaction_id", "last_upload_time", "total_synced_records")
+
+# Per-site snapshots of this process, reused while Redis holds the same version
+_snapshots = {}
+
+
+class ConfigSnapshot:
+    """
+    Read-only settings of ZKTeco Config at one version.
+
+    Exposes fields as attributes like the document, plus `get_password`, so it
+    can be passed wherever the sync used the document.
+    """
+
+    __slots__ = ("_values", "_passwords", "version")
+
+    def __init__(self, values, version):
+        object.__setattr__(self, "_values", MappingProxyType(dict(values)))
+        object.__setattr__(self, "_passwords", {})
+        object.__setattr__(self, "version", version)
+
+    def __getattr__(self, name):
+        if name in STATE_FIELDS:
+            raise AttributeError(f"{name} is sync state, not part of the ZKTeco Config snapshot")
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ZKTeco Config snapshots are read-only")
+
+    def get(self, name, default=None):
+        return self._values.get(name, default)
+
+    def get_password(self, fieldname="password", raise_exception=True):
+        # Decrypted on first use and kept in this process only, never in Redis
+        if fieldname not in self._passwords:
+            password = get_decrypted_password(CONFIG_DOCTYPE, CONFIG_DOCTYPE, fieldname, raise_exception=raise_exception)
+            if password is None:
+                return None
+            self._passwords[fieldname] = password
+        return self._passwords[fieldname]
+
+
+def get_config():
+    """
+    The current ZKTeco Config snapshot: this process's copy while Redis holds
+    the same version, else the copy in Redis, else rebuilt from the database.
+    Costs one Redis GET when nothing changed.
+    """
+    cache = frappe.cache()
+    version_key, snapshot_key = cache.make_key(VERSION_KEY), cache.make_key(SNAPSHOT_KEY)
+
+    version = cache.get(version_key)
+    version = version.decode() if version else None
+    snapshot = _snapshots.get(frappe.local.site)
+    if snapshot and version and snapshot.version == version:
+        return snapshot
+
+    raw = cache.get(snapshot_key) if version else None
+    data = json.loads(raw) if raw else None
+    if data and data["version"] == version:
+        snapshot = ConfigSnapshot(data["values"], version)
+    else:
+        snapshot = load_config()
+        pipe = cache.pipeline()
+        pipe.set(snapshot_key, json.dumps({"version": snapshot.version, "values": dict(snapshot._values)}, default=str), ex=SNAPSHOT_TTL)
+        pipe.set(version_key, snapshot.version, ex=SNAPSHOT_TTL)
+        pipe.execute()
+
+    _snapshots[frappe.local.site] = snapshot
+    return snapshot
+
+
+def load_config():
+    doc = frappe.get_single(CONFIG_DOCTYPE)
+    values = {key: value for key, value in doc.as_dict(no_default_fields=True).items() if key not in STATE_FIELDS}
+    # A fresh version per load, not `modified`: set_single_value changes settings
+    # without touching it, and other processes must still notice the reload
+    return ConfigSnapshot(values, frappe.generate_hash(length=10))
+
+
+def clear_config_cache():
+    frappe.cache().delete(frappe.cache().make_key(VERSION_KEY), frappe.cache().make_key(SNAPSHOT_KEY))
+    _snapshots.pop(frappe.local.site, None)
@@ -0,0 +1,77 @@
+# Copyright (c) 2025, osama.ahmed@deliverydevs.com and Contributors
+# See license.txt
+
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_backfill_chunk.zkteco_backfill_chunk import (
+	backfill,
+	get_backfill_range,
+	get_chunk_name,
+	parse_chunk,
+	split_range,
+)
+
+
+class TestZKTecoBackfillChunk(FrappeTestCase):
+	def test_parse_chunk(self):
+		self.assertEqual(parse_chunk("30m"), timedelta(minutes=30))
+		self.assertEqual(parse_chunk("6h"), timedelta(hours=6))
+		self.assertEqual(parse_chunk(" 1D "), timedelta(days=1))
+		self.assertEqual(parse_chunk("2w"), timedelta(weeks=2))
+
+	def test_parse_chunk_rejects_invalid_sizes(self):
+		for chunk in ("", None, "0d", "d", "1", "1.5h", "1y", "-1d", "1d2h"):
+			with self.subTest(chunk=chunk), self.assertRaises(frappe.ValidationError):
+				parse_chunk(chunk)
+
+	def test_split_range_covers_the_range_without_gaps(self):
+		start, end = datetime(2025, 1, 1), datetime(2025, 1, 3, 12)
+
+		chunks = list(split_range(start, end, timedelta(days=1)))
+
+		self.assertEqual(
+			chunks,
+			[
+				(datetime(2025, 1, 1), datetime(2025, 1, 2)),
+				(datetime(2025, 1, 2), datetime(2025, 1, 3)),
+				(datetime(2025, 1, 3), datetime(2025, 1, 3, 12)),
+			],
+		)
+
+	def test_split_range_boundaries(self):
+		start = datetime(2025, 1, 1)
+
+		# An exact multiple of the step leaves no empty chunk at the end
+		self.assertEqual(len(list(split_range(start, start + timedelta(hours=6), timedelta(hours=1)))), 6)
+		# A step longer than the range is clipped to it
+		self.assertEqual(list(split_range(start, start + timedelta(hours=1), timedelta(days=1))), [(start, start + timedelta(hours=1))])
+		self.assertEqual(list(split_range(start, start, timedelta(days=1))), [])
+
+	def test_backfill_range(self):
+		self.assertEqual(
+			get_backfill_range("2025-01-01", "2025-01-02 06:00:00"),
+			(datetime(2025, 1, 1), datetime(2025, 1, 2, 6)),
+		)
+		for start, end in (("2025-01-02", "2025-01-01"), ("2025-01-01", "2025-01-01")):
+			with self.subTest(start=start, end=end), self.assertRaises(frappe.ValidationError):
+				get_backfill_range(start, end)
+
+	def test_chunk_names_are_deterministic(self):
+		start, end = datetime(2025, 1, 1), datetime(2025, 1, 2)
+
+		self.assertEqual(get_chunk_name(None, start, end), "default 2025-01-01 00:00:00 - 2025-01-02 00:00:00")
+		self.assertEqual(get_chunk_name("Branch", start, end), "Branch 2025-01-01 00:00:00 - 2025-01-02 00:00:00")
+
+	def test_backfill_reports_a_backfill_already_queued(self):
+		with patch.object(frappe, "only_for"), patch.object(frappe, "enqueue", return_value=None) as enqueue:
+			result = backfill("2025-01-01", "2025-01-02")
+
+		self.assertFalse(result["queued"])
+		self.assertTrue(enqueue.call_args.kwargs["deduplicate"])
+
+		with patch.object(frappe, "only_for"), patch.object(frappe, "enqueue", return_value=object()):
+			self.assertTrue(backfill("2025-01-01", "2025-01-02")["queued"])
@@ -0,0 +1,256 @@
+# Copyright (c) 2025, osama.ahmed@deliverydevs.com
+# For license information, please see license.txt
+
+import re
+import threading
+import time
+from datetime import timedelta
+
+import frappe
+from frappe import _
+from frappe.model.document import Document
+from frappe.utils import cint, format_duration, get_datetime, now_datetime
+
+from zkteco_checkins_sync.zkteco_checkin_sync.config_snapshot import get_config
+from zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_config.zkteco_config import (
+    get_enabled_servers,
+    increment_total_synced,
+    sync_window,
+)
+from zkteco_checkins_sync.zkteco_checkin_sync.employee_resolver import get_employee_code_map
+from zkteco_checkins_sync.zkteco_checkin_sync.sync_lock import SyncLock
+from zkteco_checkins_sync.zkteco_checkin_sync.utils import run_concurrently
+
+
+DOCTYPE = "ZKTeco Backfill Chunk"
+BACKFILL_METHOD = "zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_backfill_chunk.zkteco_backfill_chunk.run_backfill"
+
+DEFAULT_CHUNK = "1d"
+DEFAULT_BACKFILL_WORKERS = 4
+CHUNK_UNITS = {"m": "minutes", "h": "hours", "d": "days", "w": "weeks"}
+
+# One backfill per site at a time; the lease is renewed as chunks finish
+BACKFILL_LOCK_NAME = "backfill"
+BACKFILL_LOCK_TTL = 1800
+
+# A job that times out can simply be queued again; completed chunks are skipped
+BACKFILL_JOB_TIMEOUT = 6 * 3600
+
+
+class ZKTecoBackfillChunk(Document):
+    pass
+
+
+@frappe.whitelist()
+def backfill(start, end=None, chunk=DEFAULT_CHUNK, workers=DEFAULT_BACKFILL_WORKERS, server=None):
+    """
+    Queue a historical backfill of `start`..`end` (now when empty) on the long
+    queue. Only one backfill job is queued or running at a time; while one is,
+    the request is refused rather than dropped silently.
+    """
+    frappe.only_for(("System Manager", "HR Manager"))
+
+    start_time, end_time = get_backfill_range(start, end)
+    parse_chunk(chunk)
+
+    job = frappe.enqueue(
+        BACKFILL_METHOD,
+        queue="long",
+        timeout=BACKFILL_JOB_TIMEOUT,
+        job_id="zkteco_backfill",
+        deduplicate=True,
+        start=str(start_time),
+        end=str(end_time),
+        chunk=chunk,
+        workers=cint(workers) or DEFAULT_BACKFILL_WORKERS,
+        server=server,
+    )
+    if not job:
+        # Deduplicated against the job already queued or running
+        return {"queued": False, "message": _("A ZKTeco backfill is already queued or running. Try again once it has finished.")}
+    return {"queued": True, "message": _("Backfill from {0} to {1} queued").format(start_time, end_time)}
+
+
+def run_backfill(start, end=None, chunk=DEFAULT_CHUNK, workers=DEFAULT_BACKFILL_WORKERS, server=None, echo=None):
+    """
+    Fetch and insert every transaction between `start` and `end`, split into
+    `chunk` sized ranges (e.g. "30m", "6h", "1d", "1w") run `workers` at a time.
+
+    Each chunk is checkpointed as a ZKTeco Backfill Chunk, so running the same
+    backfill again after an interruption only redoes chunks that did not
+    complete. `echo` receives a progress line with throughput and ETA per chunk.
+    """
+    echo = echo or frappe.logger().info
+    start_time, end_time = get_backfill_range(start, end)
+    step = parse_chunk(chunk)
+
+    cfg = get_config()
+    servers = [server] if server else ([None] if cfg.token or cfg.username else []) + get_enabled_servers()
+    if not servers:
+        frappe.throw(_("ZKTeco token not configured"))
+
+    lock = SyncLock(BACKFILL_LOCK_NAME, ttl=BACKFILL_LOCK_TTL, trigger="backfill")
+    if not lock.acquire():
+        frappe.throw(_("Another ZKTeco backfill is already running"))
+
+    try:
+        names, total = plan_chunks(servers, start_time, end_time, step)
+        echo(f"{total} chunks, {total - len(names)} already completed, {len(names)} to run")
+        if not names:
+            return {"chunks": total, "completed": total, "failed": 0, "processed": 0}
+
+        employee_map = get_employee_code_map(use_redis=bool(cfg.cache_employee_map_in_redis))
+        progress = BackfillProgress(len(names), echo)
+
+        def run(name):
+            result = run_chunk(name, cfg, employee_map)
+            lock.extend()
+            progress.update(result)
+            return result
+
+        results = [r for r in run_concurrently(run, names, max_workers=cint(workers) or DEFAULT_BACKFILL_WORKERS) if isinstance(r, dict)]
+    finally:
+        lock.release()
+
+    processed = sum(r["processed"] for r in results)
+    increment_total_synced(processed)
+
+    if cfg.use_staging_queue and any(r["staged"] for r in results):
+        from zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_transaction_log.zkteco_transaction_log import enqueue_staging_drain
+        enqueue_staging_drain(cfg)
+
+    failed = len(names) - sum(1 for r in results if r["status"] == "Completed")
+    echo(progress.summary())
+    return {"chunks": total, "completed": total - failed, "failed": failed, "processed": processed}
+
+
+def get_backfill_range(start, end=None):
+    start_time = get_datetime(start)
+    end_time = get_datetime(end) if end else now_datetime()
+    if not start_time or start_time >= end_time:
+        frappe.throw(_("Backfill start must be before its end"))
+    return start_time, end_time
+
+
+def parse_chunk(chunk):
+    """
+    "30m", "6h", "1d" or "1w" as a timedelta
+    """
+    match = re.fullmatch(r"\s*(\d+)\s*([mhdw])\s*", str(chunk or "").lower())
+    if not match or not cint(match.group(1)):
+        frappe.throw(_("Invalid chunk size {0}. Use a number followed by m, h, d or w, e.g. 1d").format(chunk))
+    return timedelta(**{CHUNK_UNITS[match.group(2)]: cint(match.group(1))})
+
+
+def split_range(start_time, end_time, step):
+    while start_time < end_time:
+        yield start_time, min(start_time + step, end_time)
+        start_time += step
+
+
+def get_chunk_name(server, start_time, end_time):
+    # Deterministic, so rerunning the same backfill finds its earlier checkpoints
+    return f"{server or 'default'} {start_time:%Y-%m-%d %H:%M:%S} - {end_time:%Y-%m-%d %H:%M:%S}"
+
+
+def plan_chunks(servers, start_time, end_time, step):
+    """
+    Create a checkpoint for every chunk of every server and return the names of
+    those still to run, along with the total number of chunks
+    """
+    names = []
+    total = 0
+    for server in servers:
+        for chunk_start, chunk_end in split_range(start_time, end_time, step):
+            total += 1
+            name = get_chunk_name(server, chunk_start, chunk_end)
+            status = frappe.db.get_value(DOCTYPE, name, "status")
+            if status == "Completed":
+                continue
+            if not status:
+                frappe.get_doc(
+                    {"doctype": DOCTYPE, "server": server, "start_time": chunk_start, "end_time": chunk_end}
+                ).insert(ignore_permissions=True, set_name=name)
+            names.append(name)
+
+    frappe.db.commit()
+    return names, total
+
+
+def run_chunk(name, cfg, employee_map):
+    """
+    Sync one chunk's date range through the regular fetch/insert path and record the outcome
+    """
+    chunk = frappe.db.get_value(DOCTYPE, name, ["server", "start_time", "end_time"], as_dict=True)
+    frappe.db.set_value(DOCTYPE, name, {"status": "Running", "error": None})
+    frappe.db.commit()
+
+    started = time.monotonic()
+    try:
+        counts = sync_window(
+            cfg,
+            chunk.server or None,
+            employee_map,
+            get_datetime(chunk.start_time),
+            get_datetime(chunk.end_time),
+        )
+    except Exception as e:
+        frappe.db.rollback()
+        frappe.db.set_value(DOCTYPE, name, {"status": "Failed", "error": str(e)[:1000], "duration": time.monotonic() - started})
+        frappe.db.commit()
+        frappe.log_error(f"ZKTeco backfill chunk {name} failed: {str(e)}", "ZKTeco Backfill")
+        return {"name": name, "status": "Failed", "fetched": 0, "staged": 0, "processed": 0, "errors": 0}
+
+    frappe.db.set_value(
+        DOCTYPE,
+        name,
+        {
+            "status": "Completed",
+            "fetched": counts["fetched"],
+            "staged": counts["staged"],
+            "processed": counts["processed"],
+            "errors": counts["errors"],
+            "duration": time.monotonic() - started,
+        },
+    )
+    frappe.db.commit()
+    return {"name": name, "status": "Completed", **counts}
+
+
+class BackfillProgress:
+    """
+    Running totals across worker threads, reported with throughput and ETA
+    """
+
+    def __init__(self, total, echo):
+        self.total = total
+        self.echo = echo
+        self.done = 0
+        self.fetched = 0
+        self.processed = 0
+        self.failed = 0
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def update(self, result):
+        with self._lock:
+            self.done += 1
+            self.fetched += result["fetched"]
+            self.processed += result["processed"]
+            self.failed += result["status"] != "Completed"
+
+            elapsed = max(time.monotonic() - self.started, 0.001)
+            eta = elapsed / self.done * (self.total - self.done)
+            self.echo(
+                f"[{self.done}/{self.total}] {result['name']}: {result['status']}, "
+                f"{result['fetched']} fetched, {result['processed']} processed | "
+                f"{self.fetched / elapsed:.1f} rows/s, ETA {format_duration(int(eta))}"
+            )
+
+    def summary(self):
+        elapsed = max(time.monotonic() - self.started, 0.001)
+        return (
+            f"Backfill finished in {format_duration(int(elapsed))}: {self.done - self.failed} chunks completed, "
+            f"{self.failed} failed, {self.fetched} fetched, {self.processed} processed "
+            f"({self.fetched / elapsed:.1f} rows/s)"
+        )
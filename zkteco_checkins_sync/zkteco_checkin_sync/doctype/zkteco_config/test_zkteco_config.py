@@ -1,9 +1,278 @@
 # Copyright (c) 2025, osama.ahmed@deliverydevs.com and Contributors
 # See license.txt
 
-# import frappe
+from unittest.mock import patch
+
+import frappe
 from frappe.tests.utils import FrappeTestCase
+from frappe.utils import get_datetime, now_datetime
+
+from zkteco_checkins_sync.zkteco_checkin_sync import async_engine, transaction_filters
+from zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_config import zkteco_config
+
+
+def make_transactions(ids):
+	return [
+		{
+			"id": transaction_id,
+			"emp_code": str(transaction_id),
+			"punch_time": f"2025-01-01 08:{transaction_id:02d}:00",
+			"upload_time": f"2025-01-01 09:{transaction_id:02d}:00",
+			"terminal_sn": "T1",
+		}
+		for transaction_id in ids
+	]
+
+
+def make_watermark(transaction_id=0):
+	return frappe._dict(start_id=transaction_id, transaction_id=transaction_id, upload_time=None, last_sync=None)
+
+
+class FakeResponse:
+	status_code = 200
+
+	def __init__(self, data):
+		self.data = data
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		pass
+
+	def raise_for_status(self):
+		pass
+
+	def json(self):
+		return self.data
+
+
+class FakeClient:
+	"""
+	Serves `transactions` the way ZKBio Time does: filtered by the `emp_code`
+	list of the query and paginated with `count` and `next`
+	"""
+
+	def __init__(self, transactions):
+		self.transactions = transactions
+		self.queries = []
+
+	def get(self, path, params=None, **kwargs):
+		codes = set(params["emp_code"].split(","))
+		rows = [t for t in self.transactions if t["emp_code"] in codes]
+		page, page_size = params["page"], params["page_size"]
+		self.queries.append((params["emp_code"], page))
+
+		has_next = page * page_size < len(rows)
+		return FakeResponse(
+			{
+				"count": len(rows),
+				"next": f"http://zkteco/iclock/api/transactions/?page={page + 1}" if has_next else None,
+				"data": rows[(page - 1) * page_size : page * page_size],
+			}
+		)
+
+
+class FakePageFetcher:
+	"""
+	Hands the writer a fixed sequence of queue items, as PageFetcher would
+	"""
+
+	items = []
+
+	def __init__(self, cfg, jobs, metrics=None):
+		self.items = list(FakePageFetcher.items)
+
+	def start(self):
+		pass
+
+	def stop(self):
+		pass
+
+	def get(self):
+		return self.items.pop(0)
+
+
+class PushConfig(frappe._dict):
+	def get_password(self, fieldname="password", raise_exception=True):
+		return self.get(f"{fieldname}_value")
 
 
 class TestZKTecoConfig(FrappeTestCase):
-	pass
+	def setUp(self):
+		self.cfg = frappe._dict(use_staging_queue=0, batch_size=100)
+		self.inserted = []
+
+		def insert(transactions, *args, **kwargs):
+			self.inserted.extend(t["id"] for t in transactions)
+			return {"processed": len(transactions), "failures": []}
+
+		patcher = patch.object(zkteco_config, "insert_employee_checkins", side_effect=insert)
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+	def test_async_engine_keeps_pages_that_arrive_out_of_order(self):
+		job = async_engine.ServerJob(None, None, make_watermark(), [])
+		pages = [make_transactions(range(1, 11)), make_transactions(range(21, 31)), make_transactions(range(11, 21))]
+		FakePageFetcher.items = [*(("page", job, page) for page in pages), ("done", job, None)]
+
+		results = {}
+		with (
+			patch.object(async_engine, "PageFetcher", FakePageFetcher),
+			patch.object(async_engine, "complete_server_sync", side_effect=lambda server, watermark, counts, *args: counts),
+		):
+			async_engine.write_pages(self.cfg, [job], {}, now_datetime(), None, None, results)
+
+		self.assertEqual(sorted(self.inserted), list(range(1, 31)))
+		self.assertEqual(results[None]["skipped"], 0)
+		self.assertEqual(job.watermark.transaction_id, 30)
+
+	def test_filter_chunks_each_page_through_the_whole_window(self):
+		transactions = make_transactions(range(1, 31))
+		client = FakeClient(transactions)
+		# Even codes land in the first emp_code chunk, odd codes in the second
+		codes = [str(i) for i in range(2, 31, 2)] + [str(i) for i in range(1, 31, 2)]
+		employee_map = {code: (f"EMP-{code}", code) for code in codes}
+		cfg = frappe._dict(self.cfg, json_decoder="Standard", page_size=10, only_mapped_employees=1, filter_chunk_size=15)
+
+		with (
+			patch.object(zkteco_config, "get_client", return_value=client),
+			patch.object(transaction_filters, "get_device_codes", return_value=codes),
+		):
+			counts = zkteco_config.sync_window(cfg, None, employee_map, now_datetime(), now_datetime(), make_watermark())
+
+		self.assertEqual(len({code for code, page in client.queries}), 2)
+		self.assertEqual(sorted(self.inserted), list(range(1, 31)))
+		self.assertEqual(counts["skipped"], 0)
+		self.assertEqual(counts["filtered"], 0)
+
+	def test_quiet_devices_are_caught_up_with_their_own_requests(self):
+		current_time = get_datetime("2025-01-02 12:00:00")
+		watermark = make_watermark(30)
+		watermark.upload_time = get_datetime("2025-01-02 11:59:00")
+		watermark.device_uploads = {
+			"ACTIVE": get_datetime("2025-01-02 11:59:00"),
+			"QUIET": get_datetime("2025-01-02 03:00:00"),
+			"GONE": get_datetime("2024-12-30 08:00:00"),
+		}
+		cfg = frappe._dict(self.cfg, sync_overlap_seconds=300, late_upload_hours=24)
+
+		start_time = zkteco_config.get_sync_window_start(cfg, watermark, current_time)
+		requests = zkteco_config.get_fetch_requests(cfg, start_time, current_time, watermark)
+
+		self.assertEqual(start_time, get_datetime("2025-01-02 11:54:00"))
+		self.assertEqual(
+			[(r.get("terminal_sn"), r["start_time"], r["end_time"]) for r in requests],
+			[
+				(None, "2025-01-02 11:54:00", "2025-01-02 12:00:00"),
+				("QUIET", "2025-01-02 03:00:00", "2025-01-02 11:54:00"),
+			],
+		)
+		# Devices past the lookback are dropped from the saved watermark
+		self.assertNotIn("GONE", watermark.device_uploads)
+
+	def test_watermark_tracks_the_last_upload_of_each_device(self):
+		watermark = make_watermark()
+		watermark.device_uploads = {"T1": get_datetime("2025-01-01 09:30:00")}
+
+		zkteco_config.advance_watermark(watermark, make_transactions(range(1, 21)))
+
+		self.assertEqual(watermark.device_uploads["T1"], get_datetime("2025-01-01 09:30:00"))
+		self.assertEqual(watermark.upload_time, get_datetime("2025-01-01 09:20:00"))
+
+	def receive_adms(self, serial, address, method="GET"):
+		cfg = PushConfig(push_device_serials="CJDE1\nCJDE2", push_allowed_networks="10.0.0.0/24\n192.168.1.7")
+		request = frappe._dict(method=method, get_data=lambda as_text=False: "")
+		with (
+			patch.object(frappe.local, "request_ip", address, create=True),
+			patch.object(frappe, "request", request, create=True),
+			patch.object(zkteco_config, "get_handshake_options", return_value="options"),
+			patch.object(zkteco_config, "enqueue_pushed_transactions") as enqueue,
+		):
+			response = zkteco_config.receive_adms_push(cfg, serial)
+		return response, enqueue
+
+	def test_adms_push_from_an_allowed_device(self):
+		response, _ = self.receive_adms("CJDE1", "10.0.0.12")
+
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.get_data(as_text=True), "options")
+
+	def test_adms_push_rejects_unknown_serials(self):
+		response, enqueue = self.receive_adms("CJDE9", "10.0.0.12", "POST")
+
+		self.assertEqual(response.status_code, 403)
+		enqueue.assert_not_called()
+
+	def test_adms_push_rejects_addresses_outside_the_allowed_networks(self):
+		for address in ("10.0.1.12", "192.168.1.8", "", "not an address"):
+			with self.subTest(address=address):
+				response, enqueue = self.receive_adms("CJDE1", address, "POST")
+				self.assertEqual(response.status_code, 403)
+				enqueue.assert_not_called()
+
+	def test_webhook_push_rejects_a_bad_token(self):
+		for configured, sent in (("secret", "wrong"), ("secret", ""), (None, ""), (None, "anything")):
+			with (
+				self.subTest(configured=configured, sent=sent),
+				patch.object(frappe, "get_request_header", return_value=sent),
+				patch.object(zkteco_config, "enqueue_pushed_transactions") as enqueue,
+			):
+				with self.assertRaises(frappe.AuthenticationError):
+					zkteco_config.receive_webhook_push(PushConfig(push_token_value=configured))
+				enqueue.assert_not_called()
+
+	def test_get_next_page(self):
+		get_next_page = zkteco_config.get_next_page
+		rows = make_transactions(range(1, 11))
+		link = "http://10.0.0.5:8081/iclock/api/transactions/?page={0}&page_size=10"
+
+		# The page number comes from `next`, whatever host it names
+		self.assertEqual(get_next_page({"next": link.format(2), "data": rows}, 1, 10, 10), 2)
+		self.assertEqual(get_next_page({"next": link.format(5), "data": rows}, 4, 10, 40), 5)
+		# A link without a page number moves on by one; one that goes backwards stops
+		self.assertEqual(get_next_page({"next": "http://zk/iclock/api/transactions/?cursor=x", "data": rows}, 3, 10, 30), 4)
+		self.assertIsNone(get_next_page({"next": link.format(1), "data": rows}, 2, 10, 20))
+		# `next: null` is the last page, even when `count` says otherwise
+		self.assertIsNone(get_next_page({"next": None, "count": 100, "data": rows}, 1, 10, 10))
+
+	def test_get_next_page_falls_back_to_count(self):
+		get_next_page = zkteco_config.get_next_page
+		rows = make_transactions(range(1, 11))
+
+		self.assertEqual(get_next_page({"count": 25, "data": rows}, 1, 10, 10), 2)
+		self.assertEqual(get_next_page({"count": 25, "results": rows}, 2, 10, 20), 3)
+		# Everything counted was fetched, or the page came back short
+		self.assertIsNone(get_next_page({"count": 20, "data": rows}, 2, 10, 20))
+		self.assertIsNone(get_next_page({"count": 25, "data": rows[:5]}, 3, 10, 25))
+		# Neither `next` nor `count`, or not a paginated body
+		self.assertIsNone(get_next_page({"data": rows}, 1, 10, 10))
+		self.assertIsNone(get_next_page(rows, 1, 10, 10))
+
+	def sync_with_lock(self, acquired):
+		"""
+		Trigger a sync whose lock attempts return `acquired` in turn
+		"""
+		with (
+			patch.object(frappe, "cache") as cache,
+			patch.object(zkteco_config.SyncLock, "acquire", side_effect=acquired),
+			patch.object(zkteco_config.SyncLock, "release"),
+			patch.object(zkteco_config.SyncLock, "holder", return_value={"trigger": "scheduler"}),
+			patch.object(zkteco_config, "run_sync", return_value={"status": "completed", "processed": 0}) as run_sync,
+		):
+			cache.return_value.get_value.return_value = None
+			result = zkteco_config.sync_zkteco_transactions("manual")
+		return result, run_sync, cache.return_value
+
+	def test_busy_sync_coalesces_into_the_running_one(self):
+		result, run_sync, cache = self.sync_with_lock([False, False])
+
+		self.assertEqual(result["status"], "coalesced")
+		run_sync.assert_not_called()
+		cache.set_value.assert_called_once()
+
+	def test_sync_reruns_itself_when_the_holder_let_go_before_the_flag_was_set(self):
+		result, run_sync, cache = self.sync_with_lock([False, True])
+
+		self.assertEqual(result["status"], "completed")
+		run_sync.assert_called_once()
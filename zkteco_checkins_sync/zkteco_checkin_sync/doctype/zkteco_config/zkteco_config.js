@@ -4,7 +4,7 @@
 frappe.ui.form.on("ZKTeco Config", {
     refresh(frm) {
         // Add custom buttons
-        if (frm.doc.enable_sync && frm.doc.token) {
+        if (frm.doc.enable_sync && (frm.doc.token || frm.doc.username)) {
             frm.add_custom_button(__('Manual Sync'), function() {
                 manual_sync(frm);
             }, __('Actions'));
@@ -38,20 +38,21 @@ frappe.ui.form.on("ZKTeco Config", {
             const msg = r.message || {};
             if (msg.ok) {
                 frappe.show_alert({
-                    message: __(`✅ Connected successfully! Found ${msg.total_transactions || 0} transactions today.`),
+                    message: __(`✅ Connected successfully! Found ${msg.total_transactions || 0} transactions today (${msg.round_trip_ms} ms).`),
                     indicator: "green"
                 });
                 
                 // Show detailed transaction preview
                 if (msg.transactions_preview && msg.transactions_preview.length > 0) {
-                    show_transaction_preview(msg.transactions_preview, msg.total_transactions);
+                    show_transaction_preview(msg.transactions_preview, msg.total_transactions, msg);
                 } else {
                     frappe.msgprint({
                         title: __("Connection Successful"),
                         message: __(`✅ Connected to ZKTeco device successfully!<br>
                                    📊 Total transactions today: ${msg.total_transactions || 0}<br>
                                    🔗 URL: ${msg.url}<br>
-                                   📡 Status: ${msg.status_code}`),
+                                   📡 Status: ${msg.status_code}<br>
+                                   ⏱️ Round trip: ${msg.round_trip_ms} ms (server responded in ${msg.server_response_ms} ms)`),
                         indicator: "green"
                     });
                 }
@@ -83,9 +84,8 @@ frappe.ui.form.on("ZKTeco Config", {
             freeze: true,
             freeze_message: __("Registering token...")
         }).then((r) => {
-            if (r.message && r.message.token) {
-                frm.set_value("token", r.message.token);
-                frm.save().then(() => {
+            if (r.message && r.message.success) {
+                frm.reload_doc().then(() => {
                     frappe.show_alert({ 
                         message: __("✅ API token registered and saved successfully!"), 
                         indicator: "green" 
@@ -102,10 +102,11 @@ frappe.ui.form.on("ZKTeco Config", {
     }
 });
 
-function show_transaction_preview(transactions, total_count) {
+function show_transaction_preview(transactions, total_count, probe) {
     let html = `<div style="margin-bottom: 15px;">
                     <strong>📊 Found ${total_count} transactions today</strong><br>
-                    <small>Showing latest ${transactions.length} transactions:</small>
+                    <small>Showing latest ${transactions.length} transactions.
+                    Round trip ${probe.round_trip_ms} ms, server responded in ${probe.server_response_ms} ms.</small>
                 </div>`;
     
     html += `<div style="max-height: 400px; overflow-y: auto;">
@@ -172,7 +173,7 @@ function manual_sync(frm) {
     }).then((r) => {
         if (r.message && r.message.success) {
             frappe.show_alert({
-                message: __('✅ Manual sync completed successfully!'),
+                message: __(`✅ ${r.message.message || 'Manual sync completed successfully!'}`),
                 indicator: 'green'
             });
         } else {
@@ -202,7 +203,10 @@ function show_sync_status(frm) {
                         <tr><td><strong>Recent Check-ins (24h):</strong></td><td>${status.recent_checkins_24h || 0}</td></tr>
                         <tr><td><strong>Server Configured:</strong></td><td>${status.server_configured ? '✅ Yes' : '❌ No'}</td></tr>
                         <tr><td><strong>Token Configured:</strong></td><td>${status.token_configured ? '✅ Yes' : '❌ No'}</td></tr>
+                        <tr><td><strong>Sync Running:</strong></td><td>${format_lock_holder(status.sync_lock)}</td></tr>
                      </table>`;
+            html += format_device_counts(status.recent_counts);
+            html += format_sync_metrics(status.metrics);
         }
         
         html += '</div>';
@@ -210,14 +214,90 @@ function show_sync_status(frm) {
         frappe.msgprint({
             title: __('ZKTeco Sync Status'),
             message: html,
-            indicator: status.enabled ? 'green' : 'orange'
+            indicator: status.enabled ? 'green' : 'orange',
+            wide: true
         });
+        
+        render_sync_trend(status.metrics);
+    });
+}
+
+function format_device_counts(counts) {
+    if (!counts || !counts.by_device.length) {
+        return '';
+    }
+    
+    const rows = counts.by_device.map((row) => `<tr>
+                <td>${frappe.utils.escape_html(row.device || __('Unknown'))}</td>
+                <td>${frappe.utils.escape_html(row.server || __('Default'))}</td>
+                <td>${row.inserted}</td><td>${row.duplicates}</td><td>${row.failed}</td>
+            </tr>`).join('');
+    
+    return `<h5>${__('Check-ins by Device (24h)')}</h5>
+            <table class="table table-bordered">
+                <tr><th>${__('Device')}</th><th>${__('Server')}</th><th>${__('Inserted')}</th><th>${__('Duplicates')}</th><th>${__('Failed')}</th></tr>
+                ${rows}
+            </table>`;
+}
+
+function format_sync_metrics(metrics) {
+    if (!metrics || !metrics.runs) {
+        return '<p class="text-muted">No sync runs recorded in the last 24 hours.</p>';
+    }
+    
+    const row = (label, timing, unit) =>
+        `<tr><td><strong>${label}:</strong></td><td>${timing.p50} ${unit}</td><td>${timing.p95} ${unit}</td></tr>`;
+    
+    return `<h5>${__('Last 24 Hours')} (${metrics.runs} runs, ${metrics.failed_runs} not completed)</h5>
+            <table class="table table-bordered">
+                <tr><th></th><th>p50</th><th>p95</th></tr>
+                ${row(__('Run Duration'), metrics.duration_seconds, 's')}
+                ${row(__('API Page Fetch'), metrics.fetch_ms, 'ms')}
+                ${row(__('Checkin Insert'), metrics.insert_ms, 'ms')}
+                ${row(__('Punch to Insert Lag'), metrics.lag_seconds, 's')}
+            </table>
+            <table class="table table-bordered">
+                <tr><td><strong>Rows Fetched:</strong></td><td>${metrics.totals.rows_fetched}</td>
+                    <td><strong>Inserted:</strong></td><td>${metrics.totals.inserted}</td></tr>
+                <tr><td><strong>Duplicates Skipped:</strong></td><td>${metrics.totals.dedup_hits}</td>
+                    <td><strong>Unmapped Codes:</strong></td><td>${metrics.totals.unmapped}</td></tr>
+            </table>
+            <div class="zkteco-sync-trend"></div>`;
+}
+
+function render_sync_trend(metrics) {
+    const wrapper = document.querySelector('.zkteco-sync-trend');
+    if (!wrapper || !metrics || !metrics.trend.length) {
+        return;
+    }
+    
+    new frappe.Chart(wrapper, {
+        title: __('Hourly Trend'),
+        type: 'axis-mixed',
+        height: 220,
+        data: {
+            labels: metrics.trend.map(t => t.hour.slice(11)),
+            datasets: [
+                { name: __('Rows Fetched'), chartType: 'bar', values: metrics.trend.map(t => t.rows_fetched) },
+                { name: __('Inserted'), chartType: 'bar', values: metrics.trend.map(t => t.inserted) },
+                { name: __('Run p95 (s)'), chartType: 'line', values: metrics.trend.map(t => t.duration_p95) }
+            ]
+        }
     });
 }
 
+function format_lock_holder(holder) {
+    if (!holder) {
+        return 'No';
+    }
+    return frappe.utils.escape_html(
+        `Yes (${holder.trigger || 'unknown trigger'} on ${holder.owner}, since ${holder.acquired_at})`
+    );
+}
+
 function show_sync_indicator(frm) {
     const sync_frequency = frm.doc.seconds;
-    const token_configured = frm.doc.token ? true : false;
+    const token_configured = frm.doc.token || frm.doc.username ? true : false;
     
     let indicator_color = 'red';
     let indicator_text = 'Sync Disabled';
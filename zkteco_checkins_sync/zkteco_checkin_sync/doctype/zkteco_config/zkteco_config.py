@@ -5,47 +5,109 @@ import frappe
 from frappe.model.document import Document
 from frappe import _
 import requests
-from frappe.utils import today, now_datetime, get_datetime, flt
+from frappe.utils import today, now_datetime, get_datetime, flt, cint, cstr
 from datetime import datetime, timedelta
+from urllib.parse import parse_qs, urlparse
+import hmac
+import ipaddress
 import json
+import time
+
+from werkzeug.wrappers import Response
+
+from zkteco_checkins_sync.zkteco_checkin_sync.adms import ADMS_NAMESPACE, get_handshake_options, parse_attlog, set_attlog_stamp
+from zkteco_checkins_sync.zkteco_checkin_sync.api_client import TRANSACTIONS_PATH, get_client, get_engine
+from zkteco_checkins_sync.zkteco_checkin_sync.checkin_index import CheckinIndex
+from zkteco_checkins_sync.zkteco_checkin_sync.config_snapshot import clear_config_cache, get_config
+from zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_error_summary.zkteco_error_summary import report_errors
+from zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_sync_counter.zkteco_sync_counter import (
+    add_punch,
+    add_seen,
+    get_recent_counts,
+    new_device_count,
+    record_counts,
+)
+from zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_sync_run.zkteco_sync_run import get_sync_run_stats
+from zkteco_checkins_sync.zkteco_checkin_sync.employee_resolver import get_employee_code_map, resolve_employee
+from zkteco_checkins_sync.zkteco_checkin_sync.sync_lock import SyncLock
+from zkteco_checkins_sync.zkteco_checkin_sync.sync_metrics import SyncMetrics
+from zkteco_checkins_sync.zkteco_checkin_sync.sync_worker import ensure_sync_loop, get_sync_seconds, is_loop_running, needs_sync_loop
+from zkteco_checkins_sync.zkteco_checkin_sync.transaction_decoder import decode_page, get_decoder
+from zkteco_checkins_sync.zkteco_checkin_sync.transaction_filters import TransactionFilter, get_filter_queries
+from zkteco_checkins_sync.zkteco_checkin_sync.utils import run_concurrently
+
+
+# Transactions requested per page from /iclock/api/transactions/
+DEFAULT_PAGE_SIZE = 500
+
+# Lookback before the watermark so punches uploaded late by devices are still fetched
+DEFAULT_SYNC_OVERLAP_SECONDS = 300
+
+# Devices that have not uploaded for this long are no longer caught up on their own
+DEFAULT_LATE_UPLOAD_HOURS = 24
+
+# Site-wide lock around the sync pipeline, and the flag that coalesces triggers into a rerun
+SYNC_LOCK_NAME = "sync"
+SYNC_PENDING_KEY = "zkteco_sync_pending"
+SYNC_PENDING_TTL = 3600
+
+# Cron ticks drift by a few seconds, so a sync is due slightly before its full interval
+SCHEDULER_SLACK_SECONDS = 5
+
+# Pushed transactions handed to each background job
+PUSH_JOB_SIZE = 500
+
+# Employee Checkins inserted per database commit
+DEFAULT_BATCH_SIZE = 100
+
+CHECKIN_SAVEPOINT = "zkteco_checkin"
+
+# Test Connection previews this many of today's latest punches, and gives up
+# quickly: (connect, read) timeout in seconds
+PREVIEW_SIZE = 5
+TEST_CONNECTION_TIMEOUT = (3.05, 5)
 
 
 class ZKTecoConfig(Document):
-    pass
+    def validate(self):
+        for network in get_push_networks(self):
+            try:
+                ipaddress.ip_network(network, strict=False)
+            except ValueError:
+                frappe.throw(_("{0} in Push Allowed Networks is not an IP address or CIDR range").format(network))
+    
+    def on_update(self):
+        clear_config_cache()
+        # Another worker may rebuild the snapshot from the old row before this commits
+        frappe.db.after_commit.add(clear_config_cache)
+
+
+class InvalidTransactionError(frappe.ValidationError):
+    error_kind = "Invalid Transaction"
+
+
+class EmployeeNotMappedError(frappe.ValidationError):
+    error_kind = "Unmapped Employee"
 
 
 @frappe.whitelist()
 def register_api_token():
     """
-    Calls the remote API to obtain a token and returns it to the client.
+    Obtain a new token now and store it (encrypted, and in the shared token
+    cache). Sync renews tokens on its own; this is for checking credentials.
     """
     # Fetch from Single DocType
-    server_ip = frappe.db.get_single_value("ZKTeco Config", "server_ip")
-    server_port = frappe.db.get_single_value("ZKTeco Config", "server_port")
-    username = frappe.db.get_single_value("ZKTeco Config", "username")
-    password = frappe.db.get_single_value("ZKTeco Config", "password")
+    cfg = get_config()
+    password = cfg.get_password("password", raise_exception=False)
 
-    if not all([server_ip, server_port, username, password]):
+    if not all([cfg.server_ip, cfg.server_port, cfg.username, password]):
         frappe.throw(_("Please configure server IP, port, username, and password in ZKTeco Config."))
 
-    # Ensure scheme + port in URL
-    url = f"http://{server_ip}:{server_port}/api-token-auth/"
-
-    payload = {
-        "username": username,
-        "password": password
-    }
-
     try:
-        resp = requests.post(url, json=payload, timeout=15)
-        resp.raise_for_status()
-
-        data = resp.json()
-        token = data.get("token")
-        if not token:
-            frappe.throw(_("Token not found in API response."))
-
-        return {"success": True, "token": token}
+        client = get_client(cfg)
+        client.token_manager.store(client.obtain_token())
+        frappe.db.commit()
+        return {"success": True}
 
     except requests.exceptions.RequestException as e:
         frappe.throw(_("Connection error: {0}").format(str(e)))
@@ -54,134 +116,87 @@ def register_api_token():
 @frappe.whitelist()
 def test_connection():
     """
-    Enhanced test connection that shows latest transactions with detailed info
+    Probe the server: fetch only the latest few of today's transactions plus
+    the day's count, and report round-trip and server response latency
     """
-    # Get token from the singleton config
-    cfg = frappe.get_single("ZKTeco Config")
-    token = (cfg.token or "").strip()
-    server_ip = frappe.db.get_single_value("ZKTeco Config", "server_ip")
-    server_port = frappe.db.get_single_value("ZKTeco Config", "server_port")
-    
-    if not token:
-        return {"ok": False, "error": _("Token not set in ZKTeco Config. Please register/save a token first.")}
+    cfg = get_config()
+    if not (cfg.token or cfg.username):
+        return {"ok": False, "error": _("Set a username and password in ZKTeco Config, or register a token first.")}
 
-    base_url = f"http://{server_ip}:{server_port}/iclock/api/transactions/"
     day = today()
-    start_time = f"{day} 00:00:00"
-    end_time = f"{day} 23:59:59"
-
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {token}",
-    }
     params = {
-        "start_time": start_time,
-        "end_time": end_time,
+        "start_time": f"{day} 00:00:00",
+        "end_time": f"{day} 23:59:59",
+        "page": 1,
+        "page_size": PREVIEW_SIZE,
+        # Newest first where the server supports ordering; checked below for those that don't
+        "ordering": "-punch_time",
     }
 
     try:
-        resp = requests.get(base_url, headers=headers, params=params, timeout=15)
+        # No retries: a probe should report a slow or failing server, not hide it
+        client = get_client(cfg, max_retries=0)
+        # From the shared token cache; keeps any token renewal out of the timing
+        client.ensure_token()
+        started = time.perf_counter()
+        resp = client.get(TRANSACTIONS_PATH, params=params, timeout=TEST_CONNECTION_TIMEOUT)
         
-        if resp.ok:
-            try:
-                data = resp.json()
-                
-                # Process and format transaction data for display
-                formatted_transactions = []
-                transaction_count = 0
-                
-                # Handle ZKTeco API response structure
-                if isinstance(data, dict) and 'data' in data:
-                    transactions = data['data']
-                    transaction_count = data.get('count', len(transactions))
-                elif isinstance(data, dict) and 'results' in data:
-                    transactions = data['results']
-                    transaction_count = len(transactions)
-                elif isinstance(data, list):
-                    transactions = data
-                    transaction_count = len(transactions)
-                else:
-                    transactions = []
-                
-                # Format latest 5 transactions for preview
-                for transaction in transactions[:5]:
-                    try:
-                        # Map ZKTeco transaction fields based on actual API response
-                        emp_code = transaction.get('emp_code')
-                        punch_time = transaction.get('punch_time')
-                        punch_state = transaction.get('punch_state')
-                        punch_state_display = transaction.get('punch_state_display')
-                        device_id = transaction.get('terminal_alias') or transaction.get('terminal_sn')
-                        first_name = transaction.get('first_name', '')
-                        last_name = transaction.get('last_name', '') or ''
-                        verify_type_display = transaction.get('verify_type_display')
-                        
-                        # Combine first and last name
-                        zkteco_name = f"{first_name} {last_name}".strip()
-                        
-                        # Try to find employee name from ERPNext
-                        employee_name = zkteco_name
-                        erpnext_employee = None
-                        if emp_code:
-                            # Try to find employee by employee_id or user_id
-                            employee = frappe.db.get_value("Employee", 
-                                                         {"employee": emp_code}, 
-                                                         ["name", "employee_name"])
-                            if not employee:
-                                employee = frappe.db.get_value("Employee", 
-                                                             {"user_id": emp_code}, 
-                                                             ["name", "employee_name"])
-                            if employee:
-                                erpnext_employee = employee[0] if isinstance(employee, tuple) else employee
-                                employee_name = f"{employee[1]} (ERPNext)" if isinstance(employee, tuple) else f"{employee} (ERPNext)"
-                        
-                        # Determine log type based on punch_state
-                        log_type = "IN"
-                        if punch_state == "1" or punch_state_display == "Check Out":
-                            log_type = "OUT"
-                        
-                        formatted_transactions.append({
-                            "id": transaction.get('id'),
-                            "employee_code": emp_code,
-                            "employee_name": employee_name,
-                            "erpnext_employee": erpnext_employee,
-                            "punch_time": punch_time,
-                            "log_type": log_type,
-                            "punch_state_display": punch_state_display,
-                            "device_id": device_id,
-                            "verify_method": verify_type_display,
-                            "zkteco_name": zkteco_name,
-                            "department": transaction.get('department'),
-                            "raw_data": transaction
-                        })
-                    except Exception as e:
-                        frappe.log_error(f"Error processing transaction: {e}", "ZKTeco Transaction Processing")
-                        continue
-                
-                return {
-                    "ok": True,
-                    "status_code": resp.status_code,
-                    "url": resp.url,
-                    "total_transactions": transaction_count,
-                    "transactions_preview": formatted_transactions,
-                    "raw_sample": transactions[:2] if transactions else [],
-                    "message": f"Found {transaction_count} transactions for {day}"
-                }
-                
-            except json.JSONDecodeError as e:
-                return {
-                    "ok": False,
-                    "status_code": resp.status_code,
-                    "error": f"Invalid JSON response: {str(e)}",
-                    "raw_response": resp.text[:500]
-                }
-        else:
+        if not resp.ok:
             return {
                 "ok": False,
                 "status_code": resp.status_code,
                 "url": resp.url,
                 "error": f"HTTP {resp.status_code}: {resp.text[:200]}"
             }
+        
+        try:
+            data = resp.json()
+        except json.JSONDecodeError as e:
+            return {
+                "ok": False,
+                "status_code": resp.status_code,
+                "error": f"Invalid JSON response: {str(e)}",
+                "raw_response": resp.text[:500]
+            }
+        
+        round_trip_ms = (time.perf_counter() - started) * 1000
+        server_response_ms = resp.elapsed.total_seconds() * 1000
+        transactions = extract_transactions(data)
+        transaction_count = cint(data.get("count")) if isinstance(data, dict) and data.get("count") is not None else len(transactions)
+        
+        # Ordering was ignored (oldest first): the newest rows are on the last page
+        last_page = -(-transaction_count // PREVIEW_SIZE)
+        if last_page > 1 and is_oldest_first(transactions):
+            params["page"] = last_page
+            resp = client.get(TRANSACTIONS_PATH, params=params, timeout=TEST_CONNECTION_TIMEOUT)
+            if resp.ok:
+                try:
+                    transactions = extract_transactions(resp.json())
+                except json.JSONDecodeError as e:
+                    return {
+                        "ok": False,
+                        "status_code": resp.status_code,
+                        "error": f"Invalid JSON response: {str(e)}",
+                        "raw_response": resp.text[:500]
+                    }
+        
+        transactions = sorted(transactions, key=lambda t: cstr(t.get('punch_time')), reverse=True)[:PREVIEW_SIZE]
+        
+        # Names come from the bulk emp_code map, so the preview costs no Employee queries per row
+        employee_map = get_employee_code_map(use_redis=bool(cfg.cache_employee_map_in_redis))
+        formatted_transactions = [format_preview_transaction(t, employee_map) for t in transactions]
+        
+        return {
+            "ok": True,
+            "status_code": resp.status_code,
+            "url": resp.url,
+            "total_transactions": transaction_count,
+            "transactions_preview": formatted_transactions,
+            "raw_sample": transactions[:2],
+            "round_trip_ms": round(round_trip_ms, 1),
+            "server_response_ms": round(server_response_ms, 1),
+            "message": f"Found {transaction_count} transactions for {day}"
+        }
             
     except requests.RequestException as e:
         return {
@@ -190,187 +205,683 @@ def test_connection():
         }
 
 
-def sync_zkteco_transactions():
+def is_oldest_first(transactions):
+    punch_times = [cstr(t.get('punch_time')) for t in transactions if t.get('punch_time')]
+    return len(punch_times) > 1 and punch_times[0] < punch_times[-1]
+
+
+def format_preview_transaction(transaction, employee_map):
     """
-    Main function to sync ZKTeco transactions with ERPNext Employee Checkin records
+    Shape one transaction for the Test Connection preview dialog
+    """
+    # Map ZKTeco transaction fields based on actual API response
+    emp_code = transaction.get('emp_code')
+    punch_state = transaction.get('punch_state')
+    punch_state_display = transaction.get('punch_state_display')
+    
+    # Combine first and last name
+    zkteco_name = f"{transaction.get('first_name') or ''} {transaction.get('last_name') or ''}".strip()
+    
+    # Try to find employee name from ERPNext
+    employee_name = zkteco_name
+    erpnext_employee = None
+    employee = resolve_employee(emp_code, employee_map, with_name=True)
+    if employee:
+        erpnext_employee = employee[0]
+        employee_name = f"{employee[1]} (ERPNext)"
+    
+    # Determine log type based on punch_state
+    log_type = "IN"
+    if punch_state == "1" or punch_state_display == "Check Out":
+        log_type = "OUT"
+    
+    return {
+        "id": transaction.get('id'),
+        "employee_code": emp_code,
+        "employee_name": employee_name,
+        "erpnext_employee": erpnext_employee,
+        "punch_time": transaction.get('punch_time'),
+        "log_type": log_type,
+        "punch_state_display": punch_state_display,
+        "device_id": transaction.get('terminal_alias') or transaction.get('terminal_sn'),
+        "verify_method": transaction.get('verify_type_display'),
+        "zkteco_name": zkteco_name,
+        "department": transaction.get('department'),
+        "raw_data": transaction
+    }
+
+
+def sync_zkteco_transactions(trigger="scheduler", cfg=None):
+    """
+    Main function to sync ZKTeco transactions with ERPNext Employee Checkin records.
+
+    Runs under the site-wide sync lock so manual, scheduled and loop triggers
+    never overlap. A trigger that finds the lock taken is coalesced: it marks a
+    rerun as pending and the holder runs once more before letting go. `cfg` is
+    the caller's config snapshot, if it already has one.
+    """
+    cache = frappe.cache()
+    lock = SyncLock(SYNC_LOCK_NAME, trigger=trigger)
+    
+    while True:
+        if not lock.acquire():
+            cache.set_value(SYNC_PENDING_KEY, 1, expires_in_sec=SYNC_PENDING_TTL)
+            # The holder may have let go and checked the flag before we set it;
+            # then nobody would run again, so take over the rerun ourselves
+            if not lock.acquire():
+                return {"status": "coalesced", "holder": lock.holder()}
+        
+        try:
+            cache.delete_value(SYNC_PENDING_KEY)
+            result = run_sync(lock, cfg)
+        finally:
+            lock.release()
+        
+        if not cache.get_value(SYNC_PENDING_KEY):
+            return result
+
+
+def run_sync(lock, cfg=None):
+    """
+    One sync pass over every configured server. Call through sync_zkteco_transactions.
     """
     # Check if sync is enabled
-    cfg = frappe.get_single("ZKTeco Config")
+    cfg = cfg or get_config()
     if not cfg.enable_sync:
         frappe.log_error("ZKTeco sync is disabled", "ZKTeco Sync")
         return
     
-    if not cfg.token:
-        frappe.log_error("ZKTeco token not configured", "ZKTeco Sync")
+    # The server on ZKTeco Config (None) plus every enabled ZKTeco Server
+    servers = ([None] if cfg.token or cfg.username else []) + get_enabled_servers()
+    if not servers:
+        frappe.log_error("ZKTeco credentials not configured", "ZKTeco Sync")
         return
     
+    current_time = now_datetime()
+    metrics = SyncMetrics(lock.trigger)
+    employee_map = get_employee_code_map(use_redis=bool(cfg.cache_employee_map_in_redis))
+    
+    if get_engine(cfg.sync_engine) == "Async":
+        # Imported here because the async engine builds on this module
+        from zkteco_checkins_sync.zkteco_checkin_sync.async_engine import sync_servers_async
+        results = sync_servers_async(cfg, servers, employee_map, current_time, lock, metrics)
+    elif len(servers) == 1:
+        results = [sync_server(cfg, servers[0], employee_map, current_time, lock, metrics)]
+    else:
+        # Each server syncs on its own thread and DB connection, so the run
+        # takes as long as the slowest server rather than the sum of all of them
+        results = run_concurrently(
+            lambda server: sync_server(cfg, server, employee_map, current_time, lock, metrics),
+            servers,
+        )
+    
+    processed_count = sum(r["processed"] for r in results if isinstance(r, dict))
+    increment_total_synced(processed_count)
+    
+    succeeded = sum(1 for r in results if isinstance(r, dict))
+    metrics.save("Completed" if succeeded == len(servers) else "Partial" if succeeded else "Failed", len(servers))
+    
+    if cfg.use_staging_queue:
+        # Imported here because the staging module builds on this one
+        from zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_transaction_log.zkteco_transaction_log import enqueue_staging_drain
+        enqueue_staging_drain(cfg)
+    
+    return {"status": "completed", "processed": processed_count}
+
+
+def sync_server(cfg, server, employee_map, current_time, lock=None, metrics=None):
+    """
+    Sync one ZKBio Time server (None for the server on ZKTeco Config) and return its counters.
+    With a `lock`, the lease is renewed per page and verified before the watermark moves.
+    Timings and counters are added to `metrics` (a SyncMetrics) when given.
+    """
     try:
-        # Get transactions from last sync or last hour
-        last_sync = frappe.db.get_single_value("ZKTeco Config", "last_sync") or (now_datetime() - timedelta(hours=1))
-        current_time = now_datetime()
+        # Resume from the high-water mark of the last committed run, with some
+        # overlap so punches the devices buffered and uploaded late are picked up
+        watermark = get_watermark(server)
+        start_time = get_sync_window_start(cfg, watermark, current_time)
         
-        transactions = fetch_zkteco_transactions(cfg, last_sync, current_time)
+        counts = sync_window(cfg, server, employee_map, start_time, current_time, watermark, lock, metrics)
+        return complete_server_sync(server, watermark, counts, current_time, lock, metrics)
         
-        if transactions:
-            processed_count = 0
-            error_count = 0
-            
-            for transaction in transactions:
-                try:
-                    if create_employee_checkin(transaction):
-                        processed_count += 1
-                    else:
-                        error_count += 1
-                except Exception as e:
-                    error_count += 1
-                    frappe.log_error(f"Error creating checkin for transaction {transaction}: {str(e)}", "ZKTeco Sync Error")
-            
-            # Update last sync time and record count
-            total_synced = frappe.db.get_single_value("ZKTeco Config", "total_synced_records") or 0
-            frappe.db.set_single_value("ZKTeco Config", "last_sync", current_time)
-            frappe.db.set_single_value("ZKTeco Config", "total_synced_records", total_synced + processed_count)
+    except Exception as e:
+        fail_server_sync(server, e)
+
+
+def complete_server_sync(server, watermark, counts, current_time, lock=None, metrics=None):
+    """
+    Save the watermark of a server whose whole window was processed and return its counters
+    """
+    # The whole window was fetched and every batch committed, so the mark can move.
+    # Pages arrive in any id order, and each filter query pages through the window
+    # again, so rows were filtered against the mark the run started from and the
+    # new mark is only saved here.
+    watermark.last_sync = current_time
+    if lock:
+        lock.verify()
+    save_watermark(watermark, server)
+    frappe.db.commit()
+    if metrics:
+        metrics.incr("commits")
+    
+    if counts["fetched"]:
+        frappe.logger().info(f"ZKTeco Sync completed for {server or 'ZKTeco Config'}: {counts['fetched']} fetched, {counts['skipped']} below watermark, {counts['filtered']} filtered out, {counts['staged']} staged, {counts['processed']} processed, {counts['errors']} errors")
+    
+    return {"server": server, **counts}
+
+
+def fail_server_sync(server, error):
+    frappe.db.rollback()
+    frappe.log_error(f"ZKTeco sync failed for {server or 'ZKTeco Config'}: {str(error)}", "ZKTeco Sync Fatal Error")
+
+
+def sync_window(cfg, server, employee_map, start_time, end_time, watermark=None, lock=None, metrics=None):
+    """
+    Fetch every transaction of `server` between `start_time` and `end_time` and
+    stage or insert it, committing per batch. Rows at or below the id the
+    `watermark` started from are skipped and the new mark is collected in
+    memory; saving it is up to the caller. With a `watermark`, devices that
+    have been quiet since before `start_time` are caught up as well.
+    """
+    counts = new_sync_counts()
+    row_filter = TransactionFilter(cfg, employee_map)
+    
+    # Pages are consumed as they arrive so memory stays flat however wide the window is
+    for transactions in fetch_zkteco_transactions(cfg, start_time, end_time, server, metrics, watermark):
+        if lock:
+            lock.verify()
+        process_page(cfg, server, transactions, employee_map, counts, watermark, row_filter, metrics)
+    
+    return counts
+
+
+def new_sync_counts():
+    return {"fetched": 0, "skipped": 0, "filtered": 0, "staged": 0, "processed": 0, "errors": 0}
+
+
+def process_page(cfg, server, transactions, employee_map, counts, watermark=None, row_filter=None, metrics=None):
+    """
+    Stage or insert one fetched page of `server`, adding to `counts` and
+    advancing `watermark` in memory. Rows that fail to insert on a lock
+    timeout or deadlock are recorded in the staging queue for retry, so the
+    mark can move past them; other failures are left to the Error Summary.
+    """
+    counts["fetched"] += len(transactions)
+    if metrics:
+        metrics.incr("rows_fetched", len(transactions))
+    
+    new_transactions = transactions
+    if watermark:
+        new_transactions = [t for t in transactions if not t.get('id') or cint(t.get('id')) > watermark.start_id]
+        counts["skipped"] += len(transactions) - len(new_transactions)
+    
+    if row_filter:
+        # Rows a server sent despite the filter params; the watermark still moves past them
+        matching = [t for t in new_transactions if row_filter.matches(t)]
+        counts["filtered"] += len(new_transactions) - len(matching)
+    else:
+        matching = new_transactions
+    
+    if matching and cfg.use_staging_queue:
+        # Durable as soon as this returns; drain workers create the checkins
+        from zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_transaction_log.zkteco_transaction_log import stage_transactions
+        counts["staged"] += stage_transactions(matching, server)
+        if metrics:
+            metrics.incr("commits")
+    elif matching:
+        result = insert_employee_checkins(matching, employee_map, cfg.batch_size, server, metrics)
+        counts["processed"] += result["processed"]
+        counts["errors"] += len(result["failures"])
+        retryable = [failure for failure in result["failures"] if is_retryable_error(failure["error"])]
+        if retryable:
+            from zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_transaction_log.zkteco_transaction_log import stage_failed_transactions
+            stage_failed_transactions(retryable, server)
             frappe.db.commit()
-            
-            frappe.logger().info(f"ZKTeco Sync completed: {processed_count} processed, {error_count} errors")
+    
+    if watermark:
+        advance_watermark(watermark, new_transactions)
+
+
+def increment_total_synced(count):
+    if not count:
+        return
+    
+    # Increment in place: concurrent partitions and servers would lose updates
+    # with a read-then-write of the Single value
+    frappe.db.multisql({
+        "mariadb": """
+            UPDATE `tabSingles` SET `value` = CAST(`value` AS SIGNED) + %(count)s
+            WHERE `doctype` = 'ZKTeco Config' AND `field` = 'total_synced_records'
+        """,
+        "postgres": """
+            UPDATE "tabSingles" SET "value" = (CAST("value" AS BIGINT) + %(count)s)::text
+            WHERE "doctype" = 'ZKTeco Config' AND "field" = 'total_synced_records'
+        """
+    }, {"count": cint(count)})
+    
+    if not frappe.db.exists("Singles", {"doctype": "ZKTeco Config", "field": "total_synced_records"}):
+        # First sync on this site; the Single value has never been saved
+        frappe.db.set_single_value("ZKTeco Config", "total_synced_records", cint(count))
+    
+    frappe.clear_document_cache("ZKTeco Config", "ZKTeco Config")
+    frappe.db.commit()
+
+
+def is_retryable_error(error):
+    """
+    Whether a failed insert may succeed as is on a later attempt: lock waits
+    and deadlocks, not unmapped employees or invalid rows
+    """
+    if isinstance(error, (frappe.QueryDeadlockError, frappe.QueryTimeoutError)):
+        return True
+    return bool(frappe.db.is_deadlocked(error) or frappe.db.is_timedout(error))
+
+
+def get_enabled_servers():
+    """
+    Names of the additional ZKBio Time servers to sync alongside ZKTeco Config
+    """
+    return frappe.get_all("ZKTeco Server", filters={"enabled": 1}, pluck="name", order_by="name asc")
+
+
+def get_watermark(server=None):
+    """
+    High-water mark of the last committed sync of a server: highest transaction
+    id and upload time ingested, and when that sync ran. `start_id` stays at the
+    loaded id for the whole run while `transaction_id` collects the new mark.
+    """
+    fields = ["last_transaction_id", "last_upload_time", "last_sync", "last_device_uploads"]
+    if server:
+        state = frappe.db.get_value("ZKTeco Server", server, fields, as_dict=True) or {}
+    else:
+        state = frappe.db.get_value("ZKTeco Config", None, fields, as_dict=True) or {}
+    
+    return frappe._dict(
+        start_id=cint(state.get("last_transaction_id")),
+        transaction_id=cint(state.get("last_transaction_id")),
+        upload_time=get_datetime(state["last_upload_time"]) if state.get("last_upload_time") else None,
+        last_sync=get_datetime(state["last_sync"]) if state.get("last_sync") else None,
+        device_uploads={
+            terminal: get_datetime(upload_time)
+            for terminal, upload_time in json.loads(state.get("last_device_uploads") or "{}").items()
+        },
+    )
+
+
+def advance_watermark(watermark, transactions):
+    """
+    Move the in-memory watermark, and the last upload of each device, past
+    `transactions`. Nothing is persisted here.
+    """
+    device_uploads = watermark.get("device_uploads")
+    for transaction in transactions:
+        watermark.transaction_id = max(watermark.transaction_id, cint(transaction.get('id')))
         
-    except Exception as e:
-        frappe.log_error(f"ZKTeco sync failed: {str(e)}", "ZKTeco Sync Fatal Error")
+        upload_time = transaction.get('upload_time') or transaction.get('punch_time')
+        try:
+            upload_time = get_datetime(upload_time) if upload_time else None
+        except Exception:
+            continue
+        if not upload_time:
+            continue
+        if not watermark.upload_time or upload_time > watermark.upload_time:
+            watermark.upload_time = upload_time
+        
+        terminal = transaction.get('terminal_sn')
+        if device_uploads is not None and terminal:
+            device_uploads[terminal] = max(upload_time, device_uploads.get(terminal, upload_time))
+
+
+def save_watermark(watermark, server=None):
+    values = {"last_transaction_id": watermark.transaction_id, "last_sync": watermark.last_sync}
+    if watermark.upload_time:
+        values["last_upload_time"] = watermark.upload_time
+    if watermark.get("device_uploads") is not None:
+        values["last_device_uploads"] = json.dumps({terminal: str(upload_time) for terminal, upload_time in watermark.device_uploads.items()})
+    
+    if server:
+        frappe.db.set_value("ZKTeco Server", server, values, update_modified=False)
+    else:
+        for field, value in values.items():
+            frappe.db.set_single_value("ZKTeco Config", field, value)
 
 
-def fetch_zkteco_transactions(cfg, start_time, end_time):
+def get_sync_window_start(cfg, watermark, current_time):
     """
-    Fetch transactions from ZKTeco device
+    Start of the punch_time window: the watermark upload time (or last sync, or
+    one hour ago on a first run) minus the configured overlap
     """
-    server_ip = cfg.server_ip
-    server_port = cfg.server_port
-    token = cfg.token
+    overlap = timedelta(seconds=cint(cfg.sync_overlap_seconds) if cfg.sync_overlap_seconds is not None else DEFAULT_SYNC_OVERLAP_SECONDS)
     
-    base_url = f"http://{server_ip}:{server_port}/iclock/api/transactions/"
+    if watermark.upload_time:
+        start_time = min(watermark.upload_time, current_time)
+    elif watermark.last_sync:
+        start_time = watermark.last_sync
+    else:
+        return current_time - timedelta(hours=1)
     
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {token}",
-    }
+    return start_time - overlap
+
+
+def get_late_upload_windows(cfg, watermark, start_time, current_time):
+    """
+    (terminal_sn, since) for each device whose last upload is older than the
+    sync window but within the Late Upload Lookback.
+
+    The API filters on punch time, and a device that is offline buffers punches
+    and uploads them later with their original times; anything it punched after
+    its last upload may still arrive, before the window the other devices are
+    fetched for. Devices quiet for longer are dropped from the watermark and
+    left to backfill.
+    """
+    device_uploads = watermark.get("device_uploads")
+    if not device_uploads:
+        return []
     
-    params = {
+    lookback = timedelta(hours=cint(cfg.late_upload_hours) if cfg.late_upload_hours is not None else DEFAULT_LATE_UPLOAD_HOURS)
+    for terminal, upload_time in list(device_uploads.items()):
+        if upload_time < current_time - lookback:
+            del device_uploads[terminal]
+    
+    return sorted((terminal, upload_time) for terminal, upload_time in device_uploads.items() if upload_time < start_time)
+
+
+def get_fetch_requests(cfg, start_time, end_time, watermark=None):
+    """
+    Query params of every request a sync window is fetched with: the window
+    itself, split by the Server-side Filters, then a request per quiet device
+    (see `get_late_upload_windows`) covering only that device from its last upload.
+    """
+    window = get_window_params(cfg, start_time, end_time)
+    requests = [{**window, **query} for query in get_filter_queries(cfg)]
+    
+    if watermark:
+        for terminal, since in get_late_upload_windows(cfg, watermark, start_time, end_time):
+            catch_up = get_window_params(cfg, since, start_time)
+            requests.extend({**catch_up, **query} for query in get_filter_queries(cfg, terminal))
+    
+    return requests
+
+
+def get_transaction_key(transaction_id, server=None):
+    """
+    Value stored in Employee Checkin.zkteco_transaction_id. Ids are only unique
+    per ZKBio Time server, so additional servers are namespaced by name.
+    """
+    transaction_id = cstr(transaction_id)
+    if server and transaction_id:
+        return f"{server}:{transaction_id}"
+    return transaction_id
+
+
+def fetch_zkteco_transactions(cfg, start_time, end_time, server=None, metrics=None, watermark=None):
+    """
+    Fetch transactions from ZKTeco device, yielding one page at a time.
+
+    Follows the API's `next`/`page` links until the window is exhausted. Errors
+    are raised rather than swallowed so a failed page never advances last_sync.
+    Rows are decoded with the configured JSON Decoder, which may yield compact
+    Transaction records instead of dicts. The Server-side Filters of ZKTeco
+    Config are sent as query params, over several requests when the lists are
+    long, and quiet devices are caught up with requests of their own.
+    """
+    client = get_client(cfg, server)
+    decoder = get_decoder(cfg.json_decoder)
+    
+    for request in get_fetch_requests(cfg, start_time, end_time, watermark):
+        params = {**request, "page": 1}
+        page_size = params["page_size"]
+        fetched = 0
+        while True:
+            started = time.monotonic()
+            # ijson decodes a streamed body as it arrives; closing the
+            # response hands its connection back to the pool
+            with client.get(TRANSACTIONS_PATH, params=params, stream=decoder == "ijson") as resp:
+                resp.raise_for_status()
+                data = decode_page(resp, decoder)
+            if metrics:
+                metrics.observe("fetch", time.monotonic() - started)
+                metrics.incr("pages")
+            transactions = extract_transactions(data)
+            if not transactions:
+                break
+            
+            fetched += len(transactions)
+            yield transactions
+            
+            next_page = get_next_page(data, params["page"], page_size, fetched)
+            if not next_page:
+                break
+            params["page"] = next_page
+
+
+def get_window_params(cfg, start_time, end_time):
+    return {
         "start_time": start_time.strftime("%Y-%m-%d %H:%M:%S"),
         "end_time": end_time.strftime("%Y-%m-%d %H:%M:%S"),
+        "page_size": cint(cfg.page_size) or DEFAULT_PAGE_SIZE,
     }
-    
-    try:
-        resp = requests.get(base_url, headers=headers, params=params, timeout=30)
-        resp.raise_for_status()
-        
-        data = resp.json()
-        
-        # Handle ZKTeco API response format
-        if isinstance(data, dict) and 'data' in data:
-            return data['data']
-        elif isinstance(data, dict) and 'results' in data:
-            return data['results']
-        elif isinstance(data, list):
-            return data
-        else:
-            return []
-            
-    except Exception as e:
-        frappe.log_error(f"Failed to fetch ZKTeco transactions: {str(e)}", "ZKTeco API Error")
+
+
+def extract_transactions(data):
+    """
+    Pull the transaction list out of a ZKTeco API response body
+    """
+    # Handle ZKTeco API response format
+    if isinstance(data, dict) and 'data' in data:
+        return data['data'] or []
+    elif isinstance(data, dict) and 'results' in data:
+        return data['results'] or []
+    elif isinstance(data, list):
+        return data
+    else:
         return []
 
 
-def create_employee_checkin(transaction):
+def get_next_page(data, current_page, page_size, fetched):
+    """
+    Work out the next page number from a paginated ZKTeco response.
+
+    Prefers the `page` query param of the `next` link (the link's host is
+    whatever ZKBio Time thinks it is, so we only trust the page number), and
+    falls back to `count` for servers that don't send `next`.
+    """
+    if not isinstance(data, dict):
+        return None
+    
+    next_link = data.get("next")
+    if next_link:
+        page = parse_qs(urlparse(next_link).query).get("page")
+        next_page = cint(page[0]) if page else current_page + 1
+        return next_page if next_page > current_page else None
+    
+    if "next" not in data and cint(data.get("count")) > fetched and len(extract_transactions(data)) >= page_size:
+        return current_page + 1
+    
+    return None
+
+
+def create_employee_checkin(transaction, employee_map=None, server=None):
     """
     Create Employee Checkin record from ZKTeco transaction
     """
     try:
-        # Extract transaction data based on ZKTeco API response structure
-        emp_code = transaction.get('emp_code')
-        punch_time = transaction.get('punch_time')
-        punch_state = transaction.get('punch_state')
-        device_id = transaction.get('terminal_alias') or transaction.get('terminal_sn')
-        transaction_id = transaction.get('id')
-        
-        if not emp_code or not punch_time:
-            frappe.log_error(f"Missing required fields in transaction: {transaction}", "ZKTeco Transaction Error")
-            return False
-        
-        # Find employee
-        employee = find_employee_by_code(emp_code)
-        if not employee:
-            frappe.log_error(f"Employee not found for code: {emp_code}", "ZKTeco Employee Mapping")
-            return False
-        
-        # Convert punch_time to datetime
-        if isinstance(punch_time, str):
-            punch_datetime = get_datetime(punch_time)
-        else:
-            punch_datetime = punch_time
-        
-        # Determine log type based on punch_state
-        log_type = "IN"
-        if punch_state == "1":  # Based on API response: "1" = Check Out
-            log_type = "OUT"
-        
-        # Check if checkin already exists (use transaction ID for uniqueness)
-        existing_checkin = frappe.db.exists("Employee Checkin", {
-            "employee": employee,
-            "time": punch_datetime,
-            "device_id": device_id
-        })
-        
-        if existing_checkin:
+        checkin = build_employee_checkin(transaction, employee_map, server=server)
+        if checkin is None:
             return True  # Already processed
         
-        # Also check by transaction ID if we store it
-        if transaction_id:
-            existing_by_id = frappe.db.get_value("Employee Checkin", 
-                                               {"device_id": device_id, "employee": employee}, 
-                                               "name", 
-                                               {"time": ["between", [punch_datetime - timedelta(seconds=5), punch_datetime + timedelta(seconds=5)]]})
-            if existing_by_id:
-                return True
-        
-        # Create Employee Checkin
-        checkin = frappe.get_doc({
-            "doctype": "Employee Checkin",
-            "employee": employee,
-            "time": punch_datetime,
-            "log_type": log_type,
-            "device_id": f"{device_id} (ZKTeco-{transaction_id})" if transaction_id else device_id or "ZKTeco Device",
-            "skip_auto_attendance": 0
-        })
-        
         checkin.insert(ignore_permissions=True)
         frappe.db.commit()
         
         return True
         
     except Exception as e:
-        frappe.log_error(f"Error creating Employee Checkin: {str(e)}", "ZKTeco Checkin Creation")
+        report_errors([{"transaction": transaction, "error": e}], server)
         return False
 
 
-def find_employee_by_code(emp_code):
+def insert_employee_checkins(transactions, employee_map=None, batch_size=None, server=None, metrics=None, report=True):
     """
-    Find employee by various ID fields
+    Insert Employee Checkins in chunks of `batch_size`, committing once per chunk.
+
+    Every row still goes through `insert()` so Employee Checkin validations and
+    HRMS hooks run. A failing row is rolled back to its savepoint and reported
+    without aborting the rest of the chunk. Retries pass `report=False`, as
+    their rows were already counted and reported on the first attempt.
     """
-    # Try employee field first
-    employee = frappe.db.get_value("Employee", {"employee": emp_code}, "name")
-    if employee:
-        return employee
+    batch_size = cint(batch_size) or DEFAULT_BATCH_SIZE
+    processed = 0
+    failures = []
+    checkin_index = build_checkin_index(transactions, employee_map, server)
     
-    # Try user_id field
-    employee = frappe.db.get_value("Employee", {"user_id": emp_code}, "name")
-    if employee:
-        return employee
+    for start in range(0, len(transactions), batch_size):
+        chunk = transactions[start:start + batch_size]
+        chunk_failures = []
+        inserted_punches = []
+        dedup_hits = 0
+        device_counts = {}
+        
+        for transaction in chunk:
+            device_count = device_counts.setdefault(
+                (server, transaction.get('terminal_alias') or transaction.get('terminal_sn')),
+                new_device_count()
+            )
+            add_seen(device_count, transaction)
+            frappe.db.savepoint(CHECKIN_SAVEPOINT)
+            try:
+                checkin = build_employee_checkin(transaction, employee_map, checkin_index, server)
+                if checkin is None:
+                    dedup_hits += 1
+                    device_count["duplicates"] += 1
+                else:
+                    started = time.monotonic()
+                    checkin.insert(ignore_permissions=True)
+                    if metrics:
+                        metrics.observe("insert", time.monotonic() - started)
+                    checkin_index.add(checkin.employee, checkin.device_id, get_datetime(checkin.time), checkin.zkteco_transaction_id)
+                    inserted_punches.append(checkin.time)
+                    add_punch(device_count, transaction)
+                processed += 1
+            except Exception as e:
+                frappe.db.rollback(save_point=CHECKIN_SAVEPOINT)
+                if isinstance(e, frappe.UniqueValidationError) or frappe.db.is_unique_key_violation(e):
+                    # Another run stored this transaction id first
+                    dedup_hits += 1
+                    device_count["duplicates"] += 1
+                    processed += 1
+                    continue
+                chunk_failures.append({"transaction": transaction, "error": e})
+                device_count["failed"] += 1
+        
+        if report:
+            # Hourly per-device counters ride in the chunk's transaction, so the
+            # status view never has to count Employee Checkin rows
+            record_counts(device_counts)
+            
+            # Counted in Redis rather than one Error Log row per failure; a badge that
+            # fails every sync would otherwise be the biggest writer on the site
+            report_errors(chunk_failures, server)
+        
+        frappe.db.commit()
+        failures.extend(chunk_failures)
+        
+        if metrics:
+            metrics.incr("commits")
+            metrics.incr("inserted", len(inserted_punches))
+            metrics.incr("dedup_hits", dedup_hits)
+            metrics.incr("failed", len(chunk_failures))
+            metrics.incr("unmapped", sum(1 for f in chunk_failures if isinstance(f["error"], EmployeeNotMappedError)))
+            metrics.observe_lag(inserted_punches)
+    
+    return {"processed": processed, "failures": failures}
+
+
+def build_checkin_index(transactions, employee_map=None, server=None):
+    """
+    Load existing checkins for the employees and time span of `transactions` in one query
+    """
+    employees = set()
+    punch_times = []
+    transaction_ids = [get_transaction_key(t.get('id'), server) for t in transactions if t.get('id')]
     
-    # Try attendance_device_id if it exists
-    if frappe.db.has_column("Employee", "attendance_device_id"):
-        employee = frappe.db.get_value("Employee", {"attendance_device_id": emp_code}, "name")
-        if employee:
-            return employee
+    for transaction in transactions:
+        employee = find_employee_by_code(transaction.get('emp_code'), employee_map)
+        if not employee or not transaction.get('punch_time'):
+            continue
+        try:
+            punch_times.append(get_datetime(transaction.get('punch_time')))
+        except Exception:
+            continue  # Reported when the row itself is built
+        employees.add(employee)
     
-    return None
+    if not punch_times:
+        return CheckinIndex.load([], None, None, transaction_ids)
+    
+    return CheckinIndex.load(employees, min(punch_times), max(punch_times), transaction_ids)
+
+
+def build_employee_checkin(transaction, employee_map=None, checkin_index=None, server=None):
+    """
+    Validate a ZKTeco transaction and build its (unsaved) Employee Checkin.
+
+    Returns None when the punch has already been synced and raises
+    InvalidTransactionError / EmployeeNotMappedError for unusable rows.
+    """
+    # Extract transaction data based on ZKTeco API response structure
+    emp_code = transaction.get('emp_code')
+    punch_time = transaction.get('punch_time')
+    punch_state = transaction.get('punch_state')
+    device_id = transaction.get('terminal_alias') or transaction.get('terminal_sn')
+    transaction_id = get_transaction_key(transaction.get('id'), server)
+    
+    if not emp_code or not punch_time:
+        raise InvalidTransactionError(f"Missing required fields in transaction: {transaction}")
+    
+    # Find employee
+    employee = find_employee_by_code(emp_code, employee_map)
+    if not employee:
+        raise EmployeeNotMappedError(f"Employee not found for code: {emp_code}")
+    
+    # Convert punch_time to datetime
+    if isinstance(punch_time, str):
+        punch_datetime = get_datetime(punch_time)
+    else:
+        punch_datetime = punch_time
+    
+    # Determine log type based on punch_state
+    log_type = "IN"
+    if punch_state == "1":  # Based on API response: "1" = Check Out
+        log_type = "OUT"
+    
+    if checkin_index is None:
+        checkin_index = build_checkin_index([transaction], employee_map, server)
+    
+    # Transaction id already stored => already synced
+    if checkin_index.has_transaction(transaction_id):
+        return None
+    
+    # Same employee, same device, within the duplicate tolerance => already synced
+    if checkin_index.contains(employee, device_id, punch_datetime):
+        return None  # Already processed
+    
+    # Create Employee Checkin
+    return frappe.get_doc({
+        "doctype": "Employee Checkin",
+        "employee": employee,
+        "time": punch_datetime,
+        "log_type": log_type,
+        "device_id": f"{device_id} (ZKTeco-{transaction_id})" if transaction_id else device_id or "ZKTeco Device",
+        "zkteco_transaction_id": transaction_id or None,
+        "skip_auto_attendance": 0
+    })
+
+
+def find_employee_by_code(emp_code, employee_map=None):
+    """
+    Find employee by various ID fields (employee, user_id, attendance_device_id)
+    using the cached bulk emp_code map
+    """
+    return resolve_employee(emp_code, employee_map)
 
 
 @frappe.whitelist()
@@ -379,37 +890,171 @@ def manual_sync():
     Manual sync trigger for testing
     """
     try:
-        sync_zkteco_transactions()
+        result = sync_zkteco_transactions(trigger="manual")
+        if result and result.get("status") == "coalesced":
+            holder = result.get("holder") or {}
+            return {
+                "success": True,
+                "message": f"A sync started by {holder.get('trigger') or 'another worker'} is already running; it will run again when it finishes"
+            }
         return {"success": True, "message": "Sync completed successfully"}
     except Exception as e:
         frappe.log_error(f"Manual sync failed: {str(e)}", "ZKTeco Manual Sync")
         return {"success": False, "message": f"Sync failed: {str(e)}"}
 
 
+@frappe.whitelist(allow_guest=True, methods=["GET", "POST"])
+def receive_push():
+    """
+    Push ingestion from devices or ZKBio Time, so punches arrive without polling.
+
+    - ADMS/iclock: devices call `/iclock/cdata?SN=<serial>` (route it here from the
+      reverse proxy). The serial must be listed in Push Device Serials and the
+      request must come from Push Allowed Networks: devices cannot send a
+      secret, and their serials are printed on them.
+    - Webhook: a JSON batch of transactions (a list, or {"data": [...]}) with the
+      Push Token in the `X-ZKTeco-Token` header.
+
+    Batches are queued into the same batched insert pipeline as polling.
+    """
+    cfg = get_config()
+    if not cfg.enable_push:
+        frappe.throw(_("ZKTeco push ingestion is disabled"), frappe.PermissionError)
+    
+    serial_number = frappe.form_dict.get("SN")
+    if serial_number:
+        return receive_adms_push(cfg, cstr(serial_number).strip())
+    
+    return receive_webhook_push(cfg)
+
+
+def receive_adms_push(cfg, serial_number):
+    if not is_push_address_allowed(cfg, frappe.local.request_ip):
+        return Response("ERROR: address not allowed", status=403, mimetype="text/plain")
+    
+    if serial_number not in get_push_device_serials(cfg):
+        return Response("ERROR: unknown device", status=403, mimetype="text/plain")
+    
+    if frappe.request.method == "GET":
+        return Response(get_handshake_options(serial_number), mimetype="text/plain")
+    
+    # Devices also upload OPERLOG, photos etc.; acknowledge them so they aren't resent
+    if cstr(frappe.form_dict.get("table")).upper() != "ATTLOG":
+        return Response("OK", mimetype="text/plain")
+    
+    transactions = parse_attlog(frappe.request.get_data(as_text=True), serial_number)
+    enqueue_pushed_transactions(transactions, ADMS_NAMESPACE)
+    set_attlog_stamp(serial_number, frappe.form_dict.get("Stamp"))
+    return Response(f"OK: {len(transactions)}", mimetype="text/plain")
+
+
+def receive_webhook_push(cfg):
+    token = frappe.get_request_header("X-ZKTeco-Token") or ""
+    expected = cfg.get_password("push_token", raise_exception=False) or ""
+    if not expected or not hmac.compare_digest(token.encode(), expected.encode()):
+        frappe.throw(_("Invalid ZKTeco push token"), frappe.AuthenticationError)
+    
+    data = frappe.parse_json(frappe.request.get_data(as_text=True) or "[]")
+    
+    # Batches from an additional server say which one, so ids are namespaced like polled rows
+    server = data.get("server") if isinstance(data, dict) else None
+    if server and not frappe.db.exists("ZKTeco Server", server):
+        frappe.throw(_("Unknown ZKTeco Server {0}").format(server))
+    
+    transactions = extract_transactions(data)
+    enqueue_pushed_transactions(transactions, server)
+    return {"queued": len(transactions)}
+
+
+def get_push_device_serials(cfg):
+    return {line.strip() for line in cstr(cfg.push_device_serials).splitlines() if line.strip()}
+
+
+def get_push_networks(cfg):
+    return [line.strip() for line in cstr(cfg.push_allowed_networks).splitlines() if line.strip()]
+
+
+def is_push_address_allowed(cfg, address):
+    """
+    Whether `address` is inside Push Allowed Networks. Nothing is allowed while the list is empty.
+    """
+    try:
+        address = ipaddress.ip_address(cstr(address).strip())
+    except ValueError:
+        return False
+    
+    for network in get_push_networks(cfg):
+        try:
+            if address in ipaddress.ip_network(network, strict=False):
+                return True
+        except ValueError:
+            continue
+    return False
+
+
+def enqueue_pushed_transactions(transactions, server=None):
+    for start in range(0, len(transactions), PUSH_JOB_SIZE):
+        frappe.enqueue(
+            "zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_config.zkteco_config.process_pushed_transactions",
+            queue="short",
+            transactions=transactions[start:start + PUSH_JOB_SIZE],
+            server=server,
+        )
+
+
+def process_pushed_transactions(transactions, server=None):
+    """
+    Background job: insert a pushed batch through the regular batched pipeline
+    """
+    # Pushes arrive as Guest; create checkins as the scheduler would
+    frappe.set_user("Administrator")
+    
+    cfg = get_config()
+    if cfg.use_staging_queue:
+        from zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_transaction_log.zkteco_transaction_log import enqueue_staging_drain, stage_transactions
+        stage_transactions(transactions, server)
+        enqueue_staging_drain(cfg)
+        return
+    
+    employee_map = get_employee_code_map(use_redis=bool(cfg.cache_employee_map_in_redis))
+    result = insert_employee_checkins(transactions, employee_map, cfg.batch_size, server)
+    increment_total_synced(result["processed"])
+    return result
+
+
 def scheduled_sync():
     """
-    Scheduled sync function that respects the frequency setting
+    Runs every minute from the scheduler. Frequencies under a minute are handled
+    by the sync loop (`bench zkteco-sync-worker`, or a loop job enqueued from
+    here); longer ones run directly once they are due.
     """
     try:
-        cfg = frappe.get_single("ZKTeco Config")
+        cfg = get_config()
         if not cfg.enable_sync:
             return
-            
-        # For frequent syncs (less than 60 seconds), check if we should actually run
-        sync_seconds = int(cfg.seconds or 300)
-        if sync_seconds < 60:
-            last_run = frappe.cache().get_value("zkteco_last_sync_run")
-            current_time = now_datetime()
-            
-            if last_run:
-                time_diff = (current_time - get_datetime(last_run)).total_seconds()
-                if time_diff < sync_seconds:
-                    return  # Not yet time for next sync
-            
-            # Update last run time
-            frappe.cache().set_value("zkteco_last_sync_run", current_time)
         
-        sync_zkteco_transactions()
+        # A running loop honours the configured frequency by itself
+        if is_loop_running():
+            return
+        
+        if needs_sync_loop(cfg):
+            ensure_sync_loop()
+            return
+        
+        sync_seconds = get_sync_seconds(cfg)
+        
+        last_run = frappe.cache().get_value("zkteco_last_sync_run")
+        current_time = now_datetime()
+        
+        if last_run:
+            time_diff = (current_time - get_datetime(last_run)).total_seconds()
+            if time_diff < sync_seconds - SCHEDULER_SLACK_SECONDS:
+                return  # Not yet time for next sync
+        
+        # Update last run time
+        frappe.cache().set_value("zkteco_last_sync_run", current_time)
+        
+        sync_zkteco_transactions(cfg=cfg)
         
     except Exception as e:
         frappe.log_error(f"Scheduled ZKTeco sync failed: {str(e)}", "ZKTeco Scheduled Sync Error")
@@ -420,7 +1065,7 @@ def cleanup_scheduler_check():
     Cleanup function to ensure scheduler is working properly
     """
     try:
-        cfg = frappe.get_single("ZKTeco Config")
+        cfg = get_config()
         if cfg.enable_sync:
             # Log that the scheduler is active
             frappe.logger().info("ZKTeco scheduler check: Active")
@@ -434,24 +1079,25 @@ def get_sync_status():
     Get current sync status and statistics
     """
     try:
-        cfg = frappe.get_single("ZKTeco Config")
+        cfg = get_config()
         
         # Get last sync time
         last_sync = frappe.db.get_single_value("ZKTeco Config", "last_sync")
         
-        # Count recent employee checkins from ZKTeco
-        recent_checkins = frappe.db.count("Employee Checkin", {
-            "device_id": ["like", "%ZKTeco%"],
-            "creation": [">=", frappe.utils.add_days(today(), -1)]
-        })
+        # Read from the hourly counters kept by the insert loop; at most one
+        # row per hour and device instead of a count over Employee Checkin
+        recent_counts = get_recent_counts(hours=24)
         
         return {
             "enabled": cfg.enable_sync,
             "sync_frequency": cfg.seconds,
             "last_sync": last_sync,
-            "recent_checkins_24h": recent_checkins,
+            "recent_checkins_24h": recent_counts["inserted"],
+            "recent_counts": recent_counts,
             "server_configured": bool(cfg.server_ip and cfg.server_port),
-            "token_configured": bool(cfg.token)
+            "token_configured": bool(cfg.token or cfg.username),
+            "sync_lock": SyncLock(SYNC_LOCK_NAME).holder(),
+            "metrics": get_sync_run_stats(hours=24)
         }
         
     except Exception as e:
@@ -0,0 +1,140 @@
+# Copyright (c) 2025, osama.ahmed@deliverydevs.com
+# For license information, please see license.txt
+
+import hashlib
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import add_to_date, cint, cstr, flt, get_datetime, now_datetime
+
+from zkteco_checkins_sync.zkteco_checkin_sync.config_snapshot import get_config
+from zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_sync_counter.zkteco_sync_counter import (
+    COUNTER_FIELDS,
+    UPLOAD_FIELDS,
+    get_hour,
+)
+
+
+DOCTYPE = "ZKTeco Device Health"
+WINDOW_HOURS = 24
+
+# Share of a device's transactions that failed (percent) before it is Failing
+FAILING_ERROR_RATE = 20
+
+DEFAULT_SILENT_HOURS = 4
+DEFAULT_LAG_MINUTES = 30
+
+HEALTH_FIELDS = [
+    "status",
+    "last_punch_time",
+    "last_upload_time",
+    "punches_24h",
+    "punches_per_hour",
+    "peak_punches_per_hour",
+    "duplicates_24h",
+    "failed_24h",
+    "error_rate",
+    "avg_upload_lag_seconds",
+    "max_upload_lag_seconds",
+]
+
+
+class ZKTecoDeviceHealth(Document):
+    pass
+
+
+def get_device_name(server=None, device=None):
+    return hashlib.sha1(f"{cstr(server)}|{cstr(device)}".encode()).hexdigest()[:20]
+
+
+@frappe.whitelist()
+def refresh():
+    frappe.only_for(("System Manager", "HR Manager"))
+    refresh_device_health()
+
+
+def refresh_device_health():
+    """
+    Scheduled: rebuild each device's row from the hourly ZKTeco Sync Counter
+    rows of the last 24 hours. A device with nothing in the window keeps its
+    last punch time and turns Silent, so it stays visible once it stops uploading.
+    """
+    since = get_hour(add_to_date(now_datetime(), hours=-WINDOW_HOURS))
+    hours = frappe.get_all(
+        "ZKTeco Sync Counter",
+        filters={"hour": [">=", since]},
+        fields=["server", "device", *COUNTER_FIELDS, *UPLOAD_FIELDS],
+    )
+
+    devices = {}
+    for row in hours:
+        device = devices.setdefault((row.server or "", row.device or ""), {"hours": []})
+        device["hours"].append(row)
+
+    existing = {
+        (row.server or "", row.device or ""): row
+        for row in frappe.get_all(DOCTYPE, fields=["name", "server", "device", *HEALTH_FIELDS])
+    }
+
+    cfg = get_config()
+    thresholds = {
+        "silent_hours": cint(cfg.device_silent_hours) or DEFAULT_SILENT_HOURS,
+        "lag_minutes": cint(cfg.device_lag_minutes) or DEFAULT_LAG_MINUTES,
+    }
+
+    for key in set(devices) | set(existing):
+        previous = existing.get(key)
+        values = get_health(devices.get(key, {}).get("hours", []), previous, thresholds)
+
+        if previous:
+            # Most devices look the same from one run to the next
+            changed = {field: value for field, value in values.items() if value != previous.get(field)}
+            if changed:
+                frappe.db.set_value(DOCTYPE, previous.name, changed)
+            continue
+
+        server, device = key
+        frappe.get_doc({"doctype": DOCTYPE, "server": server or None, "device": device or None, **values}).insert(
+            ignore_permissions=True, set_name=get_device_name(server, device)
+        )
+
+    frappe.db.commit()
+
+
+def get_health(hours, previous, thresholds):
+    def latest(field):
+        times = [get_datetime(row[field]) for row in hours if row[field]]
+        if previous and previous.get(field):
+            times.append(get_datetime(previous.get(field)))
+        return max(times) if times else None
+
+    inserted = sum(cint(row.inserted) for row in hours)
+    duplicates = sum(cint(row.duplicates) for row in hours)
+    failed = sum(cint(row.failed) for row in hours)
+    transactions = inserted + duplicates + failed
+
+    values = {
+        "last_punch_time": latest("last_punch_time"),
+        "last_upload_time": latest("last_upload_time"),
+        "punches_24h": inserted,
+        "punches_per_hour": flt(inserted / WINDOW_HOURS, 2),
+        "peak_punches_per_hour": max((cint(row.inserted) for row in hours), default=0),
+        "duplicates_24h": duplicates,
+        "failed_24h": failed,
+        "error_rate": flt(failed * 100 / transactions, 2) if transactions else 0,
+        "avg_upload_lag_seconds": flt(sum(flt(row.upload_lag_seconds) for row in hours) / inserted, 3) if inserted else 0,
+        "max_upload_lag_seconds": max((flt(row.max_upload_lag_seconds) for row in hours), default=0),
+    }
+    values["status"] = get_status(values, thresholds)
+    return values
+
+
+def get_status(values, thresholds):
+    last_seen = values["last_upload_time"] or values["last_punch_time"]
+    if not last_seen or last_seen < add_to_date(now_datetime(), hours=-thresholds["silent_hours"]):
+        return "Silent"
+    if values["error_rate"] >= FAILING_ERROR_RATE:
+        return "Failing"
+    if values["avg_upload_lag_seconds"] > thresholds["lag_minutes"] * 60:
+        return "Lagging"
+    return "Healthy"
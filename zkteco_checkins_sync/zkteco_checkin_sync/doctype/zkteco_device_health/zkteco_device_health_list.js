@@ -0,0 +1,22 @@
+// Copyright (c) 2025, osama.ahmed@deliverydevs.com and contributors
+// For license information, please see license.txt
+
+frappe.listview_settings["ZKTeco Device Health"] = {
+    get_indicator(doc) {
+        const colors = {
+            "Healthy": "green",
+            "Lagging": "orange",
+            "Failing": "red",
+            "Silent": "gray"
+        };
+        return [__(doc.status), colors[doc.status], "status,=," + doc.status];
+    },
+
+    onload(listview) {
+        listview.page.add_inner_button(__("Refresh"), function() {
+            frappe.call({
+                method: "zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_device_health.zkteco_device_health.refresh"
+            }).then(() => listview.refresh());
+        });
+    }
+};
@@ -0,0 +1,9 @@
+# Copyright (c) 2025, osama.ahmed@deliverydevs.com and Contributors
+# See license.txt
+
+# import frappe
+from frappe.tests.utils import FrappeTestCase
+
+
+class TestZKTecoErrorSummary(FrappeTestCase):
+	pass
@@ -0,0 +1,194 @@
+# Copyright (c) 2025, osama.ahmed@deliverydevs.com
+# For license information, please see license.txt
+
+import hashlib
+import json
+import traceback
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import add_days, cint, cstr, now_datetime
+
+
+DOCTYPE = "ZKTeco Error Summary"
+
+# Redis hashes keyed by "kind<TAB>emp_code<TAB>window start". The sync only
+# touches these; flush_error_summaries moves them into the database.
+COUNTS_KEY = "zkteco_error_counts"
+FIRST_SEEN_KEY = "zkteco_error_first_seen"
+LAST_SEEN_KEY = "zkteco_error_last_seen"
+FLUSHING_SUFFIX = ":flushing"
+
+# Errors without an `error_kind` attribute (anything unexpected)
+DEFAULT_ERROR_KIND = "Checkin Error"
+
+ERROR_RETENTION_DAYS = 90
+
+# Move the live hashes aside in one step, unless a previous flush never finished
+SWAP_SCRIPT = """
+if redis.call("exists", KEYS[4]) == 1 then
+    return 0
+end
+for i = 1, 3 do
+    if redis.call("exists", KEYS[i]) == 1 then
+        redis.call("rename", KEYS[i], KEYS[i + 3])
+    end
+end
+return 1
+"""
+
+
+UPSERT_SQL = {
+    "mariadb": """
+        INSERT INTO `tabZKTeco Error Summary`
+            (name, creation, modified, owner, modified_by, kind, emp_code, window_start, `count`, first_seen,
+            last_seen, server, terminal, last_error, sample_transaction)
+        VALUES (%(name)s, %(now)s, %(now)s, %(user)s, %(user)s, %(kind)s, %(emp_code)s, %(window_start)s, %(count)s,
+            %(first_seen)s, %(last_seen)s, %(server)s, %(terminal)s, %(last_error)s, %(sample_transaction)s)
+        ON DUPLICATE KEY UPDATE
+            `count` = `count` + VALUES(`count`),
+            last_seen = VALUES(last_seen),
+            server = VALUES(server),
+            terminal = VALUES(terminal),
+            last_error = VALUES(last_error),
+            sample_transaction = VALUES(sample_transaction),
+            modified = VALUES(modified)
+    """,
+    "postgres": """
+        INSERT INTO "tabZKTeco Error Summary"
+            (name, creation, modified, owner, modified_by, kind, emp_code, window_start, count, first_seen,
+            last_seen, server, terminal, last_error, sample_transaction)
+        VALUES (%(name)s, %(now)s, %(now)s, %(user)s, %(user)s, %(kind)s, %(emp_code)s, %(window_start)s, %(count)s,
+            %(first_seen)s, %(last_seen)s, %(server)s, %(terminal)s, %(last_error)s, %(sample_transaction)s)
+        ON CONFLICT (name) DO UPDATE SET
+            count = "tabZKTeco Error Summary".count + EXCLUDED.count,
+            last_seen = EXCLUDED.last_seen,
+            server = EXCLUDED.server,
+            terminal = EXCLUDED.terminal,
+            last_error = EXCLUDED.last_error,
+            sample_transaction = EXCLUDED.sample_transaction,
+            modified = EXCLUDED.modified
+    """,
+}
+
+
+class ZKTecoErrorSummary(Document):
+    pass
+
+
+def get_window_start(moment=None):
+    return (moment or now_datetime()).replace(minute=0, second=0, microsecond=0)
+
+
+def get_keys():
+    """
+    The live hashes and their flushing counterparts
+    """
+    cache = frappe.cache()
+    keys = (COUNTS_KEY, FIRST_SEEN_KEY, LAST_SEEN_KEY)
+    return [cache.make_key(key) for key in keys], [cache.make_key(key + FLUSHING_SUFFIX) for key in keys]
+
+
+def report_errors(failures, server=None):
+    """
+    Count failed transactions by (kind, emp_code, hour) in Redis.
+
+    Called from the insert loop in place of frappe.log_error: a chunk's failures
+    become one Redis round trip and no database writes, however often the same
+    badge fails. `failures` are {"transaction": ..., "error": ...} dicts.
+    """
+    if not failures:
+        return
+
+    now = now_datetime()
+    window = str(get_window_start(now))
+    groups = {}
+    for failure in failures:
+        transaction, error = failure["transaction"], failure["error"]
+        kind = getattr(error, "error_kind", DEFAULT_ERROR_KIND)
+        field = "\t".join((kind, cstr(transaction.get("emp_code")), window))
+
+        group = groups.setdefault(field, {"count": 0})
+        group["count"] += 1
+        group["last"] = {
+            "last_seen": str(now),
+            "server": server,
+            "terminal": transaction.get("terminal_alias") or transaction.get("terminal_sn"),
+            "last_error": format_error(error, kind),
+            "sample_transaction": {k: v for k, v in transaction.items() if k != "log_name"},
+        }
+
+    (counts_key, first_seen_key, last_seen_key), _flushing = get_keys()
+    pipe = frappe.cache().pipeline()
+    for field, group in groups.items():
+        pipe.hincrby(counts_key, field, group["count"])
+        pipe.hsetnx(first_seen_key, field, str(now))
+        pipe.hset(last_seen_key, field, json.dumps(group["last"], default=str))
+    pipe.execute()
+
+
+def format_error(error, kind):
+    # Expected kinds are self-explanatory; keep the traceback for anything else
+    if kind != DEFAULT_ERROR_KIND:
+        return str(error)
+    return "".join(traceback.format_exception(type(error), error, error.__traceback__))[-2000:]
+
+
+def flush_error_summaries():
+    """
+    Scheduled: add the counts gathered in Redis to ZKTeco Error Summary, one
+    row per (kind, emp_code, hour)
+    """
+    cache = frappe.cache()
+    live, flushing = get_keys()
+    cache.eval(SWAP_SCRIPT, 6, *live, *flushing)
+
+    pipe = cache.pipeline()
+    for key in flushing:
+        pipe.hgetall(key)
+    counts, first_seen, last_seen = pipe.execute()
+    if not counts:
+        return
+
+    for field, count in counts.items():
+        field = cstr(field)
+        kind, emp_code, window = field.split("\t")
+        last = json.loads(last_seen.get(field.encode()) or "{}")
+        upsert_summary(field, kind, emp_code, window, cint(count), cstr(first_seen.get(field.encode())) or window, last)
+
+    frappe.db.commit()
+    cache.delete(*flushing)
+
+
+def upsert_summary(field, kind, emp_code, window, count, first_seen, last):
+    """
+    Add `count` to the summary row of `field`, creating it if needed, in one
+    atomic statement so concurrent flushes never race on the insert
+    """
+    frappe.db.multisql(
+        UPSERT_SQL,
+        {
+            # Deterministic name, so every flush of the same window lands on one row
+            "name": hashlib.sha1(field.encode()).hexdigest()[:20],
+            "now": now_datetime(),
+            "user": frappe.session.user,
+            "kind": kind,
+            "emp_code": emp_code or None,
+            "window_start": window,
+            "count": count,
+            "first_seen": first_seen,
+            "last_seen": last.get("last_seen"),
+            "server": last.get("server"),
+            "terminal": last.get("terminal"),
+            "last_error": last.get("last_error"),
+            "sample_transaction": json.dumps(last.get("sample_transaction"), indent=1, default=str),
+        },
+    )
+
+
+def clear_old_error_summaries():
+    """
+    Scheduled: delete summaries older than the retention period
+    """
+    frappe.db.delete(DOCTYPE, {"window_start": ["<", add_days(now_datetime(), -ERROR_RETENTION_DAYS)]})
+    frappe.db.commit()
@@ -0,0 +1,39 @@
+# Copyright (c) 2025, osama.ahmed@deliverydevs.com and Contributors
+# See license.txt
+
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import get_datetime
+
+from zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_sync_counter.zkteco_sync_counter import (
+	add_punch,
+	add_seen,
+	new_device_count,
+)
+
+
+class TestZKTecoSyncCounter(FrappeTestCase):
+	def test_duplicates_keep_the_device_seen(self):
+		count = new_device_count()
+		count["duplicates"] += 1
+		add_seen(count, {"punch_time": "2025-01-01 08:00:00", "upload_time": "2025-01-01 08:05:00"})
+
+		self.assertEqual(count["last_punch_time"], get_datetime("2025-01-01 08:00:00"))
+		self.assertEqual(count["last_upload_time"], get_datetime("2025-01-01 08:05:00"))
+		self.assertEqual(count["inserted"], 0)
+		self.assertIsNone(count["upload_lag_seconds"])
+
+	def test_inserted_punches_add_upload_lag(self):
+		count = new_device_count()
+		transaction = {"punch_time": "2025-01-01 08:00:00", "upload_time": "2025-01-01 08:05:00"}
+		add_seen(count, transaction)
+		add_punch(count, transaction)
+
+		self.assertEqual(count["inserted"], 1)
+		self.assertEqual(count["upload_lag_seconds"], 300)
+		self.assertEqual(count["max_upload_lag_seconds"], 300)
+
+	def test_unreadable_times_are_skipped(self):
+		count = new_device_count()
+		add_seen(count, {"punch_time": "not a time"})
+
+		self.assertIsNone(count["last_punch_time"])
@@ -0,0 +1,181 @@
+# Copyright (c) 2025, osama.ahmed@deliverydevs.com
+# For license information, please see license.txt
+
+import hashlib
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import add_days, add_to_date, cint, cstr, flt, get_datetime, now_datetime
+
+
+DOCTYPE = "ZKTeco Sync Counter"
+COUNTER_FIELDS = ("inserted", "duplicates", "failed")
+UPLOAD_FIELDS = ("last_punch_time", "last_upload_time", "upload_lag_seconds", "max_upload_lag_seconds")
+
+# A bucket per hour, server and device stays small; keep a bit over a year
+COUNTER_RETENTION_DAYS = 400
+
+UPSERT_SQL = {
+    "mariadb": """
+        INSERT INTO `tabZKTeco Sync Counter`
+            (name, creation, modified, owner, modified_by, hour, server, device, inserted, duplicates, failed,
+            last_punch_time, last_upload_time, upload_lag_seconds, max_upload_lag_seconds)
+        VALUES {rows}
+        ON DUPLICATE KEY UPDATE
+            inserted = inserted + VALUES(inserted),
+            duplicates = duplicates + VALUES(duplicates),
+            failed = failed + VALUES(failed),
+            last_punch_time = GREATEST(COALESCE(last_punch_time, VALUES(last_punch_time)), COALESCE(VALUES(last_punch_time), last_punch_time)),
+            last_upload_time = GREATEST(COALESCE(last_upload_time, VALUES(last_upload_time)), COALESCE(VALUES(last_upload_time), last_upload_time)),
+            upload_lag_seconds = upload_lag_seconds + VALUES(upload_lag_seconds),
+            max_upload_lag_seconds = GREATEST(max_upload_lag_seconds, VALUES(max_upload_lag_seconds)),
+            modified = VALUES(modified)
+    """,
+    "postgres": """
+        INSERT INTO "tabZKTeco Sync Counter"
+            (name, creation, modified, owner, modified_by, hour, server, device, inserted, duplicates, failed,
+            last_punch_time, last_upload_time, upload_lag_seconds, max_upload_lag_seconds)
+        VALUES {rows}
+        ON CONFLICT (name) DO UPDATE SET
+            inserted = "tabZKTeco Sync Counter".inserted + EXCLUDED.inserted,
+            duplicates = "tabZKTeco Sync Counter".duplicates + EXCLUDED.duplicates,
+            failed = "tabZKTeco Sync Counter".failed + EXCLUDED.failed,
+            last_punch_time = GREATEST("tabZKTeco Sync Counter".last_punch_time, EXCLUDED.last_punch_time),
+            last_upload_time = GREATEST("tabZKTeco Sync Counter".last_upload_time, EXCLUDED.last_upload_time),
+            upload_lag_seconds = "tabZKTeco Sync Counter".upload_lag_seconds + EXCLUDED.upload_lag_seconds,
+            max_upload_lag_seconds = GREATEST("tabZKTeco Sync Counter".max_upload_lag_seconds, EXCLUDED.max_upload_lag_seconds),
+            modified = EXCLUDED.modified
+    """,
+}
+
+
+class ZKTecoSyncCounter(Document):
+    pass
+
+
+def get_hour(moment=None):
+    return (moment or now_datetime()).replace(minute=0, second=0, microsecond=0)
+
+
+def get_counter_name(hour, server=None, device=None):
+    # Deterministic, so concurrent batches for one bucket upsert the same row
+    return hashlib.sha1(f"{hour}|{cstr(server)}|{cstr(device)}".encode()).hexdigest()[:20]
+
+
+def new_device_count():
+    return {**dict.fromkeys(COUNTER_FIELDS, 0), **dict.fromkeys(UPLOAD_FIELDS)}
+
+
+def get_punch_times(transaction):
+    """
+    Punch and upload time of a transaction, None for missing or unreadable ones
+    """
+    try:
+        punch_time = get_datetime(transaction.get("punch_time")) if transaction.get("punch_time") else None
+        upload_time = get_datetime(transaction.get("upload_time")) if transaction.get("upload_time") else None
+    except Exception:
+        return None, None
+    return punch_time, upload_time
+
+
+def add_seen(count, transaction):
+    """
+    Track the latest punch and upload time of every transaction a device sent,
+    inserted or not, so a device that only resends duplicates is not Silent
+    """
+    punch_time, upload_time = get_punch_times(transaction)
+    if punch_time:
+        count["last_punch_time"] = max(filter(None, (count["last_punch_time"], punch_time)))
+    if upload_time:
+        count["last_upload_time"] = max(filter(None, (count["last_upload_time"], upload_time)))
+
+
+def add_punch(count, transaction):
+    """
+    Count an inserted transaction, and its upload lag, in a device count
+    """
+    punch_time, upload_time = get_punch_times(transaction)
+
+    count["inserted"] += 1
+    if punch_time and upload_time:
+        # Devices buffer punches while offline; the gap is how late they arrive
+        lag = max((upload_time - punch_time).total_seconds(), 0)
+        count["upload_lag_seconds"] = flt(count["upload_lag_seconds"]) + lag
+        count["max_upload_lag_seconds"] = max(flt(count["max_upload_lag_seconds"]), lag)
+
+
+def record_counts(counts, hour=None):
+    """
+    Add a batch's counts to the current hourly buckets in one atomic upsert.
+
+    `counts` maps (server, device) to counts from `new_device_count`.
+    Not committed here: called inside the batch's transaction so the counters
+    and the checkins they count are committed together.
+    """
+    counts = {key: value for key, value in counts.items() if any(value[field] for field in COUNTER_FIELDS)}
+    if not counts:
+        return
+
+    hour = hour or get_hour()
+    # Rows are locked in name order, so concurrent batches touching the same
+    # counters wait on each other instead of deadlocking
+    named = sorted(
+        (get_counter_name(hour, server, device), server, device, count) for (server, device), count in counts.items()
+    )
+    values = {"now": now_datetime(), "user": frappe.session.user, "hour": hour}
+    rows = []
+    for i, (name, server, device, count) in enumerate(named):
+        values.update(
+            {
+                f"name_{i}": name,
+                f"server_{i}": server or None,
+                f"device_{i}": device or None,
+                **{f"{field}_{i}": cint(count.get(field)) for field in COUNTER_FIELDS},
+                f"last_punch_time_{i}": count.get("last_punch_time"),
+                f"last_upload_time_{i}": count.get("last_upload_time"),
+                f"upload_lag_seconds_{i}": flt(count.get("upload_lag_seconds")),
+                f"max_upload_lag_seconds_{i}": flt(count.get("max_upload_lag_seconds")),
+            }
+        )
+        rows.append(
+            f"(%(name_{i})s, %(now)s, %(now)s, %(user)s, %(user)s, %(hour)s, %(server_{i})s, %(device_{i})s, "
+            f"%(inserted_{i})s, %(duplicates_{i})s, %(failed_{i})s, %(last_punch_time_{i})s, %(last_upload_time_{i})s, "
+            f"%(upload_lag_seconds_{i})s, %(max_upload_lag_seconds_{i})s)"
+        )
+
+    frappe.db.multisql({db: sql.format(rows=", ".join(rows)) for db, sql in UPSERT_SQL.items()}, values)
+
+
+def get_recent_counts(hours=24):
+    """
+    Totals for the last `hours`, overall and per server and device. Reads at
+    most one row per hour, server and device through the hour index.
+    """
+    since = get_hour(add_to_date(now_datetime(), hours=-cint(hours)))
+    rows = frappe.get_all(
+        DOCTYPE,
+        filters={"hour": [">=", since]},
+        fields=["server", "device", "sum(inserted) as inserted", "sum(duplicates) as duplicates", "sum(failed) as failed"],
+        group_by="server, device",
+        order_by="inserted desc",
+    )
+
+    by_server = {}
+    for row in rows:
+        server = by_server.setdefault(row.server or "", dict.fromkeys(COUNTER_FIELDS, 0))
+        for field in COUNTER_FIELDS:
+            server[field] += cint(row[field])
+
+    return {
+        **{field: sum(cint(row[field]) for row in rows) for field in COUNTER_FIELDS},
+        "by_server": [{"server": server, **count} for server, count in by_server.items()],
+        "by_device": rows,
+    }
+
+
+def clear_old_sync_counters():
+    """
+    Scheduled: delete buckets older than the retention period
+    """
+    frappe.db.delete(DOCTYPE, {"hour": ["<", add_days(now_datetime(), -COUNTER_RETENTION_DAYS)]})
+    frappe.db.commit()
@@ -0,0 +1,170 @@
+# Copyright (c) 2025, osama.ahmed@deliverydevs.com
+# For license information, please see license.txt
+
+import hmac
+from collections import defaultdict
+
+import frappe
+from frappe import _
+from frappe.model.document import Document
+from frappe.utils import add_days, add_to_date, cint, flt, get_datetime, now_datetime
+from werkzeug.wrappers import Response
+
+from zkteco_checkins_sync.zkteco_checkin_sync.config_snapshot import get_config
+from zkteco_checkins_sync.zkteco_checkin_sync.sync_metrics import percentile
+
+
+DOCTYPE = "ZKTeco Sync Run"
+
+# Runs are written every sync, so old ones are pruned hourly
+RUN_RETENTION_DAYS = 7
+
+STAT_FIELDS = [
+    "started_at",
+    "status",
+    "duration",
+    "pages",
+    "rows_fetched",
+    "inserted",
+    "dedup_hits",
+    "unmapped",
+    "failed",
+    "commits",
+    "fetch_p50_ms",
+    "fetch_p95_ms",
+    "insert_p50_ms",
+    "insert_p95_ms",
+    "lag_p50_seconds",
+    "lag_p95_seconds",
+]
+
+# Row counters exposed to Prometheus as zkteco_sync_rows{kind=...}
+ROW_KINDS = {
+    "fetched": "rows_fetched",
+    "inserted": "inserted",
+    "duplicate": "dedup_hits",
+    "unmapped": "unmapped",
+    "failed": "failed",
+}
+
+
+class ZKTecoSyncRun(Document):
+    pass
+
+
+def get_sync_run_stats(hours=24):
+    """
+    Summarise the runs of the last `hours`: totals, p50/p95 timings and an hourly trend.
+
+    Latency percentiles are taken over the per-run percentiles (p50 of run
+    medians, p95 of run p95s), so no per-row samples need to be stored.
+    """
+    since = add_to_date(now_datetime(), hours=-cint(hours))
+    runs = frappe.get_all(DOCTYPE, filters={"started_at": [">=", since]}, fields=STAT_FIELDS, order_by="started_at asc")
+
+    def timing(p50_field, p95_field, scale=1):
+        return {
+            "p50": flt(percentile([flt(r[p50_field]) for r in runs], 50) * scale, 3),
+            "p95": flt(percentile([flt(r[p95_field]) for r in runs], 95) * scale, 3),
+        }
+
+    trend = defaultdict(lambda: {"runs": 0, "rows_fetched": 0, "inserted": 0, "durations": []})
+    for run in runs:
+        bucket = trend[get_datetime(run.started_at).strftime("%Y-%m-%d %H:00")]
+        bucket["runs"] += 1
+        bucket["rows_fetched"] += cint(run.rows_fetched)
+        bucket["inserted"] += cint(run.inserted)
+        bucket["durations"].append(flt(run.duration))
+
+    return {
+        "hours": cint(hours),
+        "runs": len(runs),
+        "failed_runs": sum(1 for r in runs if r.status != "Completed"),
+        "last_run": runs[-1] if runs else None,
+        "totals": {field: sum(cint(r[field]) for r in runs) for field in ("pages", "commits", *ROW_KINDS.values())},
+        "duration_seconds": timing("duration", "duration"),
+        "fetch_ms": timing("fetch_p50_ms", "fetch_p95_ms"),
+        "insert_ms": timing("insert_p50_ms", "insert_p95_ms"),
+        "lag_seconds": timing("lag_p50_seconds", "lag_p95_seconds"),
+        "trend": [
+            {
+                "hour": hour,
+                "runs": bucket["runs"],
+                "rows_fetched": bucket["rows_fetched"],
+                "inserted": bucket["inserted"],
+                "duration_p95": flt(percentile(bucket["durations"], 95), 3),
+            }
+            for hour, bucket in sorted(trend.items())
+        ],
+    }
+
+
+@frappe.whitelist(allow_guest=True, methods=["GET"])
+def metrics():
+    """
+    Prometheus text exposition of sync metrics over the last hour. Scrapers
+    authenticate with `Authorization: Bearer <Metrics Token>`; System Managers
+    can open it from a logged-in session.
+    """
+    cfg = get_config()
+    if "System Manager" not in frappe.get_roles():
+        header = frappe.get_request_header("Authorization") or ""
+        token = header[len("Bearer "):] if header.startswith("Bearer ") else ""
+        expected = cfg.get_password("metrics_token", raise_exception=False) or ""
+        if not expected or not hmac.compare_digest(token.encode(), expected.encode()):
+            raise frappe.PermissionError(_("Invalid ZKTeco metrics token"))
+
+    stats = get_sync_run_stats(hours=1)
+    last_run = stats["last_run"] or {}
+
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            label_text = ",".join(f'{key}="{val}"' for key, val in labels.items())
+            lines.append(f"{name}{{{label_text}}} {flt(value)}" if label_text else f"{name} {flt(value)}")
+
+    metric("zkteco_synced_records_total", "counter", "Employee Checkins created by ZKTeco sync", [({}, frappe.db.get_single_value("ZKTeco Config", "total_synced_records"))])
+    metric("zkteco_sync_enabled", "gauge", "Whether ZKTeco sync is enabled", [({}, cint(cfg.enable_sync))])
+    metric(
+        "zkteco_sync_last_run_timestamp_seconds",
+        "gauge",
+        "Start of the most recent sync run",
+        [({}, get_datetime(last_run["started_at"]).timestamp() if last_run else 0)],
+    )
+    metric("zkteco_sync_last_run_duration_seconds", "gauge", "Duration of the most recent sync run", [({}, last_run.get("duration"))])
+    metric("zkteco_sync_runs", "gauge", "Sync runs in the last hour", [({"window": "1h"}, stats["runs"])])
+    metric("zkteco_sync_failed_runs", "gauge", "Sync runs in the last hour that did not complete", [({"window": "1h"}, stats["failed_runs"])])
+    metric("zkteco_sync_pages", "gauge", "API pages fetched in the last hour", [({"window": "1h"}, stats["totals"]["pages"])])
+    metric("zkteco_sync_commits", "gauge", "Database commits in the last hour", [({"window": "1h"}, stats["totals"]["commits"])])
+    metric(
+        "zkteco_sync_rows",
+        "gauge",
+        "Transactions in the last hour by outcome",
+        [({"kind": kind, "window": "1h"}, stats["totals"][field]) for kind, field in ROW_KINDS.items()],
+    )
+
+    for name, key, scale, help_text in (
+        ("zkteco_sync_duration_seconds", "duration_seconds", 1, "Sync run duration"),
+        ("zkteco_sync_fetch_latency_seconds", "fetch_ms", 0.001, "Latency of one transactions API page"),
+        ("zkteco_sync_insert_latency_seconds", "insert_ms", 0.001, "Latency of one Employee Checkin insert"),
+        ("zkteco_sync_lag_seconds", "lag_seconds", 1, "Time from punch to Employee Checkin insert"),
+    ):
+        metric(
+            name,
+            "gauge",
+            f"{help_text} over the last hour",
+            [({"quantile": q}, stats[key][p] * scale) for q, p in (("0.5", "p50"), ("0.95", "p95"))],
+        )
+
+    return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
+
+def clear_old_sync_runs():
+    """
+    Scheduled: delete runs older than the retention period
+    """
+    frappe.db.delete(DOCTYPE, {"started_at": ["<", add_days(now_datetime(), -RUN_RETENTION_DAYS)]})
+    frappe.db.commit()
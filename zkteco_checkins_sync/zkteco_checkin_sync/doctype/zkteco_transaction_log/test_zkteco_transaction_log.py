@@ -0,0 +1,104 @@
+# Copyright (c) 2025, osama.ahmed@deliverydevs.com and Contributors
+# See license.txt
+
+import zlib
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_transaction_log import zkteco_transaction_log
+from zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_transaction_log.zkteco_transaction_log import (
+	CLAIM_SQL,
+	DEFAULT_CLAIM_SIZE,
+	PARTITION_KEYS,
+	STAGING_TRIGGER,
+	claim_pending_rows,
+	drain_staging_partition,
+	get_partition_key,
+)
+from zkteco_checkins_sync.zkteco_checkin_sync.sync_metrics import SyncMetrics
+
+
+class TestZKTecoTransactionLog(FrappeTestCase):
+	def test_partition_key_is_crc32_of_the_normalized_code(self):
+		self.assertEqual(get_partition_key("EMP001"), zlib.crc32(b"emp001") % PARTITION_KEYS)
+		self.assertEqual(get_partition_key(" emp001 "), get_partition_key("EMP001"))
+		self.assertEqual(get_partition_key(1001), get_partition_key("1001"))
+		self.assertEqual(get_partition_key(None), get_partition_key(""))
+
+	def test_partition_keys_spread_over_the_whole_range(self):
+		keys = [get_partition_key(f"EMP{i:04d}") for i in range(2000)]
+
+		self.assertTrue(all(0 <= key < PARTITION_KEYS for key in keys))
+		# Every worker of a small pool gets a share of the employees
+		for partitions in (2, 3, 4):
+			with self.subTest(partitions=partitions):
+				self.assertEqual({key % partitions for key in keys}, set(range(partitions)))
+
+	def test_claim_marks_the_partitions_rows_as_processing(self):
+		with (
+			patch.object(frappe.db, "multisql", return_value=[("LOG-1",), ("LOG-2",)]) as multisql,
+			patch.object(frappe.db, "commit") as commit,
+			patch.object(zkteco_transaction_log, "set_status") as set_status,
+		):
+			self.assertEqual(claim_pending_rows(500, 1, 4), ["LOG-1", "LOG-2"])
+
+		multisql.assert_called_once_with(CLAIM_SQL, {"partitions": 4, "partition": 1, "limit": 500})
+		set_status.assert_called_once_with(["LOG-1", "LOG-2"], "Processing")
+		commit.assert_called_once()
+
+	def test_empty_claim_updates_nothing(self):
+		with (
+			patch.object(frappe.db, "multisql", return_value=[]),
+			patch.object(frappe.db, "commit"),
+			patch.object(zkteco_transaction_log, "set_status") as set_status,
+		):
+			self.assertEqual(claim_pending_rows(500), [])
+
+		set_status.assert_not_called()
+
+	def drain(self, claims, pending=()):
+		"""
+		Drain partition 1 of 4 over `claims` and return the claim, process and metrics save mocks
+		"""
+		with (
+			patch.object(zkteco_transaction_log, "get_config", return_value=frappe._dict()),
+			patch.object(zkteco_transaction_log, "get_employee_code_map", return_value={}),
+			patch.object(frappe, "set_user"),
+			patch.object(zkteco_transaction_log, "claim_pending_rows", side_effect=claims) as claim,
+			patch.object(zkteco_transaction_log, "process_staged_rows", side_effect=lambda names, *args: len(names)) as process,
+			patch.object(zkteco_transaction_log, "take_pending_flag", side_effect=[*pending, False]),
+			patch.object(SyncMetrics, "save") as save,
+		):
+			drain_staging_partition(1, 4, "run")
+		return claim, process, save
+
+	def test_drain_runs_again_when_a_fan_out_arrived_meanwhile(self):
+		with patch.object(zkteco_transaction_log, "finish_partition") as finish:
+			claim, process, save = self.drain([["LOG-1", "LOG-2"], [], ["LOG-3"], []], pending=[True])
+
+		self.assertEqual(claim.call_count, 4)
+		claim.assert_called_with(DEFAULT_CLAIM_SIZE, 1, 4)
+		finish.assert_called_once_with("run", 3)
+		save.assert_called_once_with("Completed")
+
+	def test_drain_passes_its_metrics_to_the_inserts(self):
+		with patch.object(zkteco_transaction_log, "finish_partition"):
+			claim, process, save = self.drain([["LOG-1"], []])
+
+		metrics = process.call_args.args[3]
+		self.assertIsInstance(metrics, SyncMetrics)
+		self.assertEqual(metrics.trigger, STAGING_TRIGGER)
+
+	def test_idle_drain_stores_no_run(self):
+		with patch.object(zkteco_transaction_log, "finish_partition"):
+			claim, process, save = self.drain([[]])
+
+		save.assert_not_called()
+
+	def test_failed_drain_still_finishes_its_partition(self):
+		with patch.object(zkteco_transaction_log, "finish_partition") as finish, self.assertRaises(Exception):
+			self.drain(Exception("database gone"))
+
+		finish.assert_called_once_with("run", 0)
@@ -0,0 +1,15 @@
+// Copyright (c) 2025, osama.ahmed@deliverydevs.com and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on("ZKTeco Transaction Log", {
+    refresh(frm) {
+        if (frm.doc.status === "Failed") {
+            frm.add_custom_button(__("Retry"), function() {
+                frappe.call({
+                    method: "zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_transaction_log.zkteco_transaction_log.retry_failed_transactions",
+                    args: { names: [frm.doc.name] }
+                }).then(() => frm.reload_doc());
+            });
+        }
+    }
+});
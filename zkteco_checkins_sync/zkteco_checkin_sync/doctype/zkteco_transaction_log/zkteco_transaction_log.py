@@ -0,0 +1,414 @@
+# Copyright (c) 2025, osama.ahmed@deliverydevs.com
+# For license information, please see license.txt
+
+import zlib
+from collections import defaultdict
+from datetime import timedelta
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import add_days, cint, cstr, get_datetime, now_datetime
+
+from zkteco_checkins_sync.zkteco_checkin_sync.config_snapshot import get_config
+from zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_config.zkteco_config import (
+    get_transaction_key,
+    increment_total_synced,
+    insert_employee_checkins,
+    is_retryable_error,
+)
+from zkteco_checkins_sync.zkteco_checkin_sync.employee_resolver import get_employee_code_map, normalize_code
+from zkteco_checkins_sync.zkteco_checkin_sync.sync_metrics import SyncMetrics
+
+
+DOCTYPE = "ZKTeco Transaction Log"
+DRAIN_METHOD = "zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_transaction_log.zkteco_transaction_log.drain_staging_partition"
+
+# Rows claimed by a drain worker per round trip
+DEFAULT_CLAIM_SIZE = 500
+DEFAULT_STAGING_WORKERS = 2
+
+# Rows are bucketed by emp_code into this many partition keys when staged; a
+# worker owns every key where `partition_key % workers == its partition`
+PARTITION_KEYS = 1024
+
+# Partition jobs are spread over these queues so both worker pools take part
+PARTITION_QUEUES = ("long", "short")
+PARTITION_JOB_TIMEOUT = 3600
+
+# Redis hash tracking one fan-out until its last partition finishes
+RUN_KEY = "zkteco_materialize_run:{0}"
+RUN_TTL = 86400
+
+# Set by every fan-out for each partition; a drain job takes it before exiting
+# and drains again if it was set, as the fan-out's enqueue was deduplicated away
+PENDING_KEY = "zkteco_staging_pending:{0}_of_{1}"
+
+# Failed rows are retried automatically this many times before they need a manual retry
+MAX_AUTO_RETRIES = 3
+
+# Rows stuck in Processing this long belonged to a worker that died
+STALE_PROCESSING_MINUTES = 30
+
+# Processed rows are only kept for troubleshooting
+PROCESSED_RETENTION_DAYS = 7
+
+# Trigger of the ZKTeco Sync Run a drain is stored as
+STAGING_TRIGGER = "staging"
+
+CLAIM_SQL = {
+    "mariadb": """
+        SELECT name FROM `tabZKTeco Transaction Log`
+        WHERE status = 'Pending' AND MOD(partition_key, %(partitions)s) = %(partition)s
+        ORDER BY punch_time
+        LIMIT %(limit)s
+        FOR UPDATE SKIP LOCKED
+    """,
+    "postgres": """
+        SELECT name FROM "tabZKTeco Transaction Log"
+        WHERE status = 'Pending' AND MOD(partition_key, %(partitions)s) = %(partition)s
+        ORDER BY punch_time
+        LIMIT %(limit)s
+        FOR UPDATE SKIP LOCKED
+    """,
+}
+
+STAGING_FIELDS = (
+    "name",
+    "creation",
+    "modified",
+    "owner",
+    "modified_by",
+    "status",
+    "retry_count",
+    "server",
+    "transaction_id",
+    "emp_code",
+    "punch_time",
+    "punch_state",
+    "terminal_sn",
+    "terminal_alias",
+    "upload_time",
+    "partition_key",
+)
+
+
+class ZKTecoTransactionLog(Document):
+    pass
+
+
+def stage_transactions(transactions, server=None):
+    """
+    Bulk insert raw transactions as Pending rows and commit. Rows are named by
+    their transaction key, so restaging an already staged transaction is a no-op.
+    """
+    if not transactions:
+        return 0
+
+    now = now_datetime()
+    user = frappe.session.user
+    values = [get_staging_values(transaction, server, now, user) for transaction in transactions]
+
+    frappe.db.bulk_insert(DOCTYPE, STAGING_FIELDS, values, ignore_duplicates=True)
+    frappe.db.commit()
+    return len(values)
+
+
+def stage_failed_transactions(failures, server=None):
+    """
+    Record transactions whose direct insert failed on a retryable error
+    (`failures` as returned by insert_employee_checkins) as Failed rows, so the
+    sync watermark can move past them and requeue_staging_rows retries them.
+    Committed by the caller.
+    """
+    now = now_datetime()
+    user = frappe.session.user
+    values = [
+        (*get_staging_values(failure["transaction"], server, now, user, "Failed", 1), cstr(failure["error"])[:1000])
+        for failure in failures
+    ]
+    frappe.db.bulk_insert(DOCTYPE, (*STAGING_FIELDS, "error"), values, ignore_duplicates=True)
+
+
+def get_staging_values(transaction, server, now, user, status="Pending", retry_count=0):
+    return (
+        get_transaction_key(transaction.get("id"), server) or frappe.generate_hash(length=20),
+        now,
+        now,
+        user,
+        user,
+        status,
+        retry_count,
+        server,
+        cstr(transaction.get("id")) or None,
+        cstr(transaction.get("emp_code")) or None,
+        parse_datetime(transaction.get("punch_time")),
+        cstr(transaction.get("punch_state")),
+        transaction.get("terminal_sn"),
+        transaction.get("terminal_alias"),
+        parse_datetime(transaction.get("upload_time")),
+        get_partition_key(transaction.get("emp_code")),
+    )
+
+
+def get_partition_key(emp_code):
+    # Stable across processes (unlike hash()), so one employee always lands in one partition
+    return zlib.crc32(normalize_code(emp_code).encode()) % PARTITION_KEYS
+
+
+def parse_datetime(value):
+    # A malformed time must not abort the bulk insert; the row fails when drained instead
+    try:
+        return get_datetime(value) if value else None
+    except Exception:
+        return None
+
+
+def enqueue_staging_drain(cfg=None):
+    """
+    Fan the staging queue out to one job per partition. Partitions split rows
+    by employee, so each employee's punches are materialised in order by a
+    single job while partitions run in parallel across workers. A partition
+    whose job is already queued or running is not enqueued again.
+    """
+    cfg = cfg or get_config()
+    partitions = cint(cfg.staging_workers) or DEFAULT_STAGING_WORKERS
+    run_id = frappe.generate_hash(length=12)
+
+    # Raw hash commands via a pipeline; the cache wrapper's hset/hget re-prefix
+    # keys and pickle values, which HINCRBY cannot work with
+    cache = frappe.cache()
+    run_key = cache.make_key(RUN_KEY.format(run_id))
+    pipe = cache.pipeline()
+    pipe.hincrby(run_key, "remaining", partitions)
+    pipe.expire(run_key, RUN_TTL)
+    for partition in range(partitions):
+        pipe.set(cache.make_key(PENDING_KEY.format(partition, partitions)), 1, ex=RUN_TTL)
+    pipe.execute()
+
+    for partition in range(partitions):
+        job = frappe.enqueue(
+            DRAIN_METHOD,
+            queue=PARTITION_QUEUES[partition % len(PARTITION_QUEUES)],
+            timeout=PARTITION_JOB_TIMEOUT,
+            job_id=f"zkteco_staging_partition_{partition}_of_{partitions}",
+            deduplicate=True,
+            partition=partition,
+            partitions=partitions,
+            run_id=run_id,
+        )
+        if not job:
+            # Already being drained by an earlier fan-out
+            finish_partition(run_id, 0)
+
+
+def drain_staging_partition(partition=0, partitions=1, run_id=None):
+    """
+    Background job: claim this partition's Pending rows in chunks and turn them
+    into Employee Checkins until none are left. A drain that claimed rows is
+    stored as a ZKTeco Sync Run of its own, as the fetch that staged them
+    inserted nothing.
+    """
+    # Drains can be started from guest pushes; create checkins as the scheduler would
+    frappe.set_user("Administrator")
+
+    cfg = get_config()
+    employee_map = get_employee_code_map(use_redis=bool(cfg.cache_employee_map_in_redis))
+    metrics = SyncMetrics(STAGING_TRIGGER)
+
+    processed = 0
+    claimed = 0
+    status = "Failed"
+    try:
+        while True:
+            names = claim_pending_rows(DEFAULT_CLAIM_SIZE, partition, partitions)
+            if names:
+                claimed += len(names)
+                processed += process_staged_rows(names, cfg, employee_map, metrics)
+            elif not take_pending_flag(partition, partitions):
+                break
+        status = "Completed"
+    finally:
+        finish_partition(run_id, processed)
+        if claimed:
+            if status == "Failed":
+                # Don't commit the failed chunk's half-written work along with the run
+                frappe.db.rollback()
+            metrics.save(status)
+
+
+def take_pending_flag(partition, partitions):
+    """
+    Clear the partition's pending flag and return whether a fan-out had set it
+    """
+    cache = frappe.cache()
+    key = cache.make_key(PENDING_KEY.format(partition, partitions))
+    pipe = cache.pipeline()
+    pipe.get(key)
+    pipe.delete(key)
+    return bool(pipe.execute()[0])
+
+
+def finish_partition(run_id, processed):
+    """
+    Completion step: add a partition's count to its run, and let the last
+    partition to finish merge the total into ZKTeco Config in one write
+    """
+    if not run_id:
+        increment_total_synced(processed)
+        return
+
+    cache = frappe.cache()
+    run_key = cache.make_key(RUN_KEY.format(run_id))
+    if processed:
+        cache.hincrby(run_key, "processed", processed)
+    if cache.hincrby(run_key, "remaining", -1) > 0:
+        return
+
+    pipe = cache.pipeline()
+    pipe.hincrby(run_key, "processed", 0)
+    pipe.delete(run_key)
+    total = cint(pipe.execute()[0])
+    increment_total_synced(total)
+    if total:
+        frappe.logger().info(f"ZKTeco staging run {run_id} completed: {total} processed")
+
+
+def claim_pending_rows(limit, partition=0, partitions=1):
+    """
+    Mark up to `limit` Pending rows of a partition as Processing, oldest punch
+    first. SKIP LOCKED keeps concurrent claims from waiting on each other.
+    """
+    names = [
+        row[0]
+        for row in frappe.db.multisql(CLAIM_SQL, {"partitions": partitions, "partition": partition, "limit": limit})
+    ]
+    if names:
+        set_status(names, "Processing")
+    frappe.db.commit()
+    return names
+
+
+def set_status(names, status, **values):
+    log = frappe.qb.DocType(DOCTYPE)
+    query = frappe.qb.update(log).set(log.status, status).set(log.modified, now_datetime())
+    for field, value in values.items():
+        query = query.set(log[field], value)
+    query.where(log.name.isin(names)).run()
+
+
+def process_staged_rows(names, cfg, employee_map, metrics=None):
+    """
+    Insert Employee Checkins for claimed rows and record per-row status, retry
+    count and error. Returns how many were processed; timings and counters go to
+    `metrics` (a SyncMetrics) when given.
+
+    Rows that were tried before are not counted or reported again, and rows
+    that failed on anything but a lock timeout or deadlock use up their
+    automatic retries straight away; they wait for a manual retry.
+    """
+    rows = frappe.get_all(
+        DOCTYPE,
+        filters={"name": ["in", names]},
+        fields=["name", "server", "transaction_id", "emp_code", "punch_time", "punch_state", "terminal_sn", "terminal_alias", "upload_time", "retry_count"],
+        order_by="punch_time asc",
+    )
+
+    by_server = defaultdict(list)
+    for row in rows:
+        by_server[(row.server or None, cint(row.retry_count) > 0)].append(
+            {
+                "id": row.transaction_id,
+                "emp_code": row.emp_code,
+                "punch_time": row.punch_time,
+                "punch_state": row.punch_state,
+                "terminal_sn": row.terminal_sn,
+                "terminal_alias": row.terminal_alias,
+                "upload_time": row.upload_time,
+                "log_name": row.name,
+            }
+        )
+
+    processed = 0
+    failed = {}
+    for (server, retry), transactions in by_server.items():
+        result = insert_employee_checkins(transactions, employee_map, cfg.batch_size, server, metrics, report=not retry)
+        processed += result["processed"]
+        for failure in result["failures"]:
+            failed[failure["transaction"]["log_name"]] = failure["error"]
+
+    succeeded = [row.name for row in rows if row.name not in failed]
+    if succeeded:
+        set_status(succeeded, "Processed", error=None)
+    log = frappe.qb.DocType(DOCTYPE)
+    for name, error in failed.items():
+        retry_count = log.retry_count + 1 if is_retryable_error(error) else MAX_AUTO_RETRIES
+        set_status([name], "Failed", error=str(error)[:1000], retry_count=retry_count)
+    frappe.db.commit()
+
+    return processed
+
+
+@frappe.whitelist()
+def retry_failed_transactions(names=None):
+    """
+    Put Failed rows (all of them, or `names`) back in the queue without refetching
+    """
+    frappe.only_for(("System Manager", "HR Manager"))
+
+    filters = {"status": "Failed"}
+    if names:
+        filters["name"] = ["in", frappe.parse_json(names)]
+
+    failed = frappe.get_all(DOCTYPE, filters=filters, pluck="name")
+    if failed:
+        set_status(failed, "Pending")
+        frappe.db.commit()
+        enqueue_staging_drain()
+
+    return len(failed)
+
+
+def requeue_staging_rows():
+    """
+    Scheduled: requeue rows orphaned by dead workers and failed rows that still
+    have automatic retries left, then make sure the drain pool is running.
+    Runs without the staging queue too, for rows a direct insert failed on a
+    lock timeout or deadlock.
+    """
+    cfg = get_config()
+    if not (
+        cfg.use_staging_queue
+        or frappe.db.exists(DOCTYPE, {"status": "Processing"})
+        or frappe.db.exists(DOCTYPE, {"status": "Failed", "retry_count": ["<", MAX_AUTO_RETRIES]})
+    ):
+        return
+
+    now = now_datetime()
+    log = frappe.qb.DocType(DOCTYPE)
+    (
+        frappe.qb.update(log)
+        .set(log.status, "Pending")
+        .set(log.modified, now)
+        .where((log.status == "Processing") & (log.modified < now - timedelta(minutes=STALE_PROCESSING_MINUTES)))
+        .run()
+    )
+    (
+        frappe.qb.update(log)
+        .set(log.status, "Pending")
+        .set(log.modified, now)
+        .where((log.status == "Failed") & (log.retry_count < MAX_AUTO_RETRIES))
+        .run()
+    )
+    frappe.db.commit()
+
+    if frappe.db.exists(DOCTYPE, {"status": "Pending"}):
+        enqueue_staging_drain(cfg)
+
+
+def clear_old_staging_rows():
+    """
+    Scheduled: delete Processed rows older than the retention period. Failed
+    rows stay until they are retried or deleted by hand.
+    """
+    frappe.db.delete(DOCTYPE, {"status": "Processed", "modified": ["<", add_days(now_datetime(), -PROCESSED_RETENTION_DAYS)]})
+    frappe.db.commit()
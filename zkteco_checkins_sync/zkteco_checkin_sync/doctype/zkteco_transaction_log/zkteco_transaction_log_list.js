@@ -0,0 +1,28 @@
+// Copyright (c) 2025, osama.ahmed@deliverydevs.com and contributors
+// For license information, please see license.txt
+
+frappe.listview_settings["ZKTeco Transaction Log"] = {
+    get_indicator(doc) {
+        const colors = {
+            "Pending": "orange",
+            "Processing": "blue",
+            "Processed": "green",
+            "Failed": "red"
+        };
+        return [__(doc.status), colors[doc.status], "status,=," + doc.status];
+    },
+
+    onload(listview) {
+        listview.page.add_inner_button(__("Retry Failed"), function() {
+            frappe.call({
+                method: "zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_transaction_log.zkteco_transaction_log.retry_failed_transactions"
+            }).then((r) => {
+                frappe.show_alert({
+                    message: __(`🔁 ${r.message || 0} failed transactions queued for retry`),
+                    indicator: "blue"
+                });
+                listview.refresh();
+            });
+        });
+    }
+};
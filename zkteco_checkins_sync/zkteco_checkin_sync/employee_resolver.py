@@ -0,0 +1,139 @@
+# Copyright (c) 2025, osama.ahmed@deliverydevs.com
+# For license information, please see license.txt
+
+import time
+
+import frappe
+from frappe.utils import cstr
+
+
+# Redis keys for the shared emp_code -> Employee map and its generation counter
+CACHE_KEY = "zkteco_employee_code_map"
+VERSION_KEY = "zkteco_employee_code_map_version"
+
+# Shared copy in Redis is rebuilt at least this often to pick up direct DB edits
+REDIS_TTL_SECONDS = 3600
+
+# Process-local copies are re-validated against Redis at most this often
+LOCAL_TTL_SECONDS = 600
+
+# Employee fields matched against ZKTeco emp_code, lowest priority first so
+# that higher priority matches overwrite them when the map is built
+MATCH_FIELDS = ("attendance_device_id", "user_id", "employee")
+
+_local_cache = {"version": None, "loaded_at": 0, "mapping": None, "device_codes": None}
+
+
+def normalize_code(emp_code):
+    """
+    Normalise an emp_code the way MariaDB compares it (case and trailing space insensitive)
+    """
+    return cstr(emp_code).strip().lower()
+
+
+def load_employee_code_map():
+    """
+    Build the emp_code -> (employee, employee_name) map with a single query
+    """
+    match_fields = [f for f in MATCH_FIELDS if f != "attendance_device_id" or frappe.db.has_column("Employee", f)]
+    fields = ["name", "employee_name"] + [f for f in match_fields if f not in ("name", "employee_name")]
+
+    mapping = {}
+    for employee in frappe.get_all("Employee", fields=fields):
+        for field in match_fields:
+            code = employee.get(field)
+            if code:
+                mapping[normalize_code(code)] = (employee.name, employee.employee_name)
+
+    return mapping
+
+
+def get_employee_code_map(use_redis=True):
+    """
+    Return the emp_code map, from the process cache, then Redis, then the database.
+
+    The version is read from Redis either way, so an eviction in one process
+    reaches the others whether or not the map itself is shared. Neither read
+    goes through frappe.local's request cache, which would pin them for the
+    life of a long-running worker.
+    """
+    cache = frappe.cache()
+    version = get_version()
+    now = time.monotonic()
+
+    if (
+        _local_cache["mapping"] is not None
+        and _local_cache["version"] == version
+        and now - _local_cache["loaded_at"] < LOCAL_TTL_SECONDS
+    ):
+        return _local_cache["mapping"]
+
+    cached = cache.get_value(CACHE_KEY, expires=True) if use_redis else None
+    if cached and cached.get("version") == version:
+        mapping = cached["mapping"]
+    else:
+        mapping = load_employee_code_map()
+        if use_redis:
+            # Tag the map with the generation it was built for so a load racing an
+            # eviction can't publish a stale map under the new generation
+            cache.set_value(CACHE_KEY, {"version": version, "mapping": mapping}, expires_in_sec=REDIS_TTL_SECONDS)
+
+    _local_cache.update({"version": version, "loaded_at": now, "mapping": mapping})
+    return mapping
+
+
+def get_device_codes(use_redis=True):
+    """
+    Raw emp_codes of the mapped Employees, for filtering on the ZKBio Time server:
+    every code the map accepts for an Employee (attendance device id, user id
+    and Employee ID), in the case they were entered. Rebuilt whenever the map is.
+    """
+    mapping = get_employee_code_map(use_redis)
+    if _local_cache["device_codes"] is not None and _local_cache["device_codes"][0] is mapping:
+        return _local_cache["device_codes"][1]
+
+    match_fields = [f for f in MATCH_FIELDS if f != "attendance_device_id" or frappe.db.has_column("Employee", f)]
+
+    codes = []
+    for employee in frappe.get_all("Employee", fields=match_fields, order_by="name asc"):
+        for field in match_fields:
+            code = employee.get(field)
+            if code:
+                codes.append(cstr(code).strip())
+
+    codes = list(dict.fromkeys(codes))
+    _local_cache["device_codes"] = (mapping, codes)
+    return codes
+
+
+def get_version():
+    # Raw GET: get_value/set_value keep un-expiring keys in frappe.local.cache
+    version = frappe.cache().get(frappe.cache().make_key(VERSION_KEY))
+    return version.decode() if version else None
+
+
+def resolve_employee(emp_code, mapping=None, with_name=False):
+    """
+    Resolve a ZKTeco emp_code to an Employee name (or `(name, employee_name)` when with_name is set)
+    """
+    if not emp_code:
+        return None
+
+    if mapping is None:
+        mapping = get_employee_code_map()
+
+    match = mapping.get(normalize_code(emp_code))
+    if not match:
+        return None
+
+    return match if with_name else match[0]
+
+
+def clear_employee_code_map(doc=None, method=None):
+    """
+    Evict the cached map. Wired to Employee doc events so edits show up on the next sync.
+    """
+    cache = frappe.cache()
+    cache.delete_value(CACHE_KEY)
+    cache.set(cache.make_key(VERSION_KEY), frappe.generate_hash(length=10))
+    _local_cache.update({"version": None, "loaded_at": 0, "mapping": None, "device_codes": None})
@@ -0,0 +1,68 @@
+# Copyright (c) 2025, osama.ahmed@deliverydevs.com
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+from frappe.utils import add_days, getdate
+
+from zkteco_checkins_sync.zkteco_checkin_sync.employee_resolver import get_employee_code_map, resolve_employee
+
+
+def execute(filters=None):
+    filters = frappe._dict(filters or {})
+    return get_columns(), get_data(filters)
+
+
+def get_columns():
+    return [
+        {"fieldname": "emp_code", "label": _("Employee Code"), "fieldtype": "Data", "width": 140},
+        {"fieldname": "punches", "label": _("Failed Punches"), "fieldtype": "Int", "width": 120},
+        {"fieldname": "hours", "label": _("Hours Seen"), "fieldtype": "Int", "width": 100},
+        {"fieldname": "first_seen", "label": _("First Seen"), "fieldtype": "Datetime", "width": 170},
+        {"fieldname": "last_seen", "label": _("Last Seen"), "fieldtype": "Datetime", "width": 170},
+        {"fieldname": "terminal", "label": _("Last Terminal"), "fieldtype": "Data", "width": 160},
+        {"fieldname": "server", "label": _("Server"), "fieldtype": "Data", "width": 120},
+        {"fieldname": "employee", "label": _("Mapped To"), "fieldtype": "Link", "options": "Employee", "width": 140},
+    ]
+
+
+def get_data(filters):
+    """
+    Unmapped employee codes seen in the date range, busiest first. Codes that
+    now resolve to an Employee are left out unless asked for.
+    """
+    summary = frappe.qb.DocType("ZKTeco Error Summary")
+    rows = (
+        frappe.qb.from_(summary)
+        .select(
+            summary.emp_code,
+            frappe.query_builder.functions.Sum(summary.count).as_("punches"),
+            frappe.query_builder.functions.Count("*").as_("hours"),
+            frappe.query_builder.functions.Min(summary.first_seen).as_("first_seen"),
+            frappe.query_builder.functions.Max(summary.last_seen).as_("last_seen"),
+        )
+        .where(summary.kind == "Unmapped Employee")
+        .where(summary.window_start >= getdate(filters.from_date))
+        .where(summary.window_start < add_days(getdate(filters.to_date), 1))
+        .groupby(summary.emp_code)
+        .orderby(frappe.query_builder.functions.Sum(summary.count), order=frappe.qb.desc)
+        .run(as_dict=True)
+    )
+
+    employee_map = get_employee_code_map()
+    data = []
+    for row in rows:
+        row.employee = resolve_employee(row.emp_code, employee_map)
+        if row.employee and not filters.include_mapped:
+            continue
+
+        # Where the code was last seen, for finding the badge's owner
+        row.terminal, row.server = frappe.db.get_value(
+            "ZKTeco Error Summary",
+            {"kind": "Unmapped Employee", "emp_code": row.emp_code},
+            ["terminal", "server"],
+            order_by="last_seen desc",
+        ) or (None, None)
+        data.append(row)
+
+    return data
@@ -0,0 +1,137 @@
+# Copyright (c) 2025, osama.ahmed@deliverydevs.com
+# For license information, please see license.txt
+
+import json
+import os
+import socket
+import threading
+from contextlib import contextmanager
+
+import frappe
+from frappe.utils import now_datetime
+
+
+DEFAULT_LOCK_TTL = 300
+
+# Delete / extend the key only while it still holds our value
+RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+EXTEND_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("expire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+class SyncLockLost(Exception):
+    """The lease expired or was taken over while we were still working"""
+
+
+class SyncLock:
+    """
+    Redis lease lock shared by every worker on the site.
+
+    The lease expires after `ttl` seconds unless extended, so a crashed holder
+    never blocks syncing for long. Each acquisition gets a fencing token from a
+    monotonically increasing counter; `verify()` before a commit makes a holder
+    whose lease has lapsed stop instead of writing over its successor.
+    """
+
+    def __init__(self, name, ttl=DEFAULT_LOCK_TTL, trigger=None):
+        self.name = name
+        self.ttl = ttl
+        self.trigger = trigger
+        self.token = None
+        self.value = None
+
+    @property
+    def key(self):
+        return frappe.cache().make_key(f"zkteco_lock:{self.name}")
+
+    @property
+    def fence_key(self):
+        return frappe.cache().make_key(f"zkteco_lock_fence:{self.name}")
+
+    def acquire(self):
+        cache = frappe.cache()
+        token = cache.incr(self.fence_key)
+        value = json.dumps(
+            {
+                "token": token,
+                "owner": f"{socket.gethostname()}:{os.getpid()}",
+                "trigger": self.trigger,
+                "user": frappe.session.user if getattr(frappe.local, "session", None) else None,
+                "acquired_at": str(now_datetime()),
+            }
+        )
+        if not cache.set(self.key, value, nx=True, ex=self.ttl):
+            return False
+
+        self.token = token
+        self.value = value
+        return True
+
+    def extend(self):
+        """
+        Renew the lease. Returns False if it is no longer ours.
+        """
+        if not self.value:
+            return False
+        return bool(frappe.cache().eval(EXTEND_SCRIPT, 1, self.key, self.value, self.ttl))
+
+    def verify(self):
+        """
+        Renew the lease or raise SyncLockLost. Call before committing work.
+        """
+        if not self.extend():
+            raise SyncLockLost(f"Lost the {self.name} lock (fencing token {self.token})")
+
+    @contextmanager
+    def heartbeat(self, interval=None):
+        """
+        Keep renewing the lease from a background thread while the block runs,
+        for long steps that can't call `extend()` themselves
+        """
+        # The thread has no site context, so it gets the connection and key resolved here
+        cache, key, value = frappe.cache(), self.key, self.value
+        stopped = threading.Event()
+
+        def beat():
+            while not stopped.wait(interval or self.ttl / 3):
+                try:
+                    if not cache.eval(EXTEND_SCRIPT, 1, key, value, self.ttl):
+                        return
+                except Exception:
+                    # Redis is unreachable; the lease lapses as it would for a dead holder
+                    return
+
+        thread = threading.Thread(target=beat, daemon=True)
+        thread.start()
+        try:
+            yield self
+        finally:
+            stopped.set()
+            thread.join()
+
+    def release(self):
+        if self.value:
+            frappe.cache().eval(RELEASE_SCRIPT, 1, self.key, self.value)
+        self.token = None
+        self.value = None
+
+    def is_held(self):
+        # Plain GET: the wrapper's exists() would prefix the already prefixed key again
+        return bool(frappe.cache().get(self.key))
+
+    def holder(self):
+        """
+        Who holds the lock right now, or None
+        """
+        value = frappe.cache().get(self.key)
+        return json.loads(value) if value else None
@@ -0,0 +1,86 @@
+# Copyright (c) 2025, osama.ahmed@deliverydevs.com
+# For license information, please see license.txt
+
+import math
+import threading
+import time
+
+import frappe
+from frappe.utils import get_datetime, now_datetime
+
+
+COUNTERS = ("pages", "rows_fetched", "dedup_hits", "unmapped", "inserted", "failed", "commits")
+TIMINGS = ("fetch", "insert", "lag")
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of `values` (0 when empty)
+    """
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values), max(1, math.ceil(pct / 100 * len(values)))) - 1]
+
+
+class SyncMetrics:
+    """
+    Counters and timings for one sync run, shared by the per-server threads.
+
+    Hot paths call `incr` and `observe`; `save` writes the run as one
+    ZKTeco Sync Run row with percentiles instead of keeping every sample.
+    """
+
+    def __init__(self, trigger=None):
+        self.trigger = trigger
+        self.started_at = now_datetime()
+        self.started = time.monotonic()
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.timings = {name: [] for name in TIMINGS}
+        self._lock = threading.Lock()
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def observe(self, name, seconds):
+        with self._lock:
+            self.timings[name].append(seconds)
+
+    def observe_lag(self, punch_times):
+        """
+        End-to-end lag from each punch to now, for rows that were just committed
+        """
+        now = now_datetime()
+        lags = [(now - get_datetime(p)).total_seconds() for p in punch_times if p]
+        with self._lock:
+            self.timings["lag"].extend(lags)
+
+    def as_dict(self):
+        fetch, insert, lag = (self.timings[name] for name in TIMINGS)
+        return {
+            **self.counters,
+            "trigger": self.trigger,
+            "started_at": self.started_at,
+            "duration": time.monotonic() - self.started,
+            "fetch_p50_ms": percentile(fetch, 50) * 1000,
+            "fetch_p95_ms": percentile(fetch, 95) * 1000,
+            "insert_p50_ms": percentile(insert, 50) * 1000,
+            "insert_p95_ms": percentile(insert, 95) * 1000,
+            "lag_p50_seconds": percentile(lag, 50),
+            "lag_p95_seconds": percentile(lag, 95),
+            "lag_max_seconds": max(lag) if lag else 0,
+        }
+
+    def save(self, status="Completed", servers=0):
+        """
+        Store the run and commit. Never raises; metrics must not fail a sync.
+        """
+        try:
+            frappe.get_doc(
+                {"doctype": "ZKTeco Sync Run", "status": status, "servers": servers, **self.as_dict()}
+            ).insert(ignore_permissions=True)
+            frappe.db.commit()
+        except Exception as e:
+            frappe.db.rollback()
+            frappe.logger().warning(f"Could not store ZKTeco sync metrics: {str(e)}")
@@ -0,0 +1,120 @@
+# Copyright (c) 2025, osama.ahmed@deliverydevs.com
+# For license information, please see license.txt
+
+import time
+
+import frappe
+from frappe.utils import cint
+
+from zkteco_checkins_sync.zkteco_checkin_sync.config_snapshot import get_config
+from zkteco_checkins_sync.zkteco_checkin_sync.sync_lock import SyncLock
+
+
+SYNC_METHOD = "zkteco_checkins_sync.zkteco_checkin_sync.doctype.zkteco_config.zkteco_config.sync_zkteco_transactions"
+LOOP_METHOD = "zkteco_checkins_sync.zkteco_checkin_sync.sync_worker.run_sync_loop"
+
+# Only one sync loop runs per site. The lock expires on its own if the holder dies.
+LOOP_LOCK_NAME = "sync_loop"
+LOOP_LOCK_TTL = 300
+
+# How often an idle `bench zkteco-sync-worker` checks whether it should start syncing
+IDLE_POLL_SECONDS = 30
+
+# A loop enqueued by the scheduler hands over to a fresh job after this long.
+# Handovers alternate between the two job ids, so each can be deduplicated
+# while the job handing over still holds the other.
+SCHEDULED_LOOP_RUNTIME = 600
+LOOP_JOB_IDS = ("zkteco_sync_loop", "zkteco_sync_loop_handover")
+
+# Frequencies below this need the loop; longer ones run from the scheduler
+LOOP_MAX_SYNC_SECONDS = 60
+
+MIN_SYNC_SECONDS = 10
+DEFAULT_SYNC_SECONDS = 300
+
+
+def get_sync_seconds(cfg):
+    return max(cint(cfg.seconds) or DEFAULT_SYNC_SECONDS, MIN_SYNC_SECONDS)
+
+
+def needs_sync_loop(cfg):
+    return bool(cfg.enable_sync) and get_sync_seconds(cfg) < LOOP_MAX_SYNC_SECONDS
+
+
+def get_loop_lock():
+    return SyncLock(LOOP_LOCK_NAME, ttl=LOOP_LOCK_TTL, trigger="sync loop")
+
+
+def is_loop_running():
+    return bool(get_loop_lock().is_held())
+
+
+def run_sync_loop(max_runtime=None, loop_job_id=None):
+    """
+    Run a sync every `Sync Frequency` seconds until `max_runtime` elapses (forever
+    when None) or sync is disabled. The config snapshot is checked on every
+    iteration, so frequency changes apply without a restart. A loop job (with
+    `loop_job_id`) hands over to a new one only while the frequency still needs it.
+    """
+    lock = get_loop_lock()
+    if not lock.acquire():
+        return
+
+    deadline = time.monotonic() + max_runtime if max_runtime else None
+    handover = False
+    try:
+        while True:
+            # End the previous transaction so this iteration reads current sync state
+            frappe.db.commit()
+            cfg = get_config()
+            if not cfg.enable_sync:
+                return
+            # The scheduler runs longer frequencies itself once the lock is free
+            if loop_job_id and not needs_sync_loop(cfg):
+                return
+
+            started = time.monotonic()
+            try:
+                # A sync can outlast the lock's TTL, so the lease is renewed while it runs
+                with lock.heartbeat():
+                    frappe.get_attr(SYNC_METHOD)(trigger="sync loop", cfg=cfg)
+            except Exception as e:
+                frappe.log_error(f"ZKTeco sync loop iteration failed: {str(e)}", "ZKTeco Sync Loop")
+
+            next_run = started + get_sync_seconds(cfg)
+            if deadline and next_run >= deadline:
+                handover = True
+                return
+
+            # Sleep in short steps so the lock never lapses while we wait
+            while time.monotonic() < next_run:
+                if not lock.extend():
+                    return
+                time.sleep(min(5, max(0, next_run - time.monotonic())))
+    finally:
+        lock.release()
+        if handover and needs_sync_loop(get_config()):
+            # Hand over to a fresh job straight away instead of waiting for the next cron tick
+            enqueue_sync_loop(LOOP_JOB_IDS[1] if loop_job_id == LOOP_JOB_IDS[0] else LOOP_JOB_IDS[0])
+
+
+def ensure_sync_loop():
+    """
+    Make sure a sync loop is running, enqueueing one on the long queue if needed
+    """
+    if not is_loop_running():
+        enqueue_sync_loop()
+
+
+def enqueue_sync_loop(job_id=LOOP_JOB_IDS[0]):
+    # Duplicates that slip through exit straight away because they can't take the lock
+    frappe.enqueue(
+        LOOP_METHOD,
+        queue="long",
+        timeout=SCHEDULED_LOOP_RUNTIME + 300,
+        job_id=job_id,
+        deduplicate=True,
+        max_runtime=SCHEDULED_LOOP_RUNTIME,
+        # Passed on so the job knows which id to hand over to
+        loop_job_id=job_id,
+    )
@@ -0,0 +1,54 @@
+# Copyright (c) 2025, osama.ahmed@deliverydevs.com and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+from frappe.tests.utils import FrappeTestCase
+
+from zkteco_checkins_sync.zkteco_checkin_sync import adms
+from zkteco_checkins_sync.zkteco_checkin_sync.adms import get_handshake_options, parse_attlog
+
+
+class TestADMS(FrappeTestCase):
+	def test_parse_attlog(self):
+		body = "42\t2025-01-01 08:00:00\t0\t1\t0\n7\t2025-01-01 17:30:00\t1\t15\t0\t0\n"
+
+		transactions = parse_attlog(body, "CJDE1")
+
+		self.assertEqual([t["emp_code"] for t in transactions], ["42", "7"])
+		self.assertEqual(transactions[0]["id"], "CJDE1:42:2025-01-01 08:00:00")
+		self.assertEqual(transactions[1]["punch_state"], "1")
+		self.assertEqual(transactions[1]["verify_type"], "15")
+		self.assertEqual({t["terminal_sn"] for t in transactions}, {"CJDE1"})
+
+	def test_parse_attlog_skips_malformed_lines(self):
+		body = "\n".join(
+			[
+				"",
+				"   ",
+				"42",
+				"42\t",
+				"\t2025-01-01 08:00:00\t0",
+				"no tabs at all 2025-01-01 08:00:00",
+				" 9 \t 2025-01-01 09:00:00 \r",
+			]
+		)
+
+		transactions = parse_attlog(body, "CJDE1")
+
+		self.assertEqual(len(transactions), 1)
+		self.assertEqual(transactions[0]["emp_code"], "9")
+		self.assertEqual(transactions[0]["punch_time"], "2025-01-01 09:00:00")
+		# Lines without a status are check ins
+		self.assertEqual(transactions[0]["punch_state"], "0")
+
+	def test_parse_attlog_handles_empty_bodies(self):
+		self.assertEqual(parse_attlog(None, "CJDE1"), [])
+		self.assertEqual(parse_attlog(b"", "CJDE1"), [])
+
+	def test_handshake_returns_the_stored_stamp(self):
+		with patch.object(adms, "get_attlog_stamp", return_value="9999123"):
+			self.assertIn("ATTLOGStamp=9999123", get_handshake_options("CJDE1").splitlines())
+
+		with patch.object(adms, "get_attlog_stamp", return_value=None):
+			self.assertIn("ATTLOGStamp=None", get_handshake_options("CJDE1").splitlines())
@@ -0,0 +1,38 @@
+# Copyright (c) 2025, osama.ahmed@deliverydevs.com and Contributors
+# See license.txt
+
+from unittest.mock import MagicMock, patch
+
+from frappe.tests.utils import FrappeTestCase
+
+from zkteco_checkins_sync.zkteco_checkin_sync.api_client import TRANSACTIONS_PATH, ZKBioTimeClient
+
+
+def make_response(status_code):
+	resp = MagicMock()
+	resp.status_code = status_code
+	return resp
+
+
+class TestZKBioTimeClient(FrappeTestCase):
+	def test_rejected_response_is_closed_before_the_retry(self):
+		rejected, accepted = make_response(401), make_response(200)
+		client = ZKBioTimeClient("10.0.0.5", 8081, token="old-token", username="api", password="secret")
+		client.session = MagicMock()
+		client.session.get.side_effect = [rejected, accepted]
+
+		with patch.object(client, "obtain_token", return_value="new-token"):
+			self.assertIs(client.get(TRANSACTIONS_PATH, stream=True), accepted)
+
+		rejected.close.assert_called_once()
+		accepted.close.assert_not_called()
+		self.assertEqual(client.session.get.call_args.kwargs["headers"]["Authorization"], "Bearer new-token")
+
+	def test_401_without_credentials_is_returned(self):
+		rejected = make_response(401)
+		client = ZKBioTimeClient("10.0.0.5", 8081, token="old-token")
+		client.session = MagicMock()
+		client.session.get.return_value = rejected
+
+		self.assertIs(client.get(TRANSACTIONS_PATH), rejected)
+		self.assertEqual(client.session.get.call_count, 1)
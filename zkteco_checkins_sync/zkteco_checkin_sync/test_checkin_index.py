@@ -0,0 +1,51 @@
+# Copyright (c) 2025, osama.ahmed@deliverydevs.com and Contributors
+# See license.txt
+
+from datetime import datetime, timedelta
+
+from frappe.tests.utils import FrappeTestCase
+
+from zkteco_checkins_sync.zkteco_checkin_sync.checkin_index import CheckinIndex, device_key
+
+
+def at(seconds):
+	# 08:00:00 starts a 5 second bucket in any timezone with a whole-minute offset
+	return datetime(2025, 1, 1, 8) + timedelta(seconds=seconds)
+
+
+class TestCheckinIndex(FrappeTestCase):
+	def setUp(self):
+		self.index = CheckinIndex(tolerance=5)
+		# First second of its bucket
+		self.index.add("EMP-1", "Main Gate (ZKTeco-41)", at(5))
+
+	def test_bucket_edges(self):
+		self.assertEqual(self.index._bucket(at(4.999)) + 1, self.index._bucket(at(5)))
+		self.assertEqual(self.index._bucket(at(5)), self.index._bucket(at(9.999)))
+
+	def test_duplicates_across_the_bucket_edge(self):
+		# Previous bucket, within the tolerance
+		self.assertTrue(self.index.contains("EMP-1", "Main Gate", at(4.999)))
+		self.assertTrue(self.index.contains("EMP-1", "Main Gate", at(0)))
+		# Next bucket, exactly the tolerance away
+		self.assertTrue(self.index.contains("EMP-1", "Main Gate", at(10)))
+
+	def test_punches_past_the_tolerance_are_new(self):
+		self.assertFalse(self.index.contains("EMP-1", "Main Gate", at(10.001)))
+		self.assertFalse(self.index.contains("EMP-1", "Main Gate", at(-0.001)))
+		self.assertFalse(self.index.contains("EMP-1", "Main Gate", at(15)))
+
+	def test_other_employees_and_devices_are_new(self):
+		self.assertFalse(self.index.contains("EMP-2", "Main Gate", at(5)))
+		self.assertFalse(self.index.contains("EMP-1", "Side Gate", at(5)))
+
+	def test_device_suffix_is_ignored(self):
+		self.assertEqual(device_key("Main Gate (ZKTeco-41)"), "Main Gate")
+		self.assertTrue(self.index.contains("EMP-1", "Main Gate (ZKTeco-99)", at(6)))
+
+	def test_transaction_ids(self):
+		self.index.add("EMP-1", "Main Gate", at(30), "SRV:42")
+
+		self.assertTrue(self.index.has_transaction("SRV:42"))
+		self.assertFalse(self.index.has_transaction("42"))
+		self.assertFalse(self.index.has_transaction(None))
@@ -0,0 +1,121 @@
+# Copyright (c) 2025, osama.ahmed@deliverydevs.com and Contributors
+# See license.txt
+
+import json
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from zkteco_checkins_sync.zkteco_checkin_sync.sync_lock import RELEASE_SCRIPT, SyncLock, SyncLockLost
+
+
+class FakeCache:
+	"""
+	The Redis calls SyncLock makes, in memory. Keys never expire on their own;
+	tests expire a lease by deleting its key.
+	"""
+
+	def __init__(self):
+		self.data = {}
+		self.ttls = {}
+
+	def make_key(self, key):
+		return f"test|{key}"
+
+	def get(self, key):
+		return self.data.get(key)
+
+	def set(self, key, value, nx=False, ex=None):
+		if nx and key in self.data:
+			return False
+		self.data[key] = value
+		self.ttls[key] = ex
+		return True
+
+	def incr(self, key):
+		self.data[key] = int(self.data.get(key) or 0) + 1
+		return self.data[key]
+
+	def delete(self, key):
+		self.data.pop(key, None)
+
+	def eval(self, script, numkeys, key, value, *args):
+		if self.data.get(key) != value:
+			return 0
+		if script == RELEASE_SCRIPT:
+			self.delete(key)
+		else:
+			self.ttls[key] = args[0]
+		return 1
+
+
+class TestSyncLock(FrappeTestCase):
+	def setUp(self):
+		self.cache = FakeCache()
+		patcher = patch.object(frappe, "cache", return_value=self.cache)
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+	def test_only_one_holder(self):
+		first, second = SyncLock("sync", ttl=60), SyncLock("sync", ttl=60)
+
+		self.assertTrue(first.acquire())
+		self.assertFalse(second.acquire())
+		self.assertTrue(second.is_held())
+		self.assertEqual(second.holder()["token"], first.token)
+
+		first.release()
+		self.assertFalse(second.is_held())
+		self.assertTrue(second.acquire())
+
+	def test_locks_with_other_names_are_independent(self):
+		self.assertTrue(SyncLock("sync").acquire())
+		self.assertTrue(SyncLock("sync_loop").acquire())
+
+	def test_extend_renews_only_our_own_lease(self):
+		lock = SyncLock("sync", ttl=60)
+		lock.acquire()
+		self.cache.ttls[lock.key] = 1
+
+		self.assertTrue(lock.extend())
+		self.assertEqual(self.cache.ttls[lock.key], 60)
+
+		# The lease lapsed and someone else took it
+		self.cache.delete(lock.key)
+		successor = SyncLock("sync", ttl=60)
+		successor.acquire()
+		self.assertFalse(lock.extend())
+		self.assertTrue(successor.extend())
+
+	def test_fencing_tokens_increase_and_stale_holders_stop(self):
+		lock = SyncLock("sync")
+		lock.acquire()
+		self.cache.delete(lock.key)
+		successor = SyncLock("sync")
+		successor.acquire()
+
+		self.assertGreater(successor.token, lock.token)
+		with self.assertRaises(SyncLockLost):
+			lock.verify()
+		successor.verify()
+
+	def test_a_stale_holder_cannot_release_its_successor(self):
+		lock = SyncLock("sync")
+		lock.acquire()
+		self.cache.delete(lock.key)
+		successor = SyncLock("sync")
+		successor.acquire()
+
+		lock.release()
+
+		self.assertEqual(json.loads(self.cache.get(successor.key))["token"], successor.token)
+		self.assertFalse(lock.extend())
+
+	def test_an_unacquired_lock_does_nothing(self):
+		lock = SyncLock("sync")
+
+		self.assertFalse(lock.extend())
+		with self.assertRaises(SyncLockLost):
+			lock.verify()
+		lock.release()
@@ -0,0 +1,98 @@
+# Copyright (c) 2025, osama.ahmed@deliverydevs.com and Contributors
+# See license.txt
+
+import base64
+import json
+import time
+from unittest.mock import MagicMock, patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from zkteco_checkins_sync.zkteco_checkin_sync import token_manager
+from zkteco_checkins_sync.zkteco_checkin_sync.test_sync_lock import FakeCache
+from zkteco_checkins_sync.zkteco_checkin_sync.token_manager import TokenManager, get_token_expiry
+
+
+def make_jwt(payload):
+	encoded = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+	return f"header.{encoded}.signature"
+
+
+class TestTokenManager(FrappeTestCase):
+	def setUp(self):
+		self.cache = FakeCache()
+		for patcher in (
+			patch.object(frappe, "cache", return_value=self.cache),
+			patch.object(frappe.db, "set_single_value"),
+			patch.object(token_manager, "encrypt", side_effect=lambda value: value),
+			patch.object(token_manager, "decrypt", side_effect=lambda value: value),
+			patch.object(token_manager, "set_encrypted_password"),
+			patch.object(token_manager, "get_decrypted_password", return_value=None),
+		):
+			patcher.start()
+			self.addCleanup(patcher.stop)
+
+	def test_second_caller_reuses_the_new_token(self):
+		obtain = MagicMock(side_effect=["new-token", "another-token"])
+
+		self.assertEqual(TokenManager().refresh(obtain), "new-token")
+		self.assertEqual(TokenManager().refresh(obtain), "new-token")
+		self.assertEqual(obtain.call_count, 1)
+
+	def test_waiting_caller_picks_up_the_holders_token(self):
+		holder = TokenManager()
+		holder.lock.acquire()
+
+		def finish_holder(seconds):
+			# The other worker's obtain() returns while we poll
+			holder.store("holder-token")
+			holder.lock.release()
+
+		obtain = MagicMock(return_value="own-token")
+		with patch.object(token_manager.time, "sleep", side_effect=finish_holder) as sleep:
+			self.assertEqual(TokenManager().refresh(obtain), "holder-token")
+
+		sleep.assert_called_once()
+		obtain.assert_not_called()
+
+	def test_stuck_holder_does_not_stall_the_caller(self):
+		TokenManager().lock.acquire()
+		obtain = MagicMock(return_value="own-token")
+
+		with patch.object(token_manager, "REFRESH_WAIT_SECONDS", 0):
+			self.assertEqual(TokenManager().refresh(obtain), "own-token")
+		obtain.assert_called_once()
+
+	def test_rejected_token_is_not_reused(self):
+		manager = TokenManager()
+		manager.store("old-token")
+		obtain = MagicMock(return_value="new-token")
+
+		self.assertEqual(manager.refresh(obtain, rejected="old-token"), "new-token")
+		self.assertEqual(manager.refresh(obtain, rejected="old-token"), "new-token")
+		obtain.assert_called_once()
+
+	def test_due_token_is_kept_while_another_worker_renews_it(self):
+		manager = TokenManager()
+		now = time.time()
+		manager.cache("current-token", now + 600, now - 1)
+		TokenManager().lock.acquire()
+		obtain = MagicMock(return_value="new-token")
+
+		self.assertEqual(manager.get(obtain), "current-token")
+		obtain.assert_not_called()
+
+	def test_failed_renewal_keeps_the_current_token(self):
+		manager = TokenManager()
+		now = time.time()
+		manager.cache("current-token", now + 600, now - 1)
+
+		self.assertEqual(manager.get(MagicMock(side_effect=Exception("server down"))), "current-token")
+		self.assertFalse(manager.lock.is_held())
+
+	def test_token_expiry(self):
+		self.assertEqual(get_token_expiry(make_jwt({"exp": 1767225600})), 1767225600.0)
+		self.assertIsNone(get_token_expiry(make_jwt({"user_id": 1})))
+		self.assertIsNone(get_token_expiry("0123456789abcdef"))
+		self.assertIsNone(get_token_expiry("not.a.jwt"))
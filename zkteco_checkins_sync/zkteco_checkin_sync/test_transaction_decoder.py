@@ -0,0 +1,92 @@
+# Copyright (c) 2025, osama.ahmed@deliverydevs.com and Contributors
+# See license.txt
+
+import json
+import unittest
+
+from frappe.tests.utils import FrappeTestCase
+
+from zkteco_checkins_sync.zkteco_checkin_sync import transaction_decoder
+from zkteco_checkins_sync.zkteco_checkin_sync.transaction_decoder import TRANSACTION_FIELDS, decode_page
+
+ROWS = [
+	{
+		"id": 101,
+		"emp_code": "0042",
+		"punch_time": "2025-01-01 08:00:00",
+		"punch_state": "0",
+		"verify_type": 1,
+		"terminal_sn": "CJDE1",
+		"terminal_alias": "Main Gate",
+		"upload_time": "2025-01-01 08:00:03",
+		"first_name": "Ada",
+		"area_alias": "HQ",
+		# Nested values with field names must not leak into the record
+		"department": {"id": 7, "emp_code": "nested"},
+	},
+	{"id": 102, "emp_code": "7", "punch_time": "2025-01-01 08:01:00", "gps": [1.5, 2.25], "upload_time": None},
+]
+
+PAGES = {
+	"data": {"count": 2, "next": None, "previous": None, "msg": "", "code": 0, "data": ROWS},
+	"results": {"count": 2, "next": "http://zk/iclock/api/transactions/?page=2", "results": ROWS},
+	"list": ROWS,
+	# ZKBio Time sends the list last, but the values after it still count
+	"count_after_list": {"data": ROWS, "count": 2, "next": None},
+	"empty": {"count": 0, "next": None, "data": []},
+	"error": {"detail": "Invalid token."},
+}
+
+
+class FakeResponse:
+	def __init__(self, body, chunk_size=7):
+		self.content = json.dumps(body).encode()
+		self.chunk_size = chunk_size
+
+	def json(self):
+		return json.loads(self.content)
+
+	def iter_content(self, chunk_size):
+		# Small chunks, with empty ones in between as urllib3 may yield them
+		for start in range(0, len(self.content), self.chunk_size):
+			yield self.content[start : start + self.chunk_size]
+			yield b""
+
+
+def project(value):
+	"""
+	What the sync can read from a decoded page: top-level values, and each row's TRANSACTION_FIELDS
+	"""
+	if isinstance(value, list):
+		return [{field: row.get(field) for field in TRANSACTION_FIELDS} for row in value]
+	if isinstance(value, dict):
+		return {key: project(item) if isinstance(item, list) else item for key, item in value.items()}
+	return value
+
+
+class TestTransactionDecoder(FrappeTestCase):
+	def assertMatchesStandard(self, decoder):
+		for name, body in PAGES.items():
+			with self.subTest(page=name):
+				expected = project(decode_page(FakeResponse(body), "Standard"))
+				self.assertEqual(project(decode_page(FakeResponse(body), decoder)), expected)
+
+	@unittest.skipUnless(transaction_decoder.orjson, "orjson is not installed")
+	def test_orjson_matches_standard(self):
+		self.assertMatchesStandard("orjson")
+
+	@unittest.skipUnless(transaction_decoder.ijson, "ijson is not installed")
+	def test_ijson_matches_standard(self):
+		self.assertMatchesStandard("ijson")
+
+	@unittest.skipUnless(transaction_decoder.ijson, "ijson is not installed")
+	def test_ijson_keeps_only_transaction_fields(self):
+		page = decode_page(FakeResponse(PAGES["data"]), "ijson")
+
+		self.assertEqual(page["data"][0].get("emp_code"), "0042")
+		self.assertIsNone(page["data"][0].get("first_name"))
+		self.assertEqual(dict(page["data"][1].items())["upload_time"], None)
+
+	def test_get_decoder_falls_back(self):
+		self.assertEqual(transaction_decoder.get_decoder("Standard"), "Standard")
+		self.assertIn(transaction_decoder.get_decoder("Auto"), ("orjson", "Standard"))
@@ -0,0 +1,59 @@
+# Copyright (c) 2025, osama.ahmed@deliverydevs.com and Contributors
+# See license.txt
+
+from unittest.mock import patch
+from urllib.parse import quote
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from zkteco_checkins_sync.zkteco_checkin_sync import transaction_filters
+from zkteco_checkins_sync.zkteco_checkin_sync.transaction_filters import (
+	MAX_FILTER_PARAM_LENGTH,
+	MAX_FILTER_REQUESTS,
+	chunk_values,
+	get_filter_queries,
+)
+
+
+def get_queries(codes, **cfg):
+	with patch.object(transaction_filters, "get_device_codes", return_value=codes):
+		return get_filter_queries(frappe._dict(only_mapped_employees=1, **cfg))
+
+
+class TestTransactionFilters(FrappeTestCase):
+	def test_chunks_are_capped_by_count(self):
+		self.assertEqual(list(chunk_values(["1", "2", "3", "4", "5"], 2)), [["1", "2"], ["3", "4"], ["5"]])
+		self.assertEqual(list(chunk_values([], 2)), [])
+
+	def test_chunks_fit_in_one_query_string(self):
+		codes = [f"EMPLOYEE-{i:05d}" for i in range(1000)]
+
+		chunks = list(chunk_values(codes, 1000))
+
+		self.assertGreater(len(chunks), 1)
+		self.assertEqual([code for chunk in chunks for code in chunk], codes)
+		for chunk in chunks:
+			self.assertLessEqual(len(quote(",".join(chunk), safe="")), MAX_FILTER_PARAM_LENGTH)
+
+	def test_mapped_codes_go_out_in_few_requests(self):
+		codes = [str(i) for i in range(1, 1501)]
+
+		queries = get_queries(codes)
+
+		self.assertLessEqual(len(queries), MAX_FILTER_REQUESTS)
+		self.assertEqual([code for query in queries for code in query["emp_code"].split(",")], codes)
+
+	def test_too_many_codes_are_left_to_the_client_side_filter(self):
+		codes = [str(i) for i in range(1, 1501)]
+
+		self.assertEqual(get_queries(codes, filter_chunk_size=10), [{}])
+		# Other filters are still sent
+		self.assertEqual(get_queries(codes, filter_chunk_size=10, filter_terminals="T1,T2"), [{"terminal_sn": "T1,T2"}])
+
+	def test_terminal_requests(self):
+		cfg = frappe._dict(filter_terminals="T1\nT2")
+
+		self.assertEqual(get_filter_queries(cfg, "T2"), [{"terminal_sn": "T2"}])
+		self.assertEqual(get_filter_queries(cfg, "T3"), [])
+		self.assertEqual(get_filter_queries(frappe._dict(), "T3"), [{"terminal_sn": "T3"}])
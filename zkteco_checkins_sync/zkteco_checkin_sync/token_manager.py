@@ -0,0 +1,174 @@
+# Copyright (c) 2025, osama.ahmed@deliverydevs.com
+# For license information, please see license.txt
+
+import base64
+import json
+import time
+
+import frappe
+from frappe.utils import cint
+from frappe.utils.password import decrypt, encrypt, get_decrypted_password, set_encrypted_password
+
+from zkteco_checkins_sync.zkteco_checkin_sync.config_snapshot import get_config
+from zkteco_checkins_sync.zkteco_checkin_sync.sync_lock import SyncLock
+
+
+TOKEN_KEY = "zkteco_api_token:{0}"
+
+# ZKBio Time's /api-token-auth/ tokens carry no expiry of their own
+DEFAULT_TOKEN_LIFETIME_HOURS = 24
+
+# Renew once this share of a token's lifetime is left
+REFRESH_AHEAD = 0.2
+
+REFRESH_LOCK_TTL = 30
+REFRESH_WAIT_SECONDS = 10
+REFRESH_POLL_SECONDS = 0.2
+
+
+class TokenManager:
+    """
+    API token of one ZKBio Time server, shared by every worker on the site.
+
+    The token sits encrypted in Redis with its expiry, so a sync run costs one
+    Redis GET instead of an auth round trip. It is renewed from the stored
+    username/password once it nears expiry, by one worker at a time: the rest
+    keep using the current token, or wait for the new one if there is none.
+    The latest token is also kept in the source document's Password field as a
+    fallback for when Redis is flushed.
+    """
+
+    def __init__(self, server=None, lifetime_hours=None):
+        self.server = server
+        self.doctype, self.name = ("ZKTeco Server", server) if server else ("ZKTeco Config", "ZKTeco Config")
+        self.lifetime = (cint(lifetime_hours) or DEFAULT_TOKEN_LIFETIME_HOURS) * 3600
+        self.lock = SyncLock(f"token_refresh:{server or 'default'}", ttl=REFRESH_LOCK_TTL)
+
+    @property
+    def key(self):
+        return frappe.cache().make_key(TOKEN_KEY.format(self.server or "default"))
+
+    def cached(self):
+        value = frappe.cache().get(self.key)
+        return json.loads(value) if value else None
+
+    def get(self, obtain):
+        """
+        A valid token, renewing it through `obtain()` when it is due
+        """
+        entry = self.cached() or self.load()
+        if not entry or time.time() >= entry["expires_at"]:
+            return self.refresh(obtain)
+
+        token = decrypt(entry["token"])
+        if time.time() >= entry["refresh_at"] and self.lock.acquire():
+            # Still valid, so a failed renewal can wait for the next caller
+            try:
+                token = self.store(obtain())
+            except Exception as e:
+                frappe.logger().warning(f"ZKTeco token refresh failed, keeping the current token: {str(e)}")
+            finally:
+                self.lock.release()
+        return token
+
+    def refresh(self, obtain, rejected=None):
+        """
+        A new token, single-flight: one caller runs `obtain()` while the others
+        wait for its result. `rejected` is a token the server just refused;
+        anything else in the cache is a newer token from another worker.
+        """
+        deadline = time.monotonic() + REFRESH_WAIT_SECONDS
+        while True:
+            token = self.usable(rejected)
+            if token:
+                return token
+
+            if self.lock.acquire():
+                try:
+                    # The previous holder may have stored a token just before we got the lock
+                    return self.usable(rejected) or self.store(obtain())
+                finally:
+                    self.lock.release()
+
+            if time.monotonic() >= deadline:
+                # The holder is stuck; renewing twice beats stalling the sync
+                return self.store(obtain())
+            time.sleep(REFRESH_POLL_SECONDS)
+
+    def usable(self, rejected=None):
+        entry = self.cached()
+        if entry and time.time() < entry["expires_at"]:
+            token = decrypt(entry["token"])
+            if token != rejected:
+                return token
+
+    def store(self, token):
+        """
+        Cache `token` and save it encrypted on the source document. Saved with
+        the caller's next commit.
+        """
+        now = time.time()
+        expires_at = get_token_expiry(token) or now + self.lifetime
+        self.cache(token, expires_at, now + (expires_at - now) * (1 - REFRESH_AHEAD))
+
+        set_encrypted_password(self.doctype, self.name, token, "token")
+        # Password fields keep only a mask in the document itself
+        if self.server:
+            frappe.db.set_value(self.doctype, self.name, "token", "*" * len(token), update_modified=False)
+        else:
+            frappe.db.set_single_value(self.doctype, "token", "*" * len(token))
+        return token
+
+    def cache(self, token, expires_at, refresh_at):
+        entry = {"token": encrypt(token), "expires_at": expires_at, "refresh_at": refresh_at}
+        frappe.cache().set(self.key, json.dumps(entry), ex=max(1, int(expires_at - time.time())))
+        return entry
+
+    def load(self):
+        """
+        Put the token saved on the document back in the cache. Its age is
+        unknown, so unless it says when it expires it is renewed right away.
+        """
+        token = get_decrypted_password(self.doctype, self.name, "token", raise_exception=False)
+        if not token:
+            return None
+        now = time.time()
+        expires_at = get_token_expiry(token)
+        return self.cache(token, expires_at or now + self.lifetime, now if not expires_at else now + (expires_at - now) * (1 - REFRESH_AHEAD))
+
+    def clear(self):
+        frappe.cache().delete(self.key)
+
+
+def get_token_expiry(token):
+    """
+    The `exp` claim of a JWT (ZKBio Time's /jwt-api-token-auth/), or None
+    """
+    parts = token.split(".")
+    if len(parts) != 3:
+        return None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(parts[1] + "=" * (-len(parts[1]) % 4)))
+        return float(payload["exp"])
+    except Exception:
+        return None
+
+
+def refresh_api_tokens():
+    """
+    Scheduled: renew tokens that are due before a sync run has to
+    """
+    from zkteco_checkins_sync.zkteco_checkin_sync.api_client import get_client
+
+    cfg = get_config()
+    if not cfg.enable_sync:
+        return
+
+    servers = ([None] if cfg.username else []) + frappe.get_all("ZKTeco Server", filters={"enabled": 1}, pluck="name")
+    for server in servers:
+        try:
+            get_client(cfg, server).ensure_token()
+            frappe.db.commit()
+        except Exception as e:
+            frappe.db.rollback()
+            frappe.log_error(f"ZKTeco token refresh failed for {server or 'ZKTeco Config'}: {str(e)}", "ZKTeco Token")
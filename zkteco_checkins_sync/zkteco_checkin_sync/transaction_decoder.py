@@ -0,0 +1,163 @@
+# Copyright (c) 2025, osama.ahmed@deliverydevs.com
+# For license information, please see license.txt
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+
+# The only transaction fields the sync reads; names, department, area and the
+# rest of each row are dropped while decoding
+TRANSACTION_FIELDS = ("id", "emp_code", "punch_time", "punch_state", "terminal_sn", "terminal_alias", "upload_time")
+
+# Where the transaction list sits in a page: {"data": [...]}, {"results": [...]} or a bare list
+LIST_KEYS = ("data", "results")
+LIST_PREFIXES = ("", *LIST_KEYS)
+CONTAINER_EVENTS = ("start_map", "end_map", "start_array", "end_array", "map_key")
+
+# Bytes handed to ijson per read of a streamed response
+STREAM_CHUNK_SIZE = 64 * 1024
+
+DECODERS = ("Standard", "orjson", "ijson")
+
+
+class Transaction:
+    """
+    The fields of one API transaction the sync uses. Reads like the decoded
+    dict (`get`, `items`), so it flows through the same pipeline.
+    """
+
+    __slots__ = TRANSACTION_FIELDS
+
+    def __init__(self, row):
+        # Spelled out rather than looped: this runs for every row of every page
+        get = row.get
+        self.id = get("id")
+        self.emp_code = get("emp_code")
+        self.punch_time = get("punch_time")
+        self.punch_state = get("punch_state")
+        self.terminal_sn = get("terminal_sn")
+        self.terminal_alias = get("terminal_alias")
+        self.upload_time = get("upload_time")
+
+    def get(self, key, default=None):
+        value = getattr(self, key) if key in TRANSACTION_FIELDS else None
+        return default if value is None else value
+
+    def items(self):
+        return ((field, getattr(self, field)) for field in TRANSACTION_FIELDS)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+def get_decoder(name=None):
+    """
+    The decoder to use for `name` (a JSON Decoder setting). "Auto", and a
+    decoder whose package is not installed, use orjson when available. ijson
+    is slower than both but holds the least in memory, so it is only used
+    when chosen.
+    """
+    if name == "ijson" and ijson:
+        return "ijson"
+    if name == "Standard":
+        return "Standard"
+    return "orjson" if orjson else "Standard"
+
+
+def decode_page(resp, decoder="Standard"):
+    """
+    Decode a transactions page. The fast decoders return the page's top-level
+    values (`count`, `next`, ...) with the list replaced by Transaction records;
+    "Standard" returns `resp.json()` unchanged. ijson reads the body as it
+    arrives when the request was made with `stream=True`.
+    """
+    if decoder == "orjson":
+        return project_page(orjson.loads(resp.content))
+    if decoder == "ijson":
+        return stream_page(ChunkReader(iter_body(resp)))
+    return resp.json()
+
+
+def iter_body(resp):
+    # requests responses, streamed or not, and httpx responses
+    if hasattr(resp, "iter_content"):
+        return resp.iter_content(STREAM_CHUNK_SIZE)
+    return resp.iter_bytes(STREAM_CHUNK_SIZE)
+
+
+class ChunkReader:
+    """
+    The `read` ijson pulls from, over an iterator of byte chunks
+    """
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def read(self, size=-1):
+        # ijson reads 0 bytes first to tell bytes from text
+        if size == 0:
+            return b""
+        # An empty read means end of input to ijson, so empty chunks are skipped
+        for chunk in self.chunks:
+            if chunk:
+                return chunk
+        return b""
+
+
+def project_page(data):
+    if isinstance(data, list):
+        return [Transaction(row) for row in data]
+    if not isinstance(data, dict):
+        return data
+
+    page = {key: value for key, value in data.items() if not isinstance(value, (dict, list))}
+    for key in LIST_KEYS:
+        if key in data:
+            page[key] = [Transaction(row) for row in data[key] or []]
+            break
+    return page
+
+
+def stream_page(stream):
+    """
+    Decode with ijson in one pass over `stream`, without building a dict for
+    the page or for any full row: top-level values are kept as they are read,
+    and only the TRANSACTION_FIELDS of each row of the transaction list are
+    collected for its Transaction record.
+    """
+    page, rows, row = {}, None, None
+    list_prefix = item_prefix = None
+    field_prefixes = {}
+    in_list = False
+    for prefix, event, value in ijson.parse(stream, use_float=True):
+        if row is not None:
+            if prefix == item_prefix and event == "end_map":
+                rows.append(Transaction(row))
+                row = None
+            elif prefix in field_prefixes and event not in CONTAINER_EVENTS:
+                row[field_prefixes[prefix]] = value
+        elif in_list:
+            if prefix == item_prefix and event == "start_map":
+                row = {}
+            elif prefix == list_prefix and event == "end_array":
+                in_list = False
+        elif rows is None and event == "start_array" and prefix in LIST_PREFIXES:
+            list_prefix, rows, in_list = prefix, [], True
+            item_prefix = f"{prefix}.item" if prefix else "item"
+            field_prefixes = {f"{item_prefix}.{field}": field for field in TRANSACTION_FIELDS}
+        elif prefix and "." not in prefix and event not in CONTAINER_EVENTS:
+            page[prefix] = value
+
+    if rows is None:
+        return page
+    if not list_prefix:
+        return rows
+    page[list_prefix] = rows
+    return page
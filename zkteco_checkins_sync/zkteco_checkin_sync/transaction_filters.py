@@ -0,0 +1,118 @@
+# Copyright (c) 2025, osama.ahmed@deliverydevs.com
+# For license information, please see license.txt
+
+from itertools import product
+from urllib.parse import quote
+
+from frappe.utils import cint, cstr
+
+from zkteco_checkins_sync.zkteco_checkin_sync.employee_resolver import get_device_codes, normalize_code
+
+
+# ZKTeco Config list field -> /iclock/api/transactions/ query param it is sent as.
+# ZKBio Time takes a comma separated list for each.
+FILTER_PARAMS = (
+    ("filter_terminals", "terminal_sn"),
+    ("filter_areas", "area_alias"),
+    ("filter_departments", "department"),
+)
+EMP_CODE_PARAM = "emp_code"
+
+# Values per param in one request; longer lists are split over several
+DEFAULT_FILTER_CHUNK_SIZE = 1000
+
+# URL-encoded length of one param's values per request, so the request line
+# stays below the 8 KB most servers and proxies accept
+MAX_FILTER_PARAM_LENGTH = 4000
+
+# Above this many requests per window the emp_code filter is left to the
+# client-side check: downloading the extra rows costs less than the requests
+MAX_FILTER_REQUESTS = 10
+
+
+def parse_filter_list(value):
+    """
+    Values of a filter field, one per line or comma separated, in order and without duplicates
+    """
+    values = (item.strip() for line in cstr(value).splitlines() for item in line.split(","))
+    return list(dict.fromkeys(item for item in values if item))
+
+
+def get_filter_values(cfg):
+    """
+    Query param -> values to filter transactions on, for the filters set on ZKTeco Config
+    """
+    values = {param: parse_filter_list(cfg.get(fieldname)) for fieldname, param in FILTER_PARAMS}
+    if cfg.only_mapped_employees:
+        values[EMP_CODE_PARAM] = get_device_codes(bool(cfg.cache_employee_map_in_redis))
+    return {param: items for param, items in values.items() if items}
+
+
+def get_filter_queries(cfg, terminal=None):
+    """
+    Query params for each request a sync window is fetched with: one request
+    per combination of filter chunks, or a single unfiltered one. When the
+    mapped employee codes would take more than MAX_FILTER_REQUESTS requests,
+    they are not sent and TransactionFilter drops other rows instead. With a
+    `terminal`, the requests cover only that device, and there are none if
+    the terminal filter leaves it out.
+    """
+    values = get_filter_values(cfg)
+    if terminal:
+        terminals = values.get("terminal_sn")
+        if terminals and terminal not in terminals:
+            return []
+        values["terminal_sn"] = [terminal]
+
+    size = cint(cfg.filter_chunk_size) or DEFAULT_FILTER_CHUNK_SIZE
+    chunked = {param: [(param, ",".join(chunk)) for chunk in chunk_values(items, size)] for param, items in values.items()}
+    if EMP_CODE_PARAM in chunked and count_requests(chunked) > MAX_FILTER_REQUESTS:
+        del chunked[EMP_CODE_PARAM]
+    return [dict(query) for query in product(*chunked.values())]
+
+
+def chunk_values(items, size):
+    """
+    Split `items` into lists of at most `size` values whose comma separated,
+    URL-encoded form fits in MAX_FILTER_PARAM_LENGTH
+    """
+    chunk, length = [], 0
+    for item in items:
+        # Each value is followed by an encoded comma (%2C)
+        item_length = len(quote(item, safe="")) + 3
+        if chunk and (len(chunk) >= size or length + item_length > MAX_FILTER_PARAM_LENGTH):
+            yield chunk
+            chunk, length = [], 0
+        chunk.append(item)
+        length += item_length
+    if chunk:
+        yield chunk
+
+
+def count_requests(chunked):
+    count = 1
+    for chunks in chunked.values():
+        count *= len(chunks)
+    return count
+
+
+class TransactionFilter:
+    """
+    Client-side check of the terminal and employee filters, for servers that
+    ignore a filter param and send every row anyway. Areas and departments
+    are not part of the decoded rows, so those are left to the server.
+    """
+
+    def __init__(self, cfg, employee_map):
+        self.terminals = set(parse_filter_list(cfg.filter_terminals))
+        self.employee_map = employee_map if cfg.only_mapped_employees else None
+
+    def __bool__(self):
+        return bool(self.terminals) or self.employee_map is not None
+
+    def matches(self, transaction):
+        if self.terminals and transaction.get("terminal_sn") not in self.terminals:
+            return False
+        if self.employee_map is not None and normalize_code(transaction.get("emp_code")) not in self.employee_map:
+            return False
+        return True
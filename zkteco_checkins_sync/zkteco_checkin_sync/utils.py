@@ -0,0 +1,42 @@
+# Copyright (c) 2025, osama.ahmed@deliverydevs.com
+# For license information, please see license.txt
+
+from concurrent.futures import ThreadPoolExecutor
+
+import frappe
+
+
+def run_in_site_context(site, sites_path, fn, *args, **kwargs):
+    """
+    Run `fn` in a worker thread with its own frappe context and DB connection.
+    frappe.local is thread-local, so threads cannot share the caller's connection.
+    """
+    frappe.init(site=site, sites_path=sites_path)
+    frappe.connect()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        frappe.destroy()
+
+
+def run_concurrently(fn, items, max_workers=None):
+    """
+    Call `fn(item)` for every item on a thread pool, each in its own site
+    context, and return the results in input order. Exceptions are returned
+    in place of results so one failing item does not hide the others.
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    site = frappe.local.site
+    sites_path = frappe.local.sites_path
+
+    def call(item):
+        try:
+            return run_in_site_context(site, sites_path, fn, item)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(items)) as executor:
+        return list(executor.map(call, items))